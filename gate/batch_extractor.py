@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+微批量提取模块
+在短时间窗口内收集到达的消息，按提示词模板分组后合并为一次模型请求，
+窗口内只有一条消息时仍走单条提取。适合频道连续刷屏时减少请求数，代价是每条消息多等待一个窗口。
+"""
+
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 设置日志
+logger = logging.getLogger(__name__)
+
+# 单条提取: (文本, 模板名) -> (信号, 原始JSON)
+SingleExtractor = Callable[[str, Optional[str]], Tuple[Any, Dict[str, Any]]]
+# 批量提取: ([文本], 模板名) -> [(信号, 原始JSON)]，顺序与输入一致
+BatchExtractorFn = Callable[[List[str], Optional[str]], List[Tuple[Any, Dict[str, Any]]]]
+
+
+class MicroBatcher:
+    """按时间窗口和批量上限合并提取请求"""
+
+    def __init__(self, extract_one: SingleExtractor, extract_many: BatchExtractorFn,
+                 window: float, max_size: int):
+        self.extract_one = extract_one
+        self.extract_many = extract_many
+        self.window = window
+        self.max_size = max_size
+        # 模板名 -> 等待中的 (文本, Future)
+        self._pending: Dict[Optional[str], List[Tuple[str, asyncio.Future]]] = {}
+        self._timers: Dict[Optional[str], asyncio.TimerHandle] = {}
+        self._running = set()
+        # 统计
+        self.requests = 0
+        self.messages = 0
+
+    async def extract(self, text: str, prompt: str = None) -> Tuple[Any, Dict[str, Any]]:
+        """提交一条消息，等待所在批次完成后返回 (信号, 原始JSON)"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self._pending.setdefault(prompt, [])
+        batch.append((text, future))
+        if len(batch) >= self.max_size:
+            self._flush(prompt)
+        elif len(batch) == 1:
+            self._timers[prompt] = loop.call_later(self.window, self._flush, prompt)
+        return await future
+
+    def _flush(self, prompt: Optional[str]):
+        timer = self._timers.pop(prompt, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(prompt, None)
+        if not batch:
+            return
+        task = asyncio.create_task(self._run(prompt, batch))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run(self, prompt: Optional[str], batch: List[Tuple[str, asyncio.Future]]):
+        texts = [text for text, _ in batch]
+        self.requests += 1
+        self.messages += len(texts)
+        try:
+            if len(texts) == 1:
+                results = [await asyncio.to_thread(self.extract_one, texts[0], prompt)]
+            else:
+                print(f"📦 批量提取 {len(texts)} 条消息 (模板: {prompt or 'default'})")
+                results = await asyncio.to_thread(self.extract_many, texts, prompt)
+        except Exception as e:
+            logger.error(f"批量提取失败: {e}")
+            results = [(None, {"error": str(e)})] * len(texts)
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def format_stats(self) -> str:
+        if not self.requests:
+            return ''
+        return f"  [批量] 请求 {self.requests} | 消息 {self.messages} | 平均每批 {self.messages / self.requests:.1f} 条"
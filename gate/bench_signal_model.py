@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+信号校验微基准
+对比每个信号 "校验 + 序列化为字典" 的耗时:
+- legacy: 原先各监听程序中的 Pydantic 模型（宽松类型 + Python model_validator）+ model_dump()
+- pydantic: signal_model.TradingSignal（严格类型）+ model_dump()
+- fast: signal_model.parse_signal() + Signal.to_dict()
+样本取自信号文件中的历史信号，另加一组价格逻辑错误的样本；同时检查三种方式的判定是否一致。
+
+用法:
+    python bench_signal_model.py --signals ../tgqd/trading_signals.json
+    python bench_signal_model.py --rounds 2000 --json
+"""
+
+import argparse
+import json
+import time
+from typing import Any, Callable, Dict, List, Union
+
+from pydantic import BaseModel, model_validator
+
+# 导入配置
+from config import OTHER_CONFIG
+from signal_model import SIGNAL_FIELDS, TradingSignal, parse_signal
+
+
+class LegacyTradingSignal(BaseModel):
+    """重构前的模型，仅作为基准对照"""
+    trading_pair: str
+    direction: str
+    entry_price: List[Union[str, float]]
+    target_price: List[float]
+    stop_loss: float
+
+    @model_validator(mode='after')
+    def check_prices_logic(self) -> 'LegacyTradingSignal':
+        numeric_entry_prices = [p for p in self.entry_price if isinstance(p, (int, float))]
+        if not numeric_entry_prices:
+            return self
+        min_entry = min(numeric_entry_prices)
+        max_entry = max(numeric_entry_prices)
+        min_target = min(self.target_price)
+        max_target = max(self.target_price)
+        if self.direction == 'long':
+            if min_target <= max_entry:
+                raise ValueError(f"逻辑冲突 (多单): 最低目标价 {min_target} 必须高于最高入场价 {max_entry}。")
+            if self.stop_loss >= min_entry:
+                raise ValueError(f"逻辑冲突 (多单): 止损价 {self.stop_loss} 必须低于最低入场价 {min_entry}。")
+        elif self.direction == 'short':
+            if max_target >= min_entry:
+                raise ValueError(f"逻辑冲突 (空单): 最高目标价 {max_target} 必须低于最低入场价 {min_entry}。")
+            if self.stop_loss <= max_entry:
+                raise ValueError(f"逻辑冲突 (空单): 止损价 {self.stop_loss} 必须高于最高入场价 {max_entry}。")
+        return self
+
+
+def load_samples(signals_file: str) -> List[Dict[str, Any]]:
+    """历史信号（只保留信号字段）+ 把止损移到错误一侧的无效样本"""
+    with open(signals_file, 'r', encoding='utf-8') as f:
+        records = json.load(f)
+    samples = [{key: record[key] for key in SIGNAL_FIELDS} for record in records
+               if all(key in record for key in SIGNAL_FIELDS)]
+    invalid = []
+    for sample in samples:
+        bad = dict(sample)
+        targets = sample['target_price']
+        bad['stop_loss'] = max(targets) * 1.1 if sample['direction'] == 'long' else min(targets) * 0.9
+        invalid.append(bad)
+    return samples + invalid
+
+
+def _legacy(data):
+    return LegacyTradingSignal.model_validate(data).model_dump()
+
+def _pydantic(data):
+    return TradingSignal.model_validate(data).model_dump()
+
+def _fast(data):
+    return parse_signal(data).to_dict()
+
+
+PATHS: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    'legacy': _legacy,
+    'pydantic': _pydantic,
+    'fast': _fast,
+}
+
+
+def run_once(fn: Callable, samples: List[Dict[str, Any]]) -> List[bool]:
+    accepted = []
+    for sample in samples:
+        try:
+            fn(sample)
+            accepted.append(True)
+        except ValueError:
+            accepted.append(False)
+    return accepted
+
+
+def bench(fn: Callable, samples: List[Dict[str, Any]], rounds: int) -> float:
+    """返回每个信号的平均耗时（纳秒），取多轮中最快的一轮以减少噪声"""
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter_ns()
+        run_once(fn, samples)
+        best = min(best, time.perf_counter_ns() - start)
+    return best / len(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='信号校验 + 序列化微基准')
+    parser.add_argument('--signals', default=OTHER_CONFIG['SIGNALS_FILE'], help='信号文件')
+    parser.add_argument('--rounds', type=int, default=500, help='测量轮数')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出结果')
+    args = parser.parse_args()
+
+    samples = load_samples(args.signals)
+    if not samples:
+        print(f"{args.signals} 中没有可用的信号样本")
+        return
+
+    decisions = {name: run_once(fn, samples) for name, fn in PATHS.items()}
+    mismatches = [i for i in range(len(samples)) if decisions['fast'][i] != decisions['pydantic'][i]]
+    results = [{
+        'path': name,
+        'ns_per_signal': round(bench(fn, samples, args.rounds)),
+        'accepted': sum(decisions[name])
+    } for name, fn in PATHS.items()]
+
+    if args.json:
+        print(json.dumps({'samples': len(samples), 'mismatches': len(mismatches), 'results': results},
+                         ensure_ascii=False, indent=2))
+        return
+    baseline = results[0]['ns_per_signal']
+    print(f"样本: {len(samples)} (其中无效 {len(samples) // 2})，测量 {args.rounds} 轮取最快")
+    print(f"\n{'路径':<10} {'ns/信号':>10} {'相对legacy':>10} {'通过':>6}")
+    for r in results:
+        print(f"{r['path']:<10} {r['ns_per_signal']:>10} {baseline / r['ns_per_signal']:>9.1f}x {r['accepted']:>6}")
+    if mismatches:
+        print(f"\n⚠️ fast 与 pydantic 判定不一致的样本: {[samples[i] for i in mismatches[:5]]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""
+本地K线存储模块
+使用 SQLite 按 (合约, 周期, 时间) 聚簇存储 OHLCV 数据，支持从 Gate.io 增量下载、
+按时间区间查询（返回 NumPy 数组）以及缺口检测。
+
+用法:
+    python candle_store.py sync BTC_USDT ETH_USDT --interval 1m --days 30
+    python candle_store.py gaps BTC_USDT --interval 1m
+    python candle_store.py export BTC_USDT --interval 1m --out price_data
+"""
+
+import argparse
+import asyncio
+import csv
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# NumPy 为可选依赖，缺失时区间查询返回普通列表
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# gate-api 只在真实下载时需要，离线使用（或注入模拟数据源）时可以缺失
+try:
+    import gate_api
+    GATE_API_AVAILABLE = True
+except ImportError:
+    GATE_API_AVAILABLE = False
+
+# 导入配置
+from config import CANDLE_CONFIG, GATE_CONFIG
+
+# 设置日志
+logger = logging.getLogger(__name__)
+
+# K线行: (时间戳秒, 开, 高, 低, 收, 量)
+CandleRow = Tuple[int, float, float, float, float, float]
+# 数据源: fetch(合约, 周期, 起始时间, 结束时间) -> K线行列表
+CandleFetcher = Callable[[str, str, int, int], List[CandleRow]]
+
+# 各周期对应的秒数
+INTERVAL_SECONDS = {
+    '10s': 10, '1m': 60, '5m': 300, '15m': 900, '30m': 1800,
+    '1h': 3600, '4h': 14400, '8h': 28800, '1d': 86400, '7d': 604800
+}
+
+FIELDS = ('ts', 'open', 'high', 'low', 'close', 'volume')
+
+
+class GateCandleSource:
+    """Gate.io 合约K线数据源（公开接口，无需API密钥），默认从 CANDLE_CONFIG['HOST'] 的主网下载"""
+
+    def __init__(self, settle: str = None, host: str = None):
+        if not GATE_API_AVAILABLE:
+            raise ImportError("下载K线需要 gate-api: pip install gate-api")
+        configuration = gate_api.Configuration(host=host or CANDLE_CONFIG['HOST'])
+        self.futures_api = gate_api.FuturesApi(gate_api.ApiClient(configuration))
+        self.settle = settle or GATE_CONFIG['SETTLE']
+
+    def __call__(self, contract: str, interval: str, start: int, end: int) -> List[CandleRow]:
+        candles = self.futures_api.list_futures_candlesticks(
+            self.settle, contract, _from=start, to=end, interval=interval
+        )
+        return [
+            (int(c.t), float(c.o), float(c.h), float(c.l), float(c.c), float(c.v or 0))
+            for c in candles
+        ]
+
+
+class CandleStore:
+    """基于 SQLite 的K线存储，每个 (合约, 周期) 是一条独立的时间序列"""
+
+    def __init__(self, db_file: str = None):
+        self.db_file = db_file or CANDLE_CONFIG['DB_FILE']
+        # sync_async 在工作线程中使用连接，所有访问由 _lock 串行化
+        self.conn = sqlite3.connect(self.db_file, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        # WITHOUT ROWID + 复合主键: 数据按 (contract, interval, ts) 物理有序，区间查询为顺序扫描
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS candles (
+                contract TEXT NOT NULL,
+                interval TEXT NOT NULL,
+                ts INTEGER NOT NULL,
+                open REAL NOT NULL,
+                high REAL NOT NULL,
+                low REAL NOT NULL,
+                close REAL NOT NULL,
+                volume REAL NOT NULL,
+                PRIMARY KEY (contract, interval, ts)
+            ) WITHOUT ROWID
+        """)
+        self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def append(self, contract: str, interval: str, rows: Sequence[CandleRow]) -> int:
+        """写入K线，相同时间戳的K线会被覆盖（最后一根未收盘K线会在下次同步时更新）"""
+        if not rows:
+            return 0
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO candles VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(contract, interval) + tuple(row) for row in rows]
+            )
+        return len(rows)
+
+    def _fetch(self, sql: str, params: Sequence[Any] = ()) -> List[Tuple]:
+        with self._lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def last_ts(self, contract: str, interval: str) -> Optional[int]:
+        return self._fetch(
+            "SELECT MAX(ts) FROM candles WHERE contract = ? AND interval = ?", (contract, interval)
+        )[0][0]
+
+    def first_ts(self, contract: str, interval: str) -> Optional[int]:
+        return self._fetch(
+            "SELECT MIN(ts) FROM candles WHERE contract = ? AND interval = ?", (contract, interval)
+        )[0][0]
+
+    def series(self) -> List[Tuple[str, str, int]]:
+        """列出已存储的所有序列及其K线数量"""
+        return self._fetch(
+            "SELECT contract, interval, COUNT(*) FROM candles GROUP BY contract, interval"
+        )
+
+    def query_rows(self, contract: str, interval: str, start: int = None, end: int = None) -> List[CandleRow]:
+        """按时间区间 [start, end] 查询K线行"""
+        return self._fetch(
+            "SELECT ts, open, high, low, close, volume FROM candles "
+            "WHERE contract = ? AND interval = ? AND ts >= ? AND ts <= ? ORDER BY ts",
+            (contract, interval, start if start is not None else 0, end if end is not None else 2 ** 62)
+        )
+
+    def query(self, contract: str, interval: str, start: int = None, end: int = None) -> Dict[str, Any]:
+        """
+        按时间区间查询K线，返回按列组织的数据:
+        {'ts': int64数组, 'open': float64数组, ...}
+        未安装 NumPy 时各列为普通列表。
+        """
+        rows = self.query_rows(contract, interval, start, end)
+        columns = list(zip(*rows)) if rows else [()] * len(FIELDS)
+        if not NUMPY_AVAILABLE:
+            return {name: list(col) for name, col in zip(FIELDS, columns)}
+        result = {'ts': np.asarray(columns[0], dtype=np.int64)}
+        for name, col in zip(FIELDS[1:], columns[1:]):
+            result[name] = np.asarray(col, dtype=np.float64)
+        return result
+
+    def find_gaps(self, contract: str, interval: str, start: int = None, end: int = None) -> List[Tuple[int, int]]:
+        """
+        检测缺口，返回缺失区间列表 [(缺口首根时间, 缺口末根时间), ...]。
+        只检测已有数据范围内部的缺口。
+        """
+        step = INTERVAL_SECONDS[interval]
+        rows = self._fetch(
+            "SELECT prev_ts, ts FROM ("
+            "  SELECT ts, LAG(ts) OVER (ORDER BY ts) AS prev_ts FROM candles "
+            "  WHERE contract = ? AND interval = ? AND ts >= ? AND ts <= ?"
+            ") WHERE ts - prev_ts > ?",
+            (contract, interval, start if start is not None else 0, end if end is not None else 2 ** 62, step)
+        )
+        return [(prev_ts + step, ts - step) for prev_ts, ts in rows]
+
+    def sync(self, contract: str, interval: str, fetcher: CandleFetcher,
+             start: int = None, end: int = None, batch_limit: int = None) -> int:
+        """
+        增量同步: 从本地最后一根K线继续下载到 end（默认当前时间）。
+        本地为空时从 start 开始。返回写入的K线数量。
+        """
+        end = end or int(time.time())
+        last = self.last_ts(contract, interval)
+        # 从最后一根K线本身开始，覆盖可能未收盘的那一根
+        cursor = last if last is not None else start
+        if cursor is None:
+            raise ValueError(f"{contract} {interval} 本地无数据，需要指定起始时间")
+
+        total = self.sync_range(contract, interval, fetcher, cursor, end, batch_limit)
+        logger.info(f"K线同步完成: {contract} {interval} - 写入 {total} 根")
+        return total
+
+    def fill_gaps(self, contract: str, interval: str, fetcher: CandleFetcher) -> int:
+        """重新下载所有缺口区间；交易所本身没有数据的缺口会保持原样"""
+        total = 0
+        for gap_start, gap_end in self.find_gaps(contract, interval):
+            total += self.sync_range(contract, interval, fetcher, gap_start, gap_end)
+        return total
+
+    def sync_range(self, contract: str, interval: str, fetcher: CandleFetcher,
+                   start: int, end: int, batch_limit: int = None) -> int:
+        """按批次下载指定区间（不依赖本地最后时间）"""
+        step = INTERVAL_SECONDS[interval]
+        batch_limit = batch_limit or CANDLE_CONFIG['BATCH_LIMIT']
+        total = 0
+        cursor = start
+        while cursor <= end:
+            batch_end = min(cursor + step * (batch_limit - 1), end)
+            total += self.append(contract, interval, fetcher(contract, interval, cursor, batch_end))
+            cursor = batch_end + step
+            if cursor <= end and CANDLE_CONFIG['REQUEST_INTERVAL']:
+                time.sleep(CANDLE_CONFIG['REQUEST_INTERVAL'])
+        return total
+
+    def export_csv(self, contract: str, interval: str, out_dir: str) -> str:
+        """导出为 param_sweep.py 使用的CSV格式"""
+        os.makedirs(out_dir, exist_ok=True)
+        path = os.path.join(out_dir, f"{contract}_{interval}.csv")
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(FIELDS)
+            writer.writerows(self.query_rows(contract, interval))
+        return path
+
+
+async def sync_async(store: CandleStore, contract: str, interval: str, fetcher: CandleFetcher, **kwargs) -> int:
+    """在事件循环中同步K线，不阻塞消息监听"""
+    return await asyncio.to_thread(store.sync, contract, interval, fetcher, **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地K线存储')
+    parser.add_argument('command', choices=['sync', 'gaps', 'fill', 'export', 'list'])
+    parser.add_argument('contracts', nargs='*', help='合约名，如 BTC_USDT')
+    parser.add_argument('--interval', default='1m')
+    parser.add_argument('--days', type=float, default=7, help='本地无数据时向前下载的天数')
+    parser.add_argument('--out', default='price_data', help='export 的输出目录')
+    parser.add_argument('--db', default=None)
+    parser.add_argument('--host', default=None, help="K线下载地址，默认 CANDLE_CONFIG['HOST']（主网）")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    store = CandleStore(args.db)
+
+    try:
+        if args.command == 'list':
+            for contract, interval, count in store.series():
+                print(f"{contract:<16} {interval:<5} {count} 根")
+            return
+
+        for contract in args.contracts:
+            contract = contract.replace('/', '_').upper()
+            if args.command == 'sync':
+                start = int(time.time() - args.days * 86400)
+                count = store.sync(contract, args.interval, GateCandleSource(host=args.host), start=start)
+                print(f"✅ {contract} {args.interval}: 写入 {count} 根K线")
+            elif args.command == 'gaps':
+                gaps = store.find_gaps(contract, args.interval)
+                print(f"{contract} {args.interval}: {len(gaps)} 个缺口")
+                for gap_start, gap_end in gaps:
+                    print(f"  - {time.strftime('%Y-%m-%d %H:%M', time.localtime(gap_start))} ~ "
+                          f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(gap_end))}")
+            elif args.command == 'fill':
+                count = store.fill_gaps(contract, args.interval, GateCandleSource(host=args.host))
+                print(f"✅ {contract} {args.interval}: 补齐 {count} 根K线")
+            elif args.command == 'export':
+                print(f"✅ 已导出: {store.export_csv(contract, args.interval, args.out)}")
+    finally:
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+信号提取后端对比工具
+以历史信号文件（远程模型的提取结果）为参考标注，测量各提取后端的耗时分布和准确率
+（信号识别的精确率/召回率、字段完全一致率）。导出的历史消息没有标注，只用于测速和统计识别数；
+使用 --remote 时以远程模型的实时结果作为这些消息的参考标注。信号文件只有正例，
+没有负例标注（不加 --remote）时无法统计误报，精确率显示为 N/A。
+
+用法:
+    python compare_extractors.py --signals ../tgqd/trading_signals.json --history ../tgqd/channel_*_history.txt
+    python compare_extractors.py --remote --limit 50     # 同时实时调用远程模型对比（需要网络）
+"""
+
+import argparse
+import glob
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 导入配置
+from config import OTHER_CONFIG
+from local_extractor import extract_local
+
+SIGNAL_FIELDS = ('trading_pair', 'direction', 'entry_price', 'target_price', 'stop_loss')
+
+
+def normalize(data: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """统一为可比较的形式；缺少字段（非信号）时返回 None"""
+    if not data or not all(key in data for key in SIGNAL_FIELDS):
+        return None
+
+    def price(p):
+        return '现价' if p in ('现价', '市价') else float(p)
+
+    return {
+        'trading_pair': str(data['trading_pair']).upper(),
+        'direction': data['direction'],
+        'entry_price': [price(p) for p in data['entry_price']],
+        'target_price': [float(p) for p in data['target_price']],
+        'stop_loss': float(data['stop_loss'])
+    }
+
+
+def load_history_messages(paths: List[str]) -> List[str]:
+    """读取 export_topic_history.py 导出的历史消息文本"""
+    messages = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            blocks = f.read().split('--- Message ---')
+        for block in blocks[1:]:
+            _, _, content = block.partition('Content:\n')
+            content = content.strip()
+            if content:
+                messages.append(content)
+    return messages
+
+
+def load_dataset(signals_file: str, history_files: List[str]) -> Tuple[List[str], Dict[str, Optional[Dict[str, Any]]]]:
+    """返回 (全部消息文本, {已标注文本: 参考结果})，信号文件中的消息在前"""
+    with open(signals_file, 'r', encoding='utf-8') as f:
+        signals = json.load(f)
+    labels = {}
+    for item in signals:
+        if item.get('original_text'):
+            labels[item['original_text'].strip()] = normalize(item)
+    texts = list(labels)
+    seen = set(texts)
+    for text in load_history_messages(history_files):
+        if text not in seen:
+            seen.add(text)
+            texts.append(text)
+    return texts, labels
+
+
+def run_extractor(extractor: Callable[[str], Dict[str, Any]], texts: List[str]) -> Tuple[Dict[str, Any], List[float]]:
+    """运行提取器，返回 ({文本: 结果}, 每条耗时)"""
+    outputs, latencies = {}, []
+    for text in texts:
+        start = time.perf_counter()
+        try:
+            outputs[text] = normalize(extractor(text))
+        except Exception:
+            outputs[text] = None
+        latencies.append(time.perf_counter() - start)
+    return outputs, latencies
+
+
+def evaluate(name: str, outputs: Dict[str, Any], latencies: List[float],
+             labels: Dict[str, Optional[Dict[str, Any]]]) -> Dict[str, Any]:
+    tp = fp = fn = exact = 0
+    # 没有负例标注时误报永远为 0，精确率没有意义
+    has_negatives = any(expected is None for expected in labels.values())
+    for text, expected in labels.items():
+        result = outputs.get(text)
+        if result and expected:
+            tp += 1
+            exact += result == expected
+        elif result:
+            fp += 1
+        elif expected:
+            fn += 1
+
+    latencies = sorted(latencies)
+    n = len(latencies)
+    return {
+        'extractor': name,
+        'samples': n,
+        'labeled': len(labels),
+        'detected': sum(1 for result in outputs.values() if result),
+        'mean_ms': sum(latencies) / n * 1000 if n else 0.0,
+        'p50_ms': latencies[n // 2] * 1000 if n else 0.0,
+        'p95_ms': latencies[min(n - 1, int(n * 0.95))] * 1000 if n else 0.0,
+        'precision': (tp / (tp + fp) if tp + fp else 0.0) if has_negatives else None,
+        'recall': tp / (tp + fn) if tp + fn else 0.0,
+        'field_exact': exact / tp if tp else 0.0
+    }
+
+
+def remote_extract(text: str) -> Dict[str, Any]:
+    # 延迟导入，只有对比远程模型时才需要 Telegram/OpenAI 依赖
+    from monitor_telegram_trading import extract_trade_signal
+
+    signal, raw_json = extract_trade_signal(text)
+    return signal.to_dict() if signal else {}
+
+
+def print_report(results: List[Dict[str, Any]]):
+    def pct(value):
+        return f"{'N/A':>8}" if value is None else f"{value:>8.1%}"
+
+    print(f"\n{'后端':<10} {'样本':>6} {'识别':>6} {'平均ms':>9} {'p50ms':>9} {'p95ms':>9} "
+          f"{'标注':>6} {'精确率':>8} {'召回率':>8} {'字段一致':>8}")
+    for r in results:
+        print(f"{r['extractor']:<10} {r['samples']:>6} {r['detected']:>6} {r['mean_ms']:>9.3f} {r['p50_ms']:>9.3f} "
+              f"{r['p95_ms']:>9.3f} {r['labeled']:>6} {pct(r['precision'])} {r['recall']:>8.1%} {r['field_exact']:>8.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='信号提取后端速度/准确率对比')
+    parser.add_argument('--signals', default=OTHER_CONFIG['SIGNALS_FILE'], help='参考信号文件')
+    parser.add_argument('--history', nargs='*', default=[], help='导出的历史消息文件（支持通配符）')
+    parser.add_argument('--limit', type=int, default=None, help='最多使用的样本数（信号样本优先）')
+    parser.add_argument('--remote', action='store_true', help='同时实时调用远程模型，并以其结果标注历史消息')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出结果')
+    args = parser.parse_args()
+
+    history_files = [path for pattern in args.history for path in glob.glob(pattern)]
+    texts, labels = load_dataset(args.signals, history_files)
+    if args.limit:
+        texts = texts[:args.limit]
+    labels = {text: expected for text, expected in labels.items() if text in set(texts)}
+    print(f"样本: {len(texts)} (已标注 {len(labels)})")
+
+    results = []
+    if args.remote:
+        remote_outputs, remote_latencies = run_extractor(remote_extract, texts)
+        results.append(evaluate('remote', remote_outputs, remote_latencies, labels))
+        # 未标注的消息以远程模型的结果为参考
+        labels = {text: labels.get(text, remote_outputs[text]) for text in texts}
+    local_outputs, local_latencies = run_extractor(extract_local, texts)
+    results.insert(0, evaluate('local', local_outputs, local_latencies, labels))
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        print_report(results)
+        if any(r['precision'] is None for r in results):
+            print("注: 参考标注中没有负例，无法统计误报，精确率为 N/A（使用 --remote 以远程模型结果标注历史消息）")
+
+
+if __name__ == '__main__':
+    main()
@@ -17,6 +17,31 @@ TELEGRAM_CONFIG = {
     # 超级群组话题监听配置
     'TARGET_TOPICS': {
         -1001234567890: [12345]  # Replace with your group -> topic mapping
+    },
+
+    # 多会话配置 (session_pool.py)，为空时只使用上面的单个会话
+    # API_ID / API_HASH 可省略，默认使用上面的值
+    'SESSIONS': [
+        # {'NAME': 'main', 'SESSION_FILE': 'telegram.session', 'PHONE_NUMBER': '+1234567890'},
+        # {'NAME': 'shard2', 'SESSION_FILE': 'telegram_shard2.session', 'PHONE_NUMBER': '+1234567891'},
+    ],
+    # 频道/群组ID -> 会话名，未列出的频道按ID均匀分配到各会话
+    'SHARD_MAP': {
+        # -1001234567890: 'main',
+    },
+    'QUEUE_WORKERS': 8,  # 共享处理队列的消费者数
+
+    # 频道实体缓存 (entity_cache.py)，缓存有效期内的频道启动/重连时不再请求验证
+    'ENTITY_CACHE_FILE': 'entity_cache.json',  # 会话池中每个会话使用 entity_cache.<NAME>.json
+    'ENTITY_CACHE_TTL': 86400,  # 秒
+    'ENTITY_CONCURRENCY': 8,    # 并发验证数
+
+    # 频道/话题处理配置 (routing.py)，键为频道ID或 (频道ID, 话题ID)，话题级配置优先
+    # EXTRACTOR: 信号提取器名称 ('llm' 远程模型 / 'local' 本地提取)；PROMPT: prompt_templates.py 中的提示词模板 ('default' / 'compact')
+    # SIZING_PROFILE: TRADING_CONFIG['SIZING_PROFILES'] 中的仓位档位
+    'ROUTES': {
+        # -1001234567890: {'EXTRACTOR': 'llm', 'PROMPT': 'compact', 'SIZING_PROFILE': 'default'},
+        # (-1001234567890, 12345): {'SIZING_PROFILE': 'half'},
     }
 }
 
@@ -24,7 +49,39 @@ TELEGRAM_CONFIG = {
 OPENAI_CONFIG = {
     'API_KEY': 'your_openai_api_key_here',
     'BASE_URL': 'https://api.siliconflow.cn/v1',
-    'MODEL': 'Qwen/Qwen3-235B-A22B-Instruct-2507'
+    'MODEL': 'Qwen/Qwen3-235B-A22B-Instruct-2507',
+    # 微批量提取 (batch_extractor.py): 窗口内到达的消息合并为一次请求，0 表示关闭
+    'BATCH_WINDOW_MS': 0,
+    'BATCH_MAX_SIZE': 8,
+    # 流式提取 (json_stream.py): 输出为空对象或信号字段完整时提前结束请求
+    'STREAMING': False,
+
+    # 多服务路由 (llm_router.py)，为空时只使用上面的单个服务
+    # 未填写的 BASE_URL / API_KEY / MODEL 使用上面的值；TYPE 为 'stub' 时为本地桩服务（测试用）
+    'PROVIDERS': [
+        # {'NAME': 'siliconflow', 'MODEL': 'Qwen/Qwen3-235B-A22B-Instruct-2507'},
+        # {'NAME': 'backup', 'BASE_URL': 'https://api.example.com/v1', 'API_KEY': '...', 'MODEL': '...', 'TIMEOUT': 20},
+        # {'NAME': 'stub', 'TYPE': 'stub', 'LATENCY': 0.05},
+    ],
+    'TIMEOUT': 30,                  # 单次请求超时(秒)
+    'HEDGE_PERCENTILE': 0.95,       # 超过首选服务该分位延迟仍未返回时发出对冲请求
+    'HEDGE_DELAY_MIN': 1.0,         # 对冲等待下限(秒)
+    'HEDGE_DELAY_DEFAULT': 5.0,     # 延迟样本不足时的对冲等待(秒)
+    'RETRIES': 2,                   # 没有其他可用服务时，对同一服务的重试次数（429/5xx/连接错误）
+    'RETRY_BACKOFF': 0.5,           # 重试等待基数(秒)，每次翻倍并加随机抖动
+    'RETRY_BACKOFF_MAX': 8.0,       # 重试等待上限(秒)
+    'MAX_CONCURRENCY': 64,          # 同时进行的模型请求数上限（每个服务；提取线程池大小相同）
+    'BREAKER_FAILURES': 3,          # 连续失败次数达到后熔断
+    'BREAKER_RESET_SECONDS': 30     # 熔断后多久放行试探请求
+}
+
+# 本地信号提取配置 (local_extractor.py)，在 ROUTES 中设置 'EXTRACTOR': 'local' 的频道使用
+LOCAL_EXTRACTOR_CONFIG = {
+    'BACKEND': 'rules',             # 'rules' 规则解析，或 'llama_cpp' 本地量化模型（需安装 llama-cpp-python）
+    'MODEL_PATH': 'models/qwen2.5-1.5b-instruct-q4_k_m.gguf',
+    'N_CTX': 2048,
+    'N_THREADS': None,              # None 表示使用全部 CPU 核心
+    'MAX_TOKENS': 256
 }
 
 # Gate.io API配置
@@ -34,14 +91,142 @@ GATE_CONFIG = {
     'HOST': 'https://fx-api-testnet.gateio.ws/api/v4',
     'SETTLE': 'usdt',  # 结算货币
     'LEVERAGE': 10,    # 默认杠杆
-    'MARGIN_AMOUNT': 50  # 固定保证金金额(USDT)
+    'MARGIN_AMOUNT': 50,  # 固定保证金金额(USDT)
+    'MODE': 'live'     # 'live' 向交易所下单；'paper' 使用进程内模拟交易所 (PAPER_CONFIG)，不提交任何订单
+}
+
+# 模拟交易所配置 (paper_exchange.py)，GATE_CONFIG['MODE'] = 'paper' 时使用
+PAPER_CONFIG = {
+    'MARKET_DATA': 'local',                             # 'live' 影子模式读取 Gate 公共行情；'local' 使用下方的规格和价格
+    'MARKET_DATA_HOST': 'https://api.gateio.ws/api/v4',  # 影子模式的行情地址（公共接口，无需密钥）
+    'FEED_INTERVAL': 1,         # 行情更新间隔(秒)
+    'CONTRACTS_REFRESH': 300,   # 影子模式遇到未知合约时，距上次加载合约列表超过该时间(秒)才重新加载
+    'VOLATILITY': 0,            # 本地行情每次更新的随机波动（标准差，比例），0 表示价格只由 set_price() 改变
+    'BALANCE': 10000,           # 每个模拟账户的初始余额(USDT)
+    'TAKER_FEE': 0.0005,        # 吃单手续费率
+    'MAKER_FEE': 0.0002,        # 挂单手续费率
+    'SLIPPAGE': 0.0005,         # 市价单滑点（比例）
+    'HISTORY_SIZE': 1000,       # 每个账户保留的已完成订单数
+    'LATENCY': 0,               # 每次接口调用的模拟延迟(秒)，压测时模拟交易所往返时间
+    'PRICES': {'BTC_USDT': 118000, 'ETH_USDT': 3700},   # 本地行情的初始价格
+    'CONTRACTS': {              # 本地行情的合约规格，只设置了价格的合约使用 DEFAULT_CONTRACT
+        'BTC_USDT': {'quanto_multiplier': '0.0001', 'order_price_round': '0.1'},
+        'ETH_USDT': {'quanto_multiplier': '0.01', 'order_price_round': '0.01'}
+    },
+    'DEFAULT_CONTRACT': {
+        'quanto_multiplier': '1', 'order_price_round': '0.0001', 'order_size_min': 1, 'order_size_max': 1000000,
+        'leverage_min': '1', 'leverage_max': '100'
+    }
 }
 
+# 多账户配置 (multi_account.py)
+# 为空时只使用 GATE_CONFIG 中的账户；配置后每个信号会并发地在所有启用的账户下单，
+# 未填写的字段（HOST、LEVERAGE、MARGIN_AMOUNT）使用 GATE_CONFIG 的值
+GATE_ACCOUNTS = [
+    # {
+    #     'NAME': 'sub1',
+    #     'API_KEY': 'your_sub1_api_key_here',
+    #     'API_SECRET': 'your_sub1_api_secret_here',
+    #     'LEVERAGE': 10,
+    #     'MARGIN_AMOUNT': 50,
+    #     'ENABLED': True
+    # },
+]
+
 # 交易策略配置
 TRADING_CONFIG = {
     'TAKE_PROFIT_MODE': 'first_price',  # 止盈模式: 'first_price' 或 'percentage'
     'TAKE_PROFIT_PERCENTAGE': 2.0,      # 止盈百分比 (当模式为percentage时使用)
-    'STOP_LOSS_PERCENTAGE': 1.5         # 止损百分比 (备用，如果信号中没有止损价格)
+    'STOP_LOSS_PERCENTAGE': 1.5,        # 止损百分比 (备用，如果信号中没有止损价格)
+    'ALLOW_DUPLICATE_POSITION': False,  # 同一合约已有持仓或挂单时是否仍然开新仓
+    # 仓位档位: MARGIN_SCALE 为相对账户保证金的倍数，按频道/话题在 TELEGRAM_CONFIG['ROUTES'] 中选择
+    'SIZING_PROFILES': {
+        'default': {'MARGIN_SCALE': 1.0},
+        'half': {'MARGIN_SCALE': 0.5}
+    }
+}
+
+# 信号修改/取消跟踪配置 (signal_tracker.py)
+SIGNAL_UPDATE_CONFIG = {
+    'ENABLED': True,
+    'WINDOW': 21600,                # 没有回复链时，只匹配该时间(秒)内的信号
+    'RECENT_PER_CHAT': 10,          # 每个频道跟踪的最近信号数
+    'MAX_TEXT_LENGTH': 80,          # 超过该长度的消息不识别为修改指令
+    'MAX_STOP_DEVIATION': 0.2       # 新止损与入场价的最大偏离比例，超出视为误识别
+}
+
+# 信号历史配置 (signal_history.py)
+SIGNAL_HISTORY_CONFIG = {
+    'CAPACITY': 1000,               # 内存中保留的最近信号数，超出后覆盖最旧的
+    'DEDUP_ENABLED': True,          # 是否跳过重复信号（多个频道转发的同一信号）
+    'DEDUP_WINDOW': 300,            # 重复信号判定的时间窗口(秒)
+    'DEDUP_PRICE_TOLERANCE': 0.001  # 入场价/止损的相对误差在该范围内视为相同
+}
+
+# 下单模板配置 (order_templates.py)
+TEMPLATE_CONFIG = {
+    'PRICE_FEED_ENABLED': True,     # 是否后台批量刷新全部合约最新价（开仓时不再单独查询合约）
+    'PRICE_REFRESH_INTERVAL': 2,    # 行情刷新间隔(秒)
+    'PRICE_MAX_AGE': 10             # 缓存价格的最长有效期(秒)，过期后下单前查询交易所
+}
+
+# 持仓/订单簿配置 (position_book.py)
+BOOK_CONFIG = {
+    'RECONCILE_INTERVAL': 30,           # 与交易所对账间隔(秒)
+    'USER_STREAM_ENABLED': False,       # 是否订阅 Gate WebSocket 用户数据流 (需要 websockets)
+    'WS_HOST': 'wss://fx-ws-testnet.gateio.ws/v4/ws/usdt',
+    'WS_RECONNECT_DELAY': 1,            # 用户数据流断开后的首次重连等待(秒)，之后按指数退避
+    'WS_RECONNECT_MAX_DELAY': 60,       # 重连等待上限(秒)
+    'FINISHED_ORDER_HISTORY': 1000      # 记住已完成订单累计成交量的数量，用于忽略重复的回执/推送
+}
+
+# 下单前风控配置 (risk_engine.py)，设为 None 表示不限制
+RISK_CONFIG = {
+    'ENABLED': True,
+    'MAX_OPEN_POSITIONS': 5,            # 最多同时持有的合约数（含未成交入场单）
+    'MAX_NOTIONAL_PER_CONTRACT': 2000,  # 单个合约最大名义价值(USDT)，含本次下单
+    'MAX_TOTAL_NOTIONAL': 5000,         # 全部合约最大名义价值(USDT)，含本次下单
+    'MAX_SIGNALS_PER_CHANNEL': 3,       # 每个频道/群组在窗口期内最多执行的信号数
+    'CHANNEL_WINDOW_SECONDS': 3600,     # 频道信号计数窗口(秒)
+    'CONTRACT_COOLDOWN_SECONDS': 300,   # 同一合约两次开仓的最小间隔(秒)
+    'MAX_LIMIT_DISTANCE_PCT': 5.0       # 限价入场价偏离最新价的最大百分比
+}
+
+# Gate.io 请求限流配置 (request_scheduler.py)
+RATE_LIMIT_CONFIG = {
+    # 令牌桶: 名称 -> (每秒补充令牌数, 桶容量)
+    'BUCKETS': {
+        'order': (10, 10),    # 下单 (含价格触发单)，Gate 限制 100次/10秒
+        'cancel': (20, 20),   # 撤单
+        'query': (20, 20)     # 查询类接口
+    },
+    # 接口 -> 令牌桶，未列出的接口使用 'query'
+    'ENDPOINTS': {
+        'create_futures_order': 'order',
+        'create_price_triggered_order': 'order',
+        'amend_futures_order': 'order',
+        'cancel_futures_order': 'cancel',
+        'cancel_price_triggered_order': 'cancel'
+    },
+    'MAX_RETRIES': 3,         # 遇到限流(429)时的最大重试次数
+    'BACKOFF_BASE': 0.5,      # 重试退避基数(秒)
+    'BACKOFF_MAX': 8.0        # 重试退避上限(秒)
+}
+
+# 分进程流水线配置 (pipeline.py / message_bus.py)
+PIPELINE_CONFIG = {
+    'BUS_FILE': 'pipeline_bus.db',      # SQLite 消息总线文件（各进程共享）
+    'POLL_INTERVAL_MIN': 0.005,         # 空队列轮询最小间隔(秒)
+    'POLL_INTERVAL_MAX': 0.05,          # 空队列轮询最大间隔(秒)
+    'VISIBILITY_TIMEOUT': 120,          # 已领取但未确认的消息超过该时间(秒)后重新投递
+    'MAX_ATTEMPTS': 3                   # 单条消息最大投递次数，超过后进入死信
+}
+
+# 配置热更新 (config_reloader.py)
+# 运行中修改该 JSON 文件即可覆盖监听目标、交易参数、杠杆/保证金和风控参数，无需重启
+RELOAD_CONFIG = {
+    'FILE': 'runtime_config.json',
+    'INTERVAL': 2                       # 检查文件变化的间隔(秒)
 }
 
 # 其他配置
@@ -49,3 +234,34 @@ OTHER_CONFIG = {
     'SIGNALS_FILE': 'trading_signals.json',
     'LOG_FILE': 'telegram_monitor.log'
 }
+
+# 信号与交易数据库配置 (signal_store.py)
+STORE_CONFIG = {
+    'ENABLED': True,            # 是否同时写入 SQLite 数据库（信号文件照常写入）
+    'DB_FILE': 'signals.db'     # SQLite 数据库文件
+}
+
+# 参数扫描配置 (param_sweep.py)
+SWEEP_CONFIG = {
+    'PRICE_DATA_DIR': 'price_data',         # 本地K线目录, 文件名格式: BTC_USDT_1m.csv
+    'CANDLE_INTERVAL': '1m',                # 回测使用的K线周期
+    'CACHE_FILE': 'sweep_cache.json',       # 结果缓存 (按配置哈希)
+    'ENTRY_TIMEOUT_MINUTES': 240,           # 限价单最长等待成交时间
+    'MAX_HOLD_MINUTES': 2880,               # 最长持仓时间，超时按收盘价平仓
+    'FEE_RATE': 0.0005,                     # 单边手续费率
+    # 网格/随机搜索的参数空间（止损始终使用信号止损，与实盘一致，不参与扫描；
+    # 盈亏与保证金成正比、结果按保证金收益率排序，保证金使用 GATE_CONFIG['MARGIN_AMOUNT']，不参与扫描）
+    'PARAM_GRID': {
+        'TAKE_PROFIT_MODE': ['first_price', 'percentage'],
+        'TAKE_PROFIT_PERCENTAGE': [1.0, 1.5, 2.0, 3.0],
+        'LEVERAGE': [5, 10, 20]
+    }
+}
+
+# 本地K线存储配置 (candle_store.py)
+CANDLE_CONFIG = {
+    'HOST': 'https://api.gateio.ws/api/v4',  # K线下载地址（主网公共接口，无需密钥）；GATE_CONFIG['HOST'] 为测试网，价格与信号不符
+    'DB_FILE': 'candles.db',     # SQLite 数据库文件
+    'BATCH_LIMIT': 1000,         # 单次请求的最大K线数量 (Gate 上限 2000)
+    'REQUEST_INTERVAL': 0.2      # 分批下载之间的间隔(秒)，避免触发限流
+}
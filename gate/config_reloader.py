@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+配置热更新模块
+轮询运行时配置文件 (JSON)，使用 Pydantic 校验后在事件循环中一次性替换路由表，
+并原地更新 TELEGRAM_CONFIG / TRADING_CONFIG / GATE_CONFIG / RISK_CONFIG，无需重启进程或重连 Telegram。
+每次应用都以 config.py 中的原始值为基础重新构建（原始值 | 文件中的覆盖项），
+文件中删除的字段或删除整个文件后恢复为原始值。文件中各部分均可省略，只需写出要覆盖的字段，例如:
+
+    {
+        "TELEGRAM": {"TARGET_TOPICS": {"-1001234567890": [12345, 678]},
+                     "ROUTES": {"-1001234567890:678": {"SIZING_PROFILE": "half"}}},
+        "TRADING": {"TAKE_PROFIT_MODE": "percentage"},
+        "GATE": {"MARGIN_AMOUNT": 30}
+    }
+
+ROUTES 的话题级键写作 "频道ID:话题ID"。ROUTES 和 SIZING_PROFILES 按键与原始值合并，其余字段整体替换。
+校验失败时保留当前配置。
+"""
+
+import asyncio
+import copy
+import json
+import logging
+import os
+from typing import Any, Callable, Dict, List, Literal, Optional
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+
+# 导入配置
+from config import GATE_CONFIG, RELOAD_CONFIG, RISK_CONFIG, TELEGRAM_CONFIG, TRADING_CONFIG
+import routing
+
+# 设置日志
+logger = logging.getLogger(__name__)
+
+
+class _Section(BaseModel):
+    # 拼写错误的字段直接报错，而不是被静默忽略
+    model_config = ConfigDict(extra='forbid')
+
+
+class RouteOptions(_Section):
+    EXTRACTOR: Optional[str] = None
+    SIZING_PROFILE: Optional[str] = None
+    PROMPT: Optional[str] = None
+
+
+class TelegramSection(_Section):
+    TARGET_CHANNEL_IDS: Optional[List[int]] = None
+    TARGET_TOPICS: Optional[Dict[int, List[int]]] = None
+    ROUTES: Optional[Dict[str, RouteOptions]] = None
+
+
+class SizingProfile(_Section):
+    MARGIN_SCALE: float = Field(1.0, gt=0)
+
+
+class TradingSection(_Section):
+    TAKE_PROFIT_MODE: Optional[Literal['first_price', 'percentage']] = None
+    TAKE_PROFIT_PERCENTAGE: Optional[float] = Field(None, gt=0)
+    STOP_LOSS_PERCENTAGE: Optional[float] = Field(None, gt=0)
+    ALLOW_DUPLICATE_POSITION: Optional[bool] = None
+    SIZING_PROFILES: Optional[Dict[str, SizingProfile]] = None
+
+
+class GateSection(_Section):
+    LEVERAGE: Optional[int] = Field(None, ge=1, le=125)
+    MARGIN_AMOUNT: Optional[float] = Field(None, gt=0)
+
+
+class RiskSection(_Section):
+    ENABLED: Optional[bool] = None
+    MAX_OPEN_POSITIONS: Optional[int] = Field(None, ge=0)
+    MAX_NOTIONAL_PER_CONTRACT: Optional[float] = Field(None, gt=0)
+    MAX_TOTAL_NOTIONAL: Optional[float] = Field(None, gt=0)
+    MAX_SIGNALS_PER_CHANNEL: Optional[int] = Field(None, ge=0)
+    CHANNEL_WINDOW_SECONDS: Optional[float] = Field(None, ge=0)
+    CONTRACT_COOLDOWN_SECONDS: Optional[float] = Field(None, ge=0)
+    MAX_LIMIT_DISTANCE_PCT: Optional[float] = Field(None, gt=0)
+
+
+class RuntimeConfig(_Section):
+    TELEGRAM: TelegramSection = TelegramSection()
+    TRADING: TradingSection = TradingSection()
+    GATE: GateSection = GateSection()
+    RISK: RiskSection = RiskSection()
+
+
+def _parse_route_key(key: str):
+    """"频道ID" -> int，"频道ID:话题ID" -> (int, int)"""
+    if ':' in key:
+        chat_id, topic_id = key.split(':', 1)
+        return int(chat_id), int(topic_id)
+    return int(key)
+
+
+def _overrides(section: BaseModel) -> Dict[str, Any]:
+    return section.model_dump(exclude_none=True)
+
+
+# 运行时可覆盖的配置及其在 config.py 中的原始值（导入时的快照）
+_SECTIONS = (('TELEGRAM', TELEGRAM_CONFIG), ('TRADING', TRADING_CONFIG), ('GATE', GATE_CONFIG), ('RISK', RISK_CONFIG))
+_BASE = {name: copy.deepcopy(config) for name, config in _SECTIONS}
+# 按键与原始值合并（而不是整体替换）的字段
+_MERGED_KEYS = ('ROUTES', 'SIZING_PROFILES')
+
+
+def _rebuild(base: Dict[str, Any], overrides: Dict[str, Any]) -> Dict[str, Any]:
+    """原始值 | 覆盖项"""
+    result = copy.deepcopy(base)
+    for key, value in overrides.items():
+        if key in _MERGED_KEYS and isinstance(result.get(key), dict):
+            result[key] = {**result[key], **value}
+        else:
+            result[key] = value
+    return result
+
+
+class ConfigReloader:
+    """运行时配置文件监视器"""
+
+    def __init__(self, path: str = None, interval: float = None):
+        self.path = path or RELOAD_CONFIG['FILE']
+        self.interval = interval or RELOAD_CONFIG['INTERVAL']
+        self._mtime: Optional[float] = None
+        # 路由表替换后的回调 (旧路由表, 新路由表)，按注册顺序调用
+        self._listeners: List[Callable[[routing.RoutingTable, routing.RoutingTable], None]] = []
+        self.reloads = 0
+
+    def add_listener(self, callback: Callable[[routing.RoutingTable, routing.RoutingTable], None]):
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def load(self) -> Optional[RuntimeConfig]:
+        """读取并校验配置文件，文件不存在或校验失败时返回 None"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            runtime = RuntimeConfig.model_validate(data)
+            # 提前解析路由键，避免替换到一半才发现错误
+            for key in (runtime.TELEGRAM.ROUTES or {}):
+                _parse_route_key(key)
+            return runtime
+        except FileNotFoundError:
+            return None
+        except (json.JSONDecodeError, ValidationError, ValueError) as e:
+            print(f"❌ 运行时配置 {self.path} 无效，保留当前配置: {e}")
+            logger.error(f"运行时配置校验失败: {e}")
+            return None
+
+    def apply(self, runtime: RuntimeConfig):
+        """
+        应用已校验的配置。整个过程没有 await，对事件循环中的其他协程是原子的:
+        它们要么看到全部旧配置，要么看到全部新配置。
+        """
+        overrides = {name: _overrides(getattr(runtime, name)) for name, _ in _SECTIONS}
+        telegram = overrides['TELEGRAM']
+        if 'ROUTES' in telegram:
+            telegram['ROUTES'] = {_parse_route_key(key): options for key, options in telegram['ROUTES'].items()}
+        rebuilt = {name: _rebuild(_BASE[name], overrides[name]) for name, _ in _SECTIONS}
+        new_table = routing.RoutingTable.from_config(rebuilt['TELEGRAM'])
+
+        # 其他模块持有这些字典的引用，原地替换内容
+        for name, config in _SECTIONS:
+            config.clear()
+            config.update(rebuilt[name])
+        old_table = routing.routing_table
+        routing.routing_table = new_table
+
+        self.reloads += 1
+        print(f"🔄 已应用运行时配置 {self.path} (第 {self.reloads} 次)")
+        if new_table.chats != old_table.chats:
+            print(f"   监听目标变更: +{sorted(new_table.chats - old_table.chats)} -{sorted(old_table.chats - new_table.chats)}")
+        for callback in list(self._listeners):
+            try:
+                callback(old_table, new_table)
+            except Exception as e:
+                logger.error(f"配置更新回调失败: {e}")
+
+    def check(self) -> bool:
+        """文件有变化时重新加载，返回是否应用了新配置"""
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            if self._mtime is None:
+                return False
+            # 文件被删除: 恢复 config.py 中的原始值
+            self._mtime = None
+            self.apply(RuntimeConfig())
+            return True
+        if mtime == self._mtime:
+            return False
+        self._mtime = mtime
+        runtime = self.load()
+        if runtime is None:
+            return False
+        self.apply(runtime)
+        return True
+
+    async def watch(self):
+        """定期检查配置文件，直到任务被取消"""
+        print(f"👀 监视运行时配置文件: {self.path} (每 {self.interval} 秒)")
+        while True:
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"检查运行时配置失败: {e}")
+            await asyncio.sleep(self.interval)
+
+
+# 进程内共享的配置监视器
+config_reloader = ConfigReloader()
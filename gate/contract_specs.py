@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+合约规格缓存与下单参数规范化模块
+缓存合约乘数、下单数量上下限和价格精度，在下单前把仓位大小和价格
+转换为交易所可接受的值，避免因精度或数量不合法被拒单后重试。
+"""
+
+import asyncio
+import logging
+import time
+from decimal import Decimal, ROUND_DOWN, ROUND_HALF_UP, ROUND_UP
+from typing import Any, Dict, Optional
+
+# 导入配置
+from config import GATE_CONFIG
+
+# 设置日志
+logger = logging.getLogger(__name__)
+
+# 合约规格缓存有效期(秒)，规格极少变化
+SPEC_TTL = 3600
+
+
+def _spec_from_contract(response: Any) -> Dict[str, Any]:
+    """从 gate-api Contract 对象提取规格"""
+    return {
+        'name': response.name,
+        'quanto_multiplier': float(response.quanto_multiplier or 1),
+        'order_size_min': int(response.order_size_min or 1),
+        'order_size_max': int(response.order_size_max or 0),
+        'order_price_round': str(response.order_price_round or '0'),
+        'leverage_min': float(response.leverage_min),
+        'leverage_max': float(response.leverage_max),
+        'update_time': time.time()
+    }
+
+
+class ContractSpecCache:
+    """合约规格缓存，按合约名索引"""
+
+    def __init__(self, ttl: float = SPEC_TTL):
+        self.ttl = ttl
+        self.specs: Dict[str, Dict[str, Any]] = {}
+
+    def get(self, contract: str) -> Optional[Dict[str, Any]]:
+        """获取未过期的规格，不存在或已过期时返回 None"""
+        spec = self.specs.get(contract)
+        if spec and time.time() - spec['update_time'] < self.ttl:
+            return spec
+        return None
+
+    def update_from_contract(self, response: Any) -> Dict[str, Any]:
+        """用一次合约查询的结果更新缓存"""
+        spec = _spec_from_contract(response)
+        self.specs[spec['name']] = spec
+        return spec
+
+    def multiplier(self, contract: str) -> float:
+        spec = self.specs.get(contract)
+        return spec['quanto_multiplier'] if spec else 1.0
+
+    async def refresh_all(self, futures_api: Any, settle: str = None) -> int:
+        """一次请求加载全部合约规格（启动时预热）"""
+        settle = settle or GATE_CONFIG['SETTLE']
+        contracts = await asyncio.to_thread(futures_api.list_futures_contracts, settle)
+        for response in contracts:
+            self.update_from_contract(response)
+        logger.info(f"合约规格缓存已加载: {len(contracts)} 个合约")
+        return len(contracts)
+
+
+def round_price(price: float, spec: Dict[str, Any], rounding: str = ROUND_HALF_UP) -> str:
+    """按合约价格精度 (order_price_round) 取整，返回交易所要求的字符串格式"""
+    tick = Decimal(spec['order_price_round'])
+    value = Decimal(str(price))
+    if tick > 0:
+        value = (value / tick).quantize(Decimal('1'), rounding=rounding) * tick
+    return format(value.normalize(), 'f')
+
+
+def round_entry_price(price: float, direction: str, spec: Dict[str, Any]) -> str:
+    """限价入场价取整: 多单向下、空单向上，保证不比信号价格更差"""
+    return round_price(price, spec, ROUND_DOWN if direction == 'long' else ROUND_UP)
+
+
+def calculate_contract_size(margin: float, leverage: float, entry_price: float, spec: Dict[str, Any]) -> int:
+    """
+    计算合约张数: 名义价值 / (价格 * 合约乘数)，向下取整，
+    并限制在 [order_size_min, order_size_max] 范围内。
+    """
+    multiplier = spec['quanto_multiplier'] or 1.0
+    raw_size = margin * leverage / (entry_price * multiplier)
+    size = int(raw_size)
+
+    size_min = spec['order_size_min']
+    size_max = spec['order_size_max']
+    if size < size_min:
+        logger.warning(f"{spec['name']} 计算张数 {raw_size:.4f} 小于最小下单量，调整为 {size_min}")
+        size = size_min
+    if size_max and size > size_max:
+        logger.warning(f"{spec['name']} 计算张数 {size} 超过最大下单量，调整为 {size_max}")
+        size = size_max
+    return size
+
+
+# 进程内共享的合约规格缓存
+contract_specs = ContractSpecCache()
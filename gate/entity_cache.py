@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+频道实体缓存模块
+启动和重连时并发验证目标频道/超级群组，验证结果（标题、access_hash）持久化到本地文件，
+缓存未过期的目标不再请求 Telegram，重启和断线重连都可以跳过重复的 get_entity 调用。
+"""
+
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+# 导入配置
+from config import TELEGRAM_CONFIG
+
+# 设置日志
+logger = logging.getLogger(__name__)
+
+
+def cache_path_for(session_name: str = None) -> str:
+    """
+    会话的缓存文件: access_hash 只对获取它的账户有效，会话池中每个会话使用单独的文件，
+    例如 entity_cache.shard2.json；不指定会话时使用 ENTITY_CACHE_FILE。
+    """
+    path = TELEGRAM_CONFIG.get('ENTITY_CACHE_FILE', 'entity_cache.json')
+    if not session_name:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{session_name}{ext}"
+
+
+# 同一进程内多个缓存实例保存同一文件时串行执行
+_save_lock = threading.Lock()
+
+
+class EntityCache:
+    """频道ID -> {title, access_hash, verified_at} 的本地缓存"""
+
+    def __init__(self, path: str = None, ttl: float = None):
+        self.path = path or TELEGRAM_CONFIG.get('ENTITY_CACHE_FILE', 'entity_cache.json')
+        self.ttl = ttl if ttl is not None else TELEGRAM_CONFIG.get('ENTITY_CACHE_TTL', 86400)
+        self.entries: Dict[int, Dict[str, Any]] = self._read()
+
+    def _read(self) -> Dict[int, Dict[str, Any]]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return {int(chat_id): entry for chat_id, entry in json.load(f).items()}
+        except (FileNotFoundError, json.JSONDecodeError, ValueError):
+            return {}
+
+    def save(self):
+        """
+        与文件中的现有条目合并后保存（同一频道保留较新的验证结果），不会覆盖其他实例写入的条目。
+        先写唯一的临时文件再替换，避免进程中断时留下损坏的缓存，并发保存也不会互相覆盖临时文件。
+        """
+        with _save_lock:
+            merged = self._read()
+            for chat_id, entry in list(self.entries.items()):
+                current = merged.get(chat_id)
+                if current is None or current.get('verified_at', 0) <= entry['verified_at']:
+                    merged[chat_id] = entry
+            directory, name = os.path.split(os.path.abspath(self.path))
+            fd, tmp_path = tempfile.mkstemp(prefix=f"{name}.", suffix='.tmp', dir=directory)
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump({str(chat_id): entry for chat_id, entry in merged.items()}, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+
+    def get(self, chat_id: int, now: float = None) -> Optional[Dict[str, Any]]:
+        """返回未过期的缓存条目"""
+        entry = self.entries.get(chat_id)
+        if entry is None:
+            return None
+        if self.ttl and (now or time.time()) - entry['verified_at'] > self.ttl:
+            return None
+        return entry
+
+    def put(self, chat_id: int, entity):
+        self.entries[chat_id] = {
+            'title': getattr(entity, 'title', None) or getattr(entity, 'first_name', None) or str(chat_id),
+            'access_hash': getattr(entity, 'access_hash', None),
+            'verified_at': time.time()
+        }
+
+
+async def verify_entities(client, chat_ids: Iterable[int], cache: EntityCache,
+                          concurrency: int = None) -> Dict[str, Any]:
+    """
+    并发验证频道访问权限，缓存命中的频道直接跳过。
+    返回 {'entities': {频道ID: 缓存条目}, 'failed': {频道ID: 错误}, 'cached': 命中数, 'fetched': 请求数, 'elapsed_ms': 耗时}
+    """
+    start = time.perf_counter()
+    concurrency = concurrency or TELEGRAM_CONFIG.get('ENTITY_CONCURRENCY', 8)
+    semaphore = asyncio.Semaphore(concurrency)
+    entities: Dict[int, Dict[str, Any]] = {}
+    failed: Dict[int, str] = {}
+    missing = []
+
+    now = time.time()
+    for chat_id in chat_ids:
+        entry = cache.get(chat_id, now)
+        if entry is not None:
+            entities[chat_id] = entry
+        else:
+            missing.append(chat_id)
+    cached = len(entities)
+
+    async def fetch(chat_id: int):
+        async with semaphore:
+            try:
+                entity = await client.get_entity(chat_id)
+            except Exception as e:
+                failed[chat_id] = str(e)
+                return
+        cache.put(chat_id, entity)
+        entities[chat_id] = cache.entries[chat_id]
+
+    if missing:
+        await asyncio.gather(*(fetch(chat_id) for chat_id in missing))
+        try:
+            await asyncio.to_thread(cache.save)
+        except OSError as e:
+            logger.error(f"保存实体缓存失败: {e}")
+
+    return {
+        'entities': entities,
+        'failed': failed,
+        'cached': cached,
+        'fetched': len(missing),
+        'elapsed_ms': (time.perf_counter() - start) * 1000
+    }
@@ -7,12 +7,29 @@ Gate.io 合约交易模块
 import gate_api
 from gate_api.exceptions import ApiException, GateApiException
 import logging
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 from decimal import Decimal, ROUND_DOWN
 import asyncio
 
 # 导入配置
-from config import GATE_CONFIG, TRADING_CONFIG
+from config import BOOK_CONFIG, GATE_CONFIG, SIGNAL_UPDATE_CONFIG, TRADING_CONFIG
+# 导入持仓/订单簿
+from position_book import PositionBook, GateUserStream, position_book
+# 导入风控
+from risk_engine import RiskEngine, RiskRejection, risk_engine
+# 导入请求调度器（限流、优先级、限流重试）
+from request_scheduler import (
+    RequestScheduler, request_scheduler, PRIORITY_ENTRY, PRIORITY_PROTECTIVE, PRIORITY_QUERY
+)
+# 导入合约规格缓存
+from contract_specs import ContractSpecCache, contract_specs
+
+# 导入信号修改/取消指令类型
+from signal_tracker import SignalUpdate, UPDATE_CANCEL, UPDATE_STOP_LOSS
+# 导入下单模板（请求体骨架 + 最新价缓存）
+from order_templates import OrderTemplateCache, order_templates
+# 导入模拟交易所（纸面交易模式）
+from paper_exchange import paper_exchange
 
 # 设置日志
 logger = logging.getLogger(__name__)
@@ -20,20 +37,50 @@ logger = logging.getLogger(__name__)
 class GateTrading:
     """Gate.io合约交易类"""
 
-    def __init__(self):
-        """初始化Gate.io API客户端"""
+    def __init__(self, book: PositionBook = None, risk: RiskEngine = None, specs: ContractSpecCache = None,
+                 scheduler: RequestScheduler = None, account: Dict[str, Any] = None,
+                 templates: OrderTemplateCache = None, futures_api: Any = None):
+        """
+        初始化Gate.io API客户端
+        account 为 GATE_ACCOUNTS 中的子账户配置，未提供的字段使用 GATE_CONFIG 的默认值
+        futures_api 可替换为实现相同接口的对象；GATE_CONFIG['MODE'] 为 'paper' 时使用模拟交易所的账户
+        """
+        account = account or {}
+        self.account = account
+        self.account_name = account.get('NAME', 'default')
         self.configuration = gate_api.Configuration(
-            host=GATE_CONFIG['HOST'],
-            key=GATE_CONFIG['API_KEY'],
-            secret=GATE_CONFIG['API_SECRET']
+            host=account.get('HOST', GATE_CONFIG['HOST']),
+            key=account.get('API_KEY', GATE_CONFIG['API_KEY']),
+            secret=account.get('API_SECRET', GATE_CONFIG['API_SECRET'])
         )
         self.api_client = gate_api.ApiClient(self.configuration)
-        self.futures_api = gate_api.FuturesApi(self.api_client)
+        self.paper = futures_api is None and GATE_CONFIG.get('MODE', 'live') == 'paper'
+        if self.paper:
+            futures_api = paper_exchange.account(self.account_name, leverage=self.leverage,
+                                                 balance=account.get('PAPER_BALANCE'))
+        self.futures_api = futures_api or gate_api.FuturesApi(self.api_client)
         self.settle = GATE_CONFIG['SETTLE']
-        self.leverage = GATE_CONFIG['LEVERAGE']
-        self.margin_amount = GATE_CONFIG['MARGIN_AMOUNT']
-
-        logger.info(f"Gate.io交易客户端初始化完成 - 结算货币: {self.settle}, 杠杆: {self.leverage}x, 保证金: {self.margin_amount} USDT")
+        # 本地持仓/订单簿，由下单回执、用户数据流和定期对账维护
+        self.book = book or position_book
+        # 下单前风控，基于本地订单簿
+        self.risk = risk or risk_engine
+        # 合约规格缓存（乘数、数量上下限、价格精度）
+        self.specs = specs or contract_specs
+        # 所有交易所请求经由调度器发出
+        self.scheduler = scheduler or request_scheduler
+        # 按合约预先准备的下单请求体和最新价，信号到达后只需填入数量和价格
+        self.templates = templates or (order_templates if self.specs is contract_specs else OrderTemplateCache(self.specs))
+
+        logger.info(f"Gate.io交易客户端初始化完成 [{self.account_name}]{' (模拟交易)' if self.paper else ''} - 结算货币: {self.settle}, 杠杆: {self.leverage}x, 保证金: {self.margin_amount} USDT")
+
+    @property
+    def leverage(self) -> int:
+        # 每次读取 GATE_CONFIG，配置热更新后立即生效
+        return self.account.get('LEVERAGE', GATE_CONFIG['LEVERAGE'])
+
+    @property
+    def margin_amount(self) -> float:
+        return self.account.get('MARGIN_AMOUNT', GATE_CONFIG['MARGIN_AMOUNT'])
 
     async def get_contract_info(self, symbol: str) -> Optional[Dict[str, Any]]:
         """获取合约信息"""
@@ -41,16 +88,21 @@ class GateTrading:
             # 转换交易对格式 (BTC/USDT -> BTC_USDT) 并转换为大写
             contract = symbol.replace('/', '_').upper()
 
-            # 使用异步方式调用API
-            response = await asyncio.to_thread(self.futures_api.get_futures_contract, self.settle, contract)
+            # 经由请求调度器异步调用API
+            response = await self.scheduler.call('get_futures_contract', self.futures_api.get_futures_contract,
+                                                 self.settle, contract, priority=PRIORITY_QUERY)
+            # 顺带刷新规格缓存和最新价缓存
+            spec = self.specs.update_from_contract(response)
+            self.templates.update_price(contract, float(response.last_price))
 
             contract_info = {
                 'name': response.name,
-                'leverage_min': float(response.leverage_min),
-                'leverage_max': float(response.leverage_max),
-                'order_size_min': response.order_size_min,
-                'order_size_max': response.order_size_max,
-                'order_price_round': response.order_price_round,
+                'leverage_min': spec['leverage_min'],
+                'leverage_max': spec['leverage_max'],
+                'quanto_multiplier': spec['quanto_multiplier'],
+                'order_size_min': spec['order_size_min'],
+                'order_size_max': spec['order_size_max'],
+                'order_price_round': spec['order_price_round'],
                 'mark_price': float(response.mark_price),
                 'last_price': float(response.last_price)
             }
@@ -62,26 +114,31 @@ class GateTrading:
             logger.error(f"获取合约信息失败 {symbol}: {e}")
             return None
 
-    def calculate_position_size(self, symbol: str, entry_price: float) -> int:
-        """根据固定保证金计算仓位大小"""
+    def margin_for_profile(self, sizing_profile: str = None) -> float:
+        """按仓位档位缩放账户保证金，未知档位按 1 倍处理"""
+        profile = TRADING_CONFIG.get('SIZING_PROFILES', {}).get(sizing_profile or 'default', {})
+        return self.margin_amount * profile.get('MARGIN_SCALE', 1.0)
+
+    def calculate_position_size(self, symbol: str, entry_price: float, margin_amount: float = None) -> int:
+        """根据固定保证金和合约规格计算仓位大小（合约张数）"""
         try:
+            contract = symbol.replace('/', '_').upper()
+            margin_amount = self.margin_amount if margin_amount is None else margin_amount
             # 计算名义价值 = 保证金 * 杠杆
-            notional_value = self.margin_amount * self.leverage
+            notional_value = margin_amount * self.leverage
 
-            # 计算合约数量 = 名义价值 / 入场价格
-            raw_position_size = notional_value / entry_price
-            position_size = int(raw_position_size)
-
-            # 如果计算结果小于1，至少设置为1个合约
-            if position_size < 1 and raw_position_size > 0:
-                position_size = 1
-                print(f"⚠️ 计算出的仓位大小小于1，调整为最小值1")
+            # 合约张数 = 名义价值 / (入场价格 * 合约乘数)，并限制在交易所允许的范围内；没有规格信息时按乘数1估算
+            template = self.templates.get(contract)
+            multiplier = template.multiplier
+            raw_position_size = notional_value / (entry_price * multiplier)
+            position_size = template.position_size(margin_amount, self.leverage, entry_price)
 
             print(f"仓位计算详情:")
-            print(f"  保证金: {self.margin_amount} USDT")
+            print(f"  保证金: {margin_amount} USDT")
             print(f"  杠杆: {self.leverage}x")
             print(f"  名义价值: {notional_value} USDT")
             print(f"  入场价格: {entry_price}")
+            print(f"  合约乘数: {multiplier}")
             print(f"  原始计算结果: {raw_position_size:.4f}")
             print(f"  最终仓位大小: {position_size}")
 
@@ -103,16 +160,13 @@ class GateTrading:
             # 根据方向设置订单大小（正数为买入，负数为卖出）
             order_size = size if direction == 'long' else -size
 
-            # 创建市价单
-            futures_order = gate_api.FuturesOrder(
-                contract=contract,
-                size=order_size,
-                price='0',  # 市价单价格设为0
-                tif='ioc'   # 立即成交或取消
-            )
+            # 由模板生成市价单请求体（价格为0，ioc）
+            futures_order = self.templates.get(contract).market_order(order_size)
 
-            # 使用异步方式调用API
-            response = await asyncio.to_thread(self.futures_api.create_futures_order, self.settle, futures_order)
+            # 经由请求调度器异步调用API
+            response = await self.scheduler.call('create_futures_order', self.futures_api.create_futures_order,
+                                                 self.settle, futures_order, priority=PRIORITY_ENTRY)
+            self.book.on_order_update(response)
 
             order_info = {
                 'order_id': response.id,
@@ -139,16 +193,17 @@ class GateTrading:
             # 根据方向设置订单大小
             order_size = size if direction == 'long' else -size
 
-            # 创建限价单
-            futures_order = gate_api.FuturesOrder(
-                contract=contract,
-                size=order_size,
-                price=str(price),
-                tif='gtc'  # 有效直到取消
-            )
+            # 按价格精度取整，避免因精度不合法被拒单
+            template = self.templates.get(contract)
+            price_str = template.format_price(price, direction)
+
+            # 由模板生成限价单请求体（gtc）
+            futures_order = template.limit_order(order_size, price_str)
 
-            # 使用异步方式调用API
-            response = await asyncio.to_thread(self.futures_api.create_futures_order, self.settle, futures_order)
+            # 经由请求调度器异步调用API
+            response = await self.scheduler.call('create_futures_order', self.futures_api.create_futures_order,
+                                                 self.settle, futures_order, priority=PRIORITY_ENTRY)
+            self.book.on_order_update(response)
 
             order_info = {
                 'order_id': response.id,
@@ -159,7 +214,7 @@ class GateTrading:
                 'create_time': response.create_time
             }
 
-            logger.info(f"限价单创建成功: {contract} - 方向: {direction}, 数量: {size}, 价格: {price}, 订单ID: {response.id}")
+            logger.info(f"限价单创建成功: {contract} - 方向: {direction}, 数量: {size}, 价格: {price_str}, 订单ID: {response.id}")
             return order_info
 
         except (GateApiException, ApiException) as e:
@@ -175,18 +230,12 @@ class GateTrading:
             # 根据方向设置订单大小（止盈止损单与开仓方向相反）
             order_size = -size if direction == 'long' else size
 
-            # 创建初始订单（用于止盈止损）
-            initial_order = gate_api.FuturesInitialOrder(
-                contract=contract,
-                size=0,  # 平仓订单size必须为0
-                price=str(order_price) if order_price else '0',  # 0表示市价单
-                close=True,  # 平仓标志
-                reduce_only=True,  # 只减仓
-                tif='ioc' if not order_price else 'gtc'  # 市价单必须使用ioc
-            )
+            template = self.templates.get(contract)
 
-            # 获取当前价格来判断触发规则
-            current_price = (await self.get_contract_info(symbol))['last_price']
+            # 获取当前价格来判断触发规则（优先使用行情缓存）
+            current_price = self.templates.last_price(contract)
+            if current_price is None:
+                current_price = (await self.get_contract_info(symbol))['last_price']
 
             # 创建价格触发器 - 修复参数和逻辑
             # 对于止损：多头止损用<=，空头止损用>=
@@ -198,21 +247,21 @@ class GateTrading:
                 # 这是止盈单
                 rule = 1 if direction == 'long' else 2  # 多头止盈用>=，空头止盈用<=
 
-            trigger = gate_api.FuturesPriceTrigger(
-                strategy_type=0,  # 价格触发策略
-                price_type=0,     # 价格类型：0=最新价格，1=标记价格，2=指数价格
-                price=str(trigger_price),
-                rule=rule
+            # 由模板生成价格触发单请求体（平仓单 size 为 0，未指定委托价时触发后按市价平仓）
+            price_triggered_order = template.trigger_order(
+                template.format_price(trigger_price), rule,
+                template.format_price(order_price) if order_price else None
             )
 
-            # 创建价格触发订单
-            price_triggered_order = gate_api.FuturesPriceTriggeredOrder(
-                initial=initial_order,
-                trigger=trigger
-            )
-
-            # 使用异步方式调用API
-            response = await asyncio.to_thread(self.futures_api.create_price_triggered_order, self.settle, price_triggered_order)
+            # 经由请求调度器异步调用API
+            response = await self.scheduler.call('create_price_triggered_order', self.futures_api.create_price_triggered_order,
+                                                 self.settle, price_triggered_order, priority=PRIORITY_PROTECTIVE)
+            self.book.on_trigger_update({
+                'id': response.id,
+                'status': 'open',
+                'initial': {'contract': contract},
+                'trigger': {'price': trigger_price, 'rule': rule}
+            })
 
             order_info = {
                 'order_id': getattr(response, 'id', None),
@@ -229,8 +278,139 @@ class GateTrading:
             logger.error(f"创建止盈止损单失败 {symbol}: {e}")
             return None
 
+    async def cancel_order(self, contract: str, order_id: str) -> Optional[Dict[str, Any]]:
+        """撤销普通订单（未成交的入场单）"""
+        try:
+            response = await self.scheduler.call('cancel_futures_order', self.futures_api.cancel_futures_order,
+                                                 self.settle, str(order_id), priority=PRIORITY_PROTECTIVE)
+            self.book.on_order_update(response)
+            logger.info(f"撤单成功: {contract} - 订单ID: {order_id}")
+            return {'order_id': response.id, 'status': response.status, 'size': response.size, 'left': response.left}
+
+        except (GateApiException, ApiException) as e:
+            logger.error(f"撤单失败 {contract} {order_id}: {e}")
+            return None
+
+    async def cancel_trigger_order(self, contract: str, order_id: str) -> bool:
+        """撤销价格触发单（止盈止损单）"""
+        try:
+            await self.scheduler.call('cancel_price_triggered_order', self.futures_api.cancel_price_triggered_order,
+                                      self.settle, str(order_id), priority=PRIORITY_PROTECTIVE)
+            self.book.on_trigger_update({'id': order_id, 'status': 'finished', 'initial': {'contract': contract}})
+            logger.info(f"撤销止盈止损单成功: {contract} - 订单ID: {order_id}")
+            return True
+
+        except (GateApiException, ApiException) as e:
+            logger.error(f"撤销止盈止损单失败 {contract} {order_id}: {e}")
+            return False
+
+    async def apply_signal_update(self, signal_data: Dict[str, Any], trade_result: Dict[str, Any],
+                                  update: SignalUpdate) -> Dict[str, Any]:
+        """
+        按修改/取消指令调整已执行信号的订单，trade_result 为本账户的执行结果，其中的订单列表会同步更新。
+        取消: 撤销未成交的入场单；已有持仓时保留持仓和止盈止损单。
+        修改止损/止盈: 先创建新的触发单再撤销旧单，避免出现没有保护单的间隙。
+        """
+        try:
+            contract = trade_result['symbol'].replace('/', '_').upper()
+            if update.kind == UPDATE_CANCEL:
+                return await self._cancel_signal_orders(contract, trade_result)
+            return await self._replace_trigger(contract, signal_data, trade_result, update)
+        except Exception as e:
+            logger.error(f"处理信号修改失败: {e}")
+            return {'success': False, 'error': str(e)}
+
+    async def _cancel_signal_orders(self, contract: str, trade_result: Dict[str, Any]) -> Dict[str, Any]:
+        orders = trade_result['orders']
+        actions = []
+        for order in orders:
+            order_id = str(order['result']['order_id'])
+            if order['type'] == 'limit_entry' and order_id in self.book.orders:
+                if await self.cancel_order(contract, order_id) is None:
+                    return {'success': False, 'error': f'入场单 {order_id} 撤销失败', 'actions': actions}
+                actions.append(f"撤销入场单 {order_id}")
+
+        if self.book.has_position(contract):
+            print(f"⚠️ {contract} 入场单已有成交，保留持仓和止盈止损单")
+            return {'success': True, 'actions': actions, 'note': '已有持仓，保留持仓和止盈止损单'}
+
+        remaining = []
+        for order in orders:
+            if order['type'] in ('stop_loss', 'take_profit'):
+                order_id = order['result']['order_id']
+                if await self.cancel_trigger_order(contract, order_id):
+                    actions.append(f"撤销{order['type']} {order_id}")
+                    continue
+            if order['type'] != 'limit_entry':
+                remaining.append(order)
+        trade_result['orders'] = remaining
+        return {'success': True, 'actions': actions}
+
+    async def _replace_trigger(self, contract: str, signal_data: Dict[str, Any], trade_result: Dict[str, Any],
+                               update: SignalUpdate) -> Dict[str, Any]:
+        symbol = trade_result['symbol']
+        direction = trade_result['direction']
+        entry_price = float(trade_result['entry_price'])
+        if not self.book.has_exposure(contract):
+            return {'success': False, 'error': f'{contract} 没有持仓或挂单'}
+
+        if update.kind == UPDATE_STOP_LOSS:
+            order_type = 'stop_loss'
+            if update.breakeven:
+                position = self.book.get_position(contract)
+                new_price = position['entry_price'] if position and position.get('entry_price') else entry_price
+            else:
+                new_price = float(update.stop_loss)
+            # 与入场价偏离过大的止损多半是识别错误（例如 "止損600點" 或笔误），不执行
+            if abs(new_price - entry_price) / entry_price > SIGNAL_UPDATE_CONFIG.get('MAX_STOP_DEVIATION', 0.2):
+                return {'success': False, 'error': f'新止损 {new_price} 与入场价 {entry_price} 偏离过大'}
+        else:
+            order_type = 'take_profit'
+            if TRADING_CONFIG['TAKE_PROFIT_MODE'] != 'first_price':
+                return {'success': True, 'actions': [], 'note': '百分比止盈模式，目标修改不影响止盈单'}
+            new_price = float(update.targets[0])
+
+        # 新触发价必须在当前价格的正确一侧，否则止损会被当成止盈（或立即触发）
+        contract_info = await self.get_contract_info(symbol)
+        if not contract_info:
+            return {'success': False, 'error': '无法获取合约信息'}
+        current_price = contract_info['last_price']
+        below = new_price < current_price
+        if below != ((direction == 'long') == (order_type == 'stop_loss')):
+            return {'success': False, 'error': f'新{order_type}价格 {new_price} 已越过当前价格 {current_price}'}
+
+        new_order = await self.create_stop_order(symbol, direction, trade_result['position_size'], new_price)
+        if not new_order:
+            return {'success': False, 'error': f'{order_type} 新触发单创建失败'}
+        actions = [f"创建{order_type} {new_order['order_id']} @ {new_price}"]
+
+        remaining = []
+        for order in trade_result['orders']:
+            if order['type'] == order_type:
+                order_id = order['result']['order_id']
+                if await self.cancel_trigger_order(contract, order_id):
+                    actions.append(f"撤销{order_type} {order_id}")
+                    continue
+            remaining.append(order)
+        remaining.append({'type': order_type, 'result': new_order})
+        trade_result['orders'] = remaining
+
+        if order_type == 'stop_loss':
+            signal_data['stop_loss'] = new_price
+        else:
+            signal_data['target_price'] = update.targets
+        print(f"✏️ {contract} {order_type} 已修改为 {new_price}")
+        return {'success': True, 'actions': actions}
+
+    def _risk_rejected(self, contract: str, rejection: RiskRejection) -> Dict[str, Any]:
+        """风控拒绝时的返回结果，拒绝原因随信号一起保存"""
+        print(f"🛑 风控拒绝 {contract}: {rejection.reason}")
+        logger.warning(f"风控拒绝: {contract} - {rejection.rule}: {rejection.reason}")
+        return {'success': False, 'error': f'风控拒绝: {rejection.reason}', 'risk_rejection': rejection.to_dict()}
+
     async def execute_trading_signal(self, signal_data: Dict[str, Any]) -> Dict[str, Any]:
         """执行交易信号"""
+        reservation = None
         try:
             symbol = signal_data['trading_pair']
             direction = signal_data['direction']
@@ -240,13 +420,32 @@ class GateTrading:
 
             logger.info(f"开始执行交易信号: {symbol} - 方向: {direction}")
 
-            # 获取合约信息
-            contract_info = await self.get_contract_info(symbol)
-            if not contract_info:
-                return {'success': False, 'error': '无法获取合约信息'}
+            # 重复开仓检查（查询本地订单簿，无需请求交易所）
+            contract = symbol.replace('/', '_').upper()
+            # 正在开仓（入场单尚未确认）的合约同样视为已有挂单
+            if not TRADING_CONFIG.get('ALLOW_DUPLICATE_POSITION', False) and (
+                    self.book.has_exposure(contract) or self.risk.has_pending(contract)):
+                print(f"⚠️ {contract} 已有持仓或挂单，跳过重复开仓")
+                return {'success': False, 'error': f'{contract} 已有持仓或挂单，跳过重复开仓'}
+
+            # 风控第一阶段: 持仓数、冷却、频道限额（本地状态，无交易所请求）
+            chat_id = signal_data.get('chat_id')
+            try:
+                self.risk.check_signal(contract, chat_id)
+            except RiskRejection as e:
+                return self._risk_rejected(contract, e)
+            # 检查与占用之间不能有 await: 并发信号从此刻起即可看到本次开仓
+            reservation = self.risk.reserve(contract, chat_id)
+
+            # 合约规格和最新价优先取本地缓存（行情后台刷新），缺失或过期时才查询交易所
+            current_price = self.templates.last_price(contract) if self.specs.get(contract) else None
+            if current_price is None:
+                contract_info = await self.get_contract_info(symbol)
+                if not contract_info:
+                    return {'success': False, 'error': '无法获取合约信息'}
+                current_price = contract_info['last_price']
 
             # 处理入场价格 - 新逻辑
-            current_price = contract_info['last_price']
             entry_price = None
             is_market_order = False
 
@@ -277,10 +476,18 @@ class GateTrading:
                 return {'success': False, 'error': '无法确定入场价格'}
 
             # 计算仓位大小
-            position_size = self.calculate_position_size(symbol, entry_price)
+            margin_amount = self.margin_for_profile(signal_data.get('sizing_profile'))
+            position_size = self.calculate_position_size(symbol, entry_price, margin_amount)
             if position_size <= 0:
                 return {'success': False, 'error': '仓位大小计算错误'}
 
+            # 风控第二阶段: 名义价值、限价偏离度
+            notional = position_size * entry_price * self.specs.multiplier(contract)
+            try:
+                self.risk.check_order(contract, entry_price, current_price, notional, is_market_order, reservation)
+            except RiskRejection as e:
+                return self._risk_rejected(contract, e)
+
             results = {
                 'success': True,
                 'symbol': symbol,
@@ -306,6 +513,10 @@ class GateTrading:
                 else:
                     return {'success': False, 'error': '限价单创建失败'}
 
+            # 入场单已进入订单簿、开仓已记入信号历史，不再需要占用
+            self.risk.record_entry(signal_data)
+            self.risk.release(reservation)
+
             # 使用异步等待替代阻塞的sleep
             await asyncio.sleep(0.5)  # 减少等待时间，避免阻塞
 
@@ -353,6 +564,51 @@ class GateTrading:
         except Exception as e:
             logger.error(f"执行交易信号失败: {e}")
             return {'success': False, 'error': str(e)}
+        finally:
+            # 失败或提前返回时释放占用
+            self.risk.release(reservation)
+
+    async def start_book_sync(self) -> List[asyncio.Task]:
+        """启动订单簿后台同步任务: 定期对账，以及可选的用户数据流"""
+        # 预热合约规格缓存，首个信号即可直接计算合法的仓位和价格
+        try:
+            await self.specs.refresh_all(self.futures_api, self.settle)
+        except (GateApiException, ApiException) as e:
+            logger.error(f"预加载合约规格失败，将在首次下单时按需获取: {e}")
+
+        self.templates.warm()
+
+        tasks = [asyncio.create_task(self.book.run_reconciler(self.futures_api, scheduler=self.scheduler))]
+        # 行情缓存进程内只刷新一个，多账户共用
+        feed = self.templates.start_price_feed(self.futures_api, self.settle, self.scheduler)
+        if feed:
+            tasks.append(feed)
+        if self.paper:
+            # 模拟交易所直接推送异步成交，行情任务进程内只运行一个
+            tasks.append(asyncio.create_task(self.book.consume_stream(self.futures_api.stream())))
+            feed = paper_exchange.start_feed()
+            if feed:
+                tasks.append(feed)
+        elif BOOK_CONFIG['USER_STREAM_ENABLED']:
+            try:
+                account = await self.scheduler.call('list_futures_accounts', self.futures_api.list_futures_accounts, self.settle)
+                # 断线重连后先对账，补上断线期间丢失的推送
+                stream = GateUserStream(account.user, self.configuration.key, self.configuration.secret,
+                                        on_reconnect=lambda: self.book.reconcile(self.futures_api, self.settle, self.scheduler))
+                tasks.append(asyncio.create_task(self.book.consume_stream(stream)))
+            except Exception as e:
+                logger.error(f"启动用户数据流失败，仅使用定期对账: {e}")
+        return tasks
+
+# 长期复用的交易客户端（避免每个信号重新创建 ApiClient）
+_trader: Optional[GateTrading] = None
+
+def get_trader() -> GateTrading:
+    """获取进程内共享的交易客户端"""
+    global _trader
+    if _trader is None:
+        _trader = GateTrading()
+    return _trader
 
 async def execute_trade(signal_data: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -360,13 +616,24 @@ async def execute_trade(signal_data: Dict[str, Any]) -> Dict[str, Any]:
     供monitor_telegram_trading.py调用
     """
     try:
-        trader = GateTrading()
+        trader = get_trader()
         result = await trader.execute_trading_signal(signal_data)
         return result
     except Exception as e:
         logger.error(f"交易执行失败: {e}")
         return {'success': False, 'error': str(e)}
 
+async def apply_signal_update(signal_data: Dict[str, Any], update: SignalUpdate) -> Dict[str, Any]:
+    """按修改/取消指令调整已执行信号的订单（单账户）"""
+    try:
+        trade_result = signal_data.get('trade_result') or {}
+        if not trade_result.get('success'):
+            return {'success': False, 'error': '信号没有成功执行的订单'}
+        return await get_trader().apply_signal_update(signal_data, trade_result, update)
+    except Exception as e:
+        logger.error(f"信号修改执行失败: {e}")
+        return {'success': False, 'error': str(e)}
+
 if __name__ == '__main__':
     # 测试代码
     logging.basicConfig(
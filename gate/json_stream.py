@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+增量 JSON 解析模块
+逐块接收模型的流式输出，跟踪顶层对象中已经完整输出的字段，
+使调用方可以在输出为空对象、或所需字段全部完整时提前结束，而不必等待整个响应。
+"""
+
+import json
+from typing import Any, Dict, Iterable, Optional
+
+
+class IncrementalObjectParser:
+    """
+    顶层 JSON 对象的增量解析器。
+    只在顶层的字段边界（深度 1 的逗号或结束的右括号）处尝试解析已接收的前缀，
+    字符串中的括号和逗号会被正确忽略。
+    """
+
+    def __init__(self):
+        self._buffer = []
+        self._length = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._started = False
+        self._start = 0
+        # 已接收部分中最后一个顶层字段边界的位置
+        self._boundary: Optional[int] = None
+        self._parsed_at: Optional[int] = None
+        self.fields: Dict[str, Any] = {}
+        self.closed = False
+        self.empty = False
+
+    def feed(self, chunk: str):
+        """追加一段输出并更新状态"""
+        if self.closed or not chunk:
+            return
+        text_start = self._length
+        self._buffer.append(chunk)
+        self._length += len(chunk)
+        for offset, char in enumerate(chunk):
+            if not self._started:
+                # 跳过对象之前的内容（例如 ```json 代码块标记）
+                if char == '{':
+                    self._started = True
+                    self._start = text_start + offset
+                    self._depth = 1
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+            if char == '"':
+                self._in_string = True
+            elif char in '{[':
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    self._boundary = text_start + offset
+                    self.closed = True
+                    break
+            elif char == ',' and self._depth == 1:
+                self._boundary = text_start + offset
+        self._parse_prefix()
+
+    def _parse_prefix(self):
+        if self._boundary is None or self._boundary == self._parsed_at:
+            return
+        self._parsed_at = self._boundary
+        text = ''.join(self._buffer)
+        # 截到最后一个完整字段，补上右括号即为合法对象
+        prefix = text[self._start:self._boundary]
+        try:
+            value = json.loads(prefix + '}')
+        except json.JSONDecodeError:
+            return
+        if isinstance(value, dict):
+            self.fields = value
+            self.empty = self.closed and not value
+
+    def has_fields(self, keys: Iterable[str]) -> bool:
+        return all(key in self.fields for key in keys)
+
+    @property
+    def text(self) -> str:
+        return ''.join(self._buffer)
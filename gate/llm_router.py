@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+"""
+模型服务路由模块
+在多个 OpenAI 兼容的服务/模型之间分发信号提取请求:
+按最近延迟选择最快的可用服务；请求超过该服务的 p95 延迟仍未返回时向下一个服务发出对冲请求，
+先返回的结果生效；连续失败的服务由熔断器暂时摘除；没有其他可用服务时对同一服务按带抖动的退避重试。
+另提供本地桩服务用于测试。
+"""
+
+import json
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from types import SimpleNamespace
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+# 导入配置
+from config import OPENAI_CONFIG
+
+# 设置日志
+logger = logging.getLogger(__name__)
+
+
+# 请求仍在线程池中排队时，检查其是否开始执行的间隔(秒)
+_QUEUE_POLL = 0.05
+
+
+class LLMUnavailable(Exception):
+    """所有模型服务均失败或处于熔断状态"""
+
+
+def is_retryable(error: Exception) -> bool:
+    """与 OpenAI SDK 相同的重试条件: 连接错误/超时（没有状态码）、408/409/429 和 5xx"""
+    status = getattr(error, 'status_code', None)
+    return status is None or status in (408, 409, 429) or status >= 500
+
+
+class CircuitBreaker:
+    """连续失败 failure_threshold 次后熔断，reset_timeout 秒后放行一次试探请求"""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        return 'half-open' if time.monotonic() - self.opened_at >= self.reset_timeout else 'open'
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class Provider:
+    """一个 OpenAI 兼容的服务端点 + 模型"""
+
+    def __init__(self, name: str, base_url: str, api_key: str, model: str, timeout: float = 30):
+        from openai import OpenAI
+
+        self.name = name
+        self.model = model
+        # 重试由路由器负责（没有其他服务时对同一服务退避重试），SDK 内部不重试
+        self.client = OpenAI(api_key=api_key, base_url=base_url, timeout=timeout, max_retries=0)
+
+    def complete(self, messages: List[Dict[str, str]], **kwargs) -> Any:
+        return self.client.chat.completions.create(model=self.model, messages=messages, **kwargs)
+
+    def stream(self, messages: List[Dict[str, str]], **kwargs) -> Iterator[str]:
+        """流式请求，逐块产出文本；调用方提前结束迭代时关闭连接"""
+        response = self.client.chat.completions.create(model=self.model, messages=messages, stream=True, **kwargs)
+        try:
+            for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            response.close()
+
+
+class StubProvider:
+    """
+    本地桩服务，不发起网络请求，用于测试和压测。
+    responder(messages) 返回模型输出的 JSON 字符串，默认总是返回 {}。
+    """
+
+    def __init__(self, name: str = 'stub', responder: Callable[[List[Dict[str, str]]], str] = None,
+                 latency: float = 0.0):
+        self.name = name
+        self.model = 'stub'
+        self.responder = responder or (lambda messages: '{}')
+        self.latency = latency
+
+    def complete(self, messages: List[Dict[str, str]], **kwargs) -> Any:
+        if self.latency:
+            time.sleep(self.latency)
+        content = self.responder(messages)
+        if not isinstance(content, str):
+            content = json.dumps(content, ensure_ascii=False)
+        prompt_chars = sum(len(message['content']) for message in messages)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(prompt_tokens=prompt_chars, completion_tokens=len(content), prompt_tokens_details=None)
+        )
+
+    def stream(self, messages: List[Dict[str, str]], **kwargs) -> Iterator[str]:
+        content = self.complete(messages, **kwargs).choices[0].message.content
+        for i in range(0, len(content), 8):
+            yield content[i:i + 8]
+
+
+class _ProviderState:
+    """单个服务的延迟样本、熔断器和计数"""
+
+    def __init__(self, provider, breaker: CircuitBreaker):
+        self.provider = provider
+        self.breaker = breaker
+        self.latencies: Deque[float] = deque(maxlen=200)
+        self.ewma: Optional[float] = None
+        self.calls = 0
+        self.errors = 0
+        self.wins = 0
+        self.hedged = 0
+
+    def record(self, latency: float):
+        self.latencies.append(latency)
+        self.ewma = latency if self.ewma is None else 0.8 * self.ewma + 0.2 * latency
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        samples = sorted(self.latencies)
+        return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+class LLMRouter:
+    """按延迟选择服务、超时对冲、熔断降级的路由器（同步接口，在工作线程中调用）"""
+
+    def __init__(self, providers: List[Any], config: Dict[str, Any] = None):
+        if not providers:
+            raise ValueError("至少需要一个模型服务")
+        self.config = config or OPENAI_CONFIG
+        self._states = [
+            _ProviderState(provider, CircuitBreaker(
+                self.config.get('BREAKER_FAILURES', 3), self.config.get('BREAKER_RESET_SECONDS', 30)
+            ))
+            for provider in providers
+        ]
+        self._lock = threading.Lock()
+        # 每个服务最多 MAX_CONCURRENCY 个并发请求；被对冲掉的慢请求在后台线程中继续运行直至结束
+        self._pool = ThreadPoolExecutor(max_workers=self.config.get('MAX_CONCURRENCY', 64) * len(providers),
+                                        thread_name_prefix='llm')
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any] = None) -> 'LLMRouter':
+        """由 OPENAI_CONFIG['PROVIDERS'] 创建；未配置时使用 OPENAI_CONFIG 顶层的单个服务"""
+        config = config or OPENAI_CONFIG
+        specs = config.get('PROVIDERS') or [{
+            'NAME': 'default', 'BASE_URL': config['BASE_URL'], 'API_KEY': config['API_KEY'], 'MODEL': config['MODEL']
+        }]
+        providers = []
+        for spec in specs:
+            if spec.get('TYPE') == 'stub':
+                providers.append(StubProvider(spec.get('NAME', 'stub'), latency=spec.get('LATENCY', 0.0)))
+            else:
+                providers.append(Provider(
+                    spec['NAME'], spec.get('BASE_URL', config['BASE_URL']), spec.get('API_KEY', config['API_KEY']),
+                    spec.get('MODEL', config['MODEL']), spec.get('TIMEOUT', config.get('TIMEOUT', 30))
+                ))
+        return cls(providers, config)
+
+    def _candidates(self) -> List[_ProviderState]:
+        """可用服务按延迟排序；没有样本的服务保持配置顺序排在前面以便获取样本"""
+        states = [state for state in self._states if state.breaker.state != 'open']
+        return sorted(states, key=lambda state: state.ewma if state.ewma is not None else 0.0)
+
+    def _hedge_delay(self, state: _ProviderState) -> float:
+        p = state.percentile(self.config.get('HEDGE_PERCENTILE', 0.95))
+        minimum = self.config.get('HEDGE_DELAY_MIN', 1.0)
+        if p is None or len(state.latencies) < 20:
+            return self.config.get('HEDGE_DELAY_DEFAULT', 5.0)
+        return max(p, minimum)
+
+    def _retry_delay(self, attempt: int) -> float:
+        """第 attempt 次重试前的等待: 指数退避，乘以 0.5~1.5 的随机抖动避免同时重试"""
+        base = self.config.get('RETRY_BACKOFF', 0.5) * 2 ** (attempt - 1)
+        return min(base, self.config.get('RETRY_BACKOFF_MAX', 8.0)) * random.uniform(0.5, 1.5)
+
+    def _call(self, state: _ProviderState, messages, kwargs, started: List[float]) -> Tuple[Any, float]:
+        """started 记录请求实际开始执行的时刻（不含在线程池中排队的时间），用于计算对冲等待"""
+        start = time.perf_counter()
+        started.append(time.monotonic())
+        try:
+            response = state.provider.complete(messages, **kwargs)
+        except Exception:
+            # 熔断器计数由 complete 在确定不再重试后记录
+            with self._lock:
+                state.errors += 1
+            raise
+        latency = time.perf_counter() - start
+        with self._lock:
+            state.record(latency)
+        state.breaker.record_success()
+        return response, latency
+
+    def complete(self, messages: List[Dict[str, str]], **kwargs) -> Tuple[Any, str]:
+        """
+        发送请求并返回 (response, 服务名)。
+        首选服务超过其 p95 延迟未返回、或失败时，依次向下一个服务发出请求，取最先成功的结果；
+        没有其他可用服务时，可重试的错误（429/5xx/连接错误）对同一服务退避重试最多 RETRIES 次，
+        全部重试失败后熔断器只记一次失败。
+        """
+        candidates = iter(self._candidates())
+        pending = {}
+        errors = []
+        retries = 0
+
+        def submit(state: _ProviderState):
+            with self._lock:
+                state.calls += 1
+            started = []
+            pending[self._pool.submit(self._call, state, messages, kwargs, started)] = (state, started)
+
+        def launch() -> bool:
+            for state in candidates:
+                if not state.breaker.allow():
+                    continue
+                submit(state)
+                return True
+            return False
+
+        if not launch():
+            raise LLMUnavailable("所有模型服务均处于熔断状态")
+        while pending:
+            # 只有一个请求在途时，从它实际开始执行起按其 p95 等待，超时则对冲；仍在排队时不计时
+            timeout, started = None, None
+            if len(pending) == 1:
+                state, started = next(iter(pending.values()))
+                delay = self._hedge_delay(state)
+                timeout = max(0.0, delay - (time.monotonic() - started[0])) if started else _QUEUE_POLL
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                if not started:
+                    continue
+                if launch():
+                    hedged_state = list(pending.values())[-1][0]
+                    with self._lock:
+                        hedged_state.hedged += 1
+                    print(f"  - 模型请求超过 {delay:.1f} 秒未返回，对冲到 {hedged_state.provider.name}")
+                    continue
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                state, _ = pending.pop(future)
+                try:
+                    response, _ = future.result()
+                except Exception as e:
+                    errors.append(f"{state.provider.name}: {e}")
+                    logger.warning(f"模型服务 {state.provider.name} 请求失败: {e}")
+                    # 失败立即切换到下一个服务；没有其他服务时退避后重试同一服务
+                    if not pending and not launch() and retries < self.config.get('RETRIES', 2) and is_retryable(e):
+                        retries += 1
+                        backoff = self._retry_delay(retries)
+                        print(f"  - 模型服务 {state.provider.name} 请求失败，{backoff:.1f} 秒后第 {retries} 次重试")
+                        time.sleep(backoff)
+                        submit(state)
+                        continue
+                    state.breaker.record_failure()
+                    continue
+                with self._lock:
+                    state.wins += 1
+                return response, state.provider.name
+        raise LLMUnavailable("所有模型服务均请求失败: " + "; ".join(errors))
+
+    def stream(self, messages: List[Dict[str, str]], **kwargs) -> Tuple[Iterator[str], str]:
+        """
+        流式请求，返回 (文本块迭代器, 服务名)。
+        按延迟顺序尝试可用服务，直到某个服务返回第一块内容；流式请求不做对冲。
+        """
+        errors = []
+        for state in self._candidates():
+            if not state.breaker.allow():
+                continue
+            with self._lock:
+                state.calls += 1
+            chunks = state.provider.stream(messages, **kwargs)
+            try:
+                first = next(chunks, '')
+            except Exception as e:
+                with self._lock:
+                    state.errors += 1
+                state.breaker.record_failure()
+                errors.append(f"{state.provider.name}: {e}")
+                logger.warning(f"模型服务 {state.provider.name} 流式请求失败: {e}")
+                continue
+            state.breaker.record_success()
+            with self._lock:
+                state.wins += 1
+            return self._continue_stream(state, first, chunks), state.provider.name
+        if not errors:
+            raise LLMUnavailable("所有模型服务均处于熔断状态")
+        raise LLMUnavailable("所有模型服务均请求失败: " + "; ".join(errors))
+
+    def _continue_stream(self, state: _ProviderState, first: str, chunks: Iterator[str]) -> Iterator[str]:
+        try:
+            if first:
+                yield first
+            yield from chunks
+        except GeneratorExit:
+            raise
+        except Exception:
+            with self._lock:
+                state.errors += 1
+            state.breaker.record_failure()
+            raise
+        finally:
+            chunks.close()
+
+    def format_stats(self) -> str:
+        lines = []
+        with self._lock:
+            for state in self._states:
+                if not state.calls:
+                    continue
+                p50, p95 = state.percentile(0.5), state.percentile(0.95)
+                lines.append(
+                    f"  [{state.provider.name}] 请求 {state.calls} | 胜出 {state.wins} | 失败 {state.errors} | "
+                    f"对冲 {state.hedged} | p50 {p50 * 1000 if p50 else 0:.0f}ms p95 {p95 * 1000 if p95 else 0:.0f}ms | "
+                    f"熔断 {state.breaker.state}"
+                )
+        return '\n'.join(lines)
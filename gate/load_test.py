@@ -0,0 +1,475 @@
+# -*- coding: utf-8 -*-
+"""
+监听程序压测工具
+不连接 Telegram、模型服务和交易所，在进程内按设定速率把合成的 NewMessage 事件直接交给
+handle_messages 注册的处理程序，完整运行 路由过滤 -> 提取 -> 去重/风控 -> 下单 -> 订单簿 流程:
+- 消息文本从导出的历史消息中随机抽样，轮流分配到目标频道/话题（或 --channels 个合成频道）
+- 模型服务替换为本地桩服务 (llm_router.StubProvider)，输出由本地规则提取器生成，延迟可配置
+- 交易所使用模拟交易所 (paper_exchange.py)，按样本中的信号初始化价格，每个信号执行前把合约价格设为该信号的入场价，接口延迟可配置
+- 信号文件和数据库写入临时目录，不影响正式数据
+结束后报告吞吐量、在途消息和请求调度器的队列深度、内存增长 (RSS / tracemalloc)，
+以及端到端、提取、执行各阶段的延迟分位数。
+
+用法:
+    python load_test.py --rate 20 --duration 30
+    python load_test.py --history ../tgqd/channel_*_history.txt --channels 8 --rate 100 --burst 20 --llm-latency 0.8
+    python load_test.py --rate 200 --duration 10 --no-dedup --no-risk --tracemalloc --json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import glob
+import itertools
+import json
+import logging
+import os
+import random
+import re
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from telethon.tl.types import MessageReplyHeader
+from telethon.utils import resolve_id
+
+# 导入配置
+from config import (GATE_CONFIG, OPENAI_CONFIG, OTHER_CONFIG, PAPER_CONFIG, RISK_CONFIG, SIGNAL_HISTORY_CONFIG, STORE_CONFIG,
+                    TELEGRAM_CONFIG, TRADING_CONFIG)
+from llm_router import LLMRouter, StubProvider
+from local_extractor import extract_local
+from signal_history import contract_of
+from signal_store import parse_history_export
+import routing
+
+DEFAULT_HISTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tgqd', '*_history.txt')
+
+# 合成频道ID的起点（-100 前缀的频道ID）
+SYNTHETIC_CHANNEL_BASE = -1009000000000
+
+# 批量提取请求中每条消息的编号行 "[1]"
+_BATCH_ITEM = re.compile(r'^\[(\d+)\]\n', re.M)
+
+
+def load_messages(patterns: List[str]) -> List[str]:
+    """导出的历史消息中的全部文本（支持通配符）"""
+    texts = []
+    for path in sorted({path for pattern in patterns for path in glob.glob(pattern)}):
+        texts.extend(row[6] for row in parse_history_export(path))
+    return texts
+
+
+def mock_response(messages: List[Dict[str, str]]) -> Dict[str, Any]:
+    """桩服务的输出: 用本地规则提取器代替模型，单条和批量请求的格式与远程模型相同"""
+    content = messages[-1]['content']
+    parts = _BATCH_ITEM.split(content)
+    if len(parts) > 1:
+        return {'results': [dict(extract_local(text.strip()), id=int(index))
+                            for index, text in zip(parts[1::2], parts[2::2])]}
+    # 单条请求的用户消息为 "文本:\n<消息>"
+    return extract_local(content.split('\n', 1)[-1])
+
+
+def mock_router(latency: float, jitter: float) -> LLMRouter:
+    """固定延迟 + 指数分布抖动（均值为 jitter）的桩服务"""
+    def responder(messages):
+        if jitter:
+            time.sleep(random.expovariate(1 / jitter))
+        return mock_response(messages)
+    return LLMRouter([StubProvider('mock', responder, latency)])
+
+
+def entry_price(signal: Dict[str, Any]) -> Optional[float]:
+    """信号数值入场价的均值；"现价" 入场或没有入场价时返回 None"""
+    entries = [p for p in signal.get('entry_price') or [] if isinstance(p, (int, float)) and not isinstance(p, bool)]
+    return sum(entries) / len(entries) if entries else None
+
+
+def seed_prices(exchange: Any, texts: List[str]) -> int:
+    """按样本中信号的入场价给模拟交易所设置初始价格（样本跨越数年，不保留已有价格）"""
+    seeded = set()
+    for text in set(texts):
+        data = extract_local(text)
+        price = entry_price(data)
+        if not data.get('trading_pair') or price is None:
+            continue
+        contract = contract_of(data['trading_pair'])
+        if contract not in seeded:
+            exchange.set_price(contract, price)
+            seeded.add(contract)
+    return len(seeded)
+
+
+def build_event(message_id: int, text: str, chat_id: int, topic_id: Optional[int]) -> SimpleNamespace:
+    """合成的 NewMessage 事件，只包含路由过滤和处理程序读取的字段"""
+    real_id, peer_type = resolve_id(chat_id)
+    reply_to = MessageReplyHeader(reply_to_msg_id=topic_id, forum_topic=True) if topic_id is not None else None
+    message = SimpleNamespace(id=message_id, message=text, text=text, media=None,
+                              peer_id=peer_type(real_id), reply_to=reply_to)
+    return SimpleNamespace(message=message, chat_id=chat_id)
+
+
+def rss_mb() -> float:
+    """当前进程的常驻内存 (MB)；没有 /proc 时返回峰值"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentiles(samples: List[float]) -> Dict[str, Any]:
+    """延迟分位数 (毫秒)"""
+    if not samples:
+        return {'count': 0}
+    ordered = sorted(samples)
+
+    def at(q):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000
+
+    return {'count': len(ordered), 'p50': at(0.5), 'p90': at(0.9), 'p99': at(0.99), 'max': ordered[-1] * 1000}
+
+
+class FakeClient:
+    """代替 TelegramClient: 记录 handle_messages 注册的处理程序，压测结束前 run_until_disconnected 一直等待"""
+
+    def __init__(self):
+        self.handlers = []
+        self.registered = asyncio.Event()
+        self._disconnected = asyncio.Event()
+
+    def add_event_handler(self, callback, event=None):
+        self.handlers.append(callback)
+        self.registered.set()
+
+    def remove_event_handler(self, callback, event=None):
+        if callback in self.handlers:
+            self.handlers.remove(callback)
+
+    async def __call__(self, request):
+        # 保活任务的 GetStateRequest
+        return None
+
+    async def run_until_disconnected(self):
+        await self._disconnected.wait()
+
+    def disconnect(self):
+        self._disconnected.set()
+
+
+class LoadGenerator:
+    """按速率注入消息，并在监听程序的处理函数上计时"""
+
+    def __init__(self, monitor: Any, texts: List[str], targets: List[Tuple[int, Optional[int]]],
+                 rate: float, burst: int, duration: float, set_price: Callable[[str, float], None] = None):
+        self.monitor = monitor
+        # set_price(合约, 价格): 设置模拟行情（交易所价格和下单模板的行情缓存）
+        self.set_price = set_price
+        self.texts = texts
+        self.targets = targets
+        self.rate = rate
+        self.burst = burst
+        self.duration = duration
+        self._ids = itertools.count(1)
+        # (频道ID, 消息ID) -> 注入时间
+        self._injected_at: Dict[Tuple[int, int], float] = {}
+        self._originals: Dict[str, Any] = {}
+        self.injected = 0
+        self.filtered = 0
+        self.completed = 0
+        self.signals = 0
+        self.updates = 0
+        self.trades_ok = 0
+        self.trades_failed = 0
+        self.latency: Dict[str, List[float]] = {'end_to_end': [], 'extract': [], 'execute': [], 'handler': [], 'injector_lag': []}
+        self.samples: List[Dict[str, Any]] = []
+
+    def instrument(self):
+        """包装 process_message_async / extract_signal_from_text / execute_signal（按模块全局名查找，替换即生效）"""
+        monitor = self.monitor
+        process = self._originals['process_message_async'] = monitor.process_message_async
+        extract = self._originals['extract_signal_from_text'] = monitor.extract_signal_from_text
+        execute = self._originals['execute_signal'] = monitor.execute_signal
+
+        async def timed_process(message_id, text, chat_id, topic_id, timestamp, reply_to_msg_id=None):
+            try:
+                await process(message_id, text, chat_id, topic_id, timestamp, reply_to_msg_id)
+            finally:
+                self.completed += 1
+                start = self._injected_at.pop((chat_id, message_id), None)
+                if start is not None:
+                    self.latency['end_to_end'].append(time.perf_counter() - start)
+
+        async def timed_extract(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = await extract(*args, **kwargs)
+            finally:
+                self.latency['extract'].append(time.perf_counter() - start)
+            if result:
+                if 'update' in result:
+                    self.updates += 1
+                else:
+                    self.signals += 1
+            return result
+
+        async def timed_execute(signal_dict):
+            # 样本来自不同时期，执行前把行情设为信号自身的入场价，使下单路径（风控、限价距离）真正被测到
+            price = entry_price(signal_dict) if self.set_price is not None and 'update' not in signal_dict else None
+            if price is not None:
+                self.set_price(contract_of(signal_dict['trading_pair']), price)
+            start = time.perf_counter()
+            try:
+                result = await execute(signal_dict)
+            finally:
+                self.latency['execute'].append(time.perf_counter() - start)
+            if 'update' not in result:
+                if result.get('trade_executed'):
+                    self.trades_ok += 1
+                else:
+                    self.trades_failed += 1
+            return result
+
+        monitor.process_message_async = timed_process
+        monitor.extract_signal_from_text = timed_extract
+        monitor.execute_signal = timed_execute
+
+    def restore(self):
+        for name, fn in self._originals.items():
+            setattr(self.monitor, name, fn)
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._injected_at)
+
+    async def inject(self, handler):
+        """每 burst/rate 秒注入一批 burst 条消息，记录注入时刻相对计划的滞后（事件循环繁忙程度）"""
+        loop = asyncio.get_running_loop()
+        interval = self.burst / self.rate
+        start = loop.time()
+        for tick in itertools.count():
+            planned = start + tick * interval
+            if planned - start >= self.duration:
+                break
+            delay = planned - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.latency['injector_lag'].append(max(0.0, loop.time() - planned))
+            for _ in range(self.burst):
+                chat_id, topic_id = self.targets[(self.injected + self.filtered) % len(self.targets)]
+                message_id = next(self._ids)
+                event = build_event(message_id, random.choice(self.texts), chat_id, topic_id)
+                # 与 NewMessage 的 func 相同: 不是目标的消息不进入处理程序
+                if not routing.routing_table.event_filter(event):
+                    self.filtered += 1
+                    continue
+                self._injected_at[(event.route.chat_id, message_id)] = time.perf_counter()
+                self.injected += 1
+                handler_start = time.perf_counter()
+                await handler(event)
+                self.latency['handler'].append(time.perf_counter() - handler_start)
+
+    async def sample(self, interval: float, started: float):
+        """定期记录在途消息数、请求调度器队列深度、任务数和内存"""
+        scheduler = self.monitor.request_scheduler
+        while True:
+            self.samples.append({
+                'time': time.perf_counter() - started,
+                'injected': self.injected,
+                'completed': self.completed,
+                'in_flight': self.in_flight,
+                'scheduler_queue': sum(scheduler.queue_depth().values()),
+                'tasks': len(asyncio.all_tasks()),
+                'rss_mb': rss_mb(),
+                'traced_mb': tracemalloc.get_traced_memory()[0] / 2 ** 20 if tracemalloc.is_tracing() else None
+            })
+            await asyncio.sleep(interval)
+
+    async def drain(self, timeout: float) -> bool:
+        deadline = time.perf_counter() + timeout
+        while self.in_flight and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+        return not self.in_flight
+
+
+def prepare(args: argparse.Namespace, workdir: str) -> Any:
+    """
+    配置压测环境并导入监听程序: 模拟交易所、临时的信号文件和数据库、桩模型服务。
+    交易模块在导入时读取配置，因此必须在导入监听程序之前修改。
+    """
+    # 导入时创建的模型服务路由也使用桩服务，不需要 openai 和密钥
+    OPENAI_CONFIG['PROVIDERS'] = [{'TYPE': 'stub', 'NAME': 'mock'}]
+    GATE_CONFIG['MODE'] = 'paper'
+    PAPER_CONFIG['MARKET_DATA'] = 'local'
+    PAPER_CONFIG['LATENCY'] = args.exchange_latency
+    # 默认的初始价格（当前行情）与历史样本相差很大，改为按样本设置
+    PAPER_CONFIG['PRICES'] = {}
+    OTHER_CONFIG['SIGNALS_FILE'] = os.path.join(workdir, 'trading_signals.json')
+    STORE_CONFIG['DB_FILE'] = os.path.join(workdir, 'signals.db')
+    if args.no_dedup:
+        SIGNAL_HISTORY_CONFIG['DEDUP_ENABLED'] = False
+    if args.no_risk:
+        RISK_CONFIG['ENABLED'] = False
+        # 样本集中在少数合约上，重复开仓检查同样会挡住大部分信号
+        TRADING_CONFIG['ALLOW_DUPLICATE_POSITION'] = True
+    if args.channels:
+        channel_ids = [SYNTHETIC_CHANNEL_BASE - i for i in range(1, args.channels + 1)]
+        routing.routing_table = routing.RoutingTable(channel_ids, {}, TELEGRAM_CONFIG.get('ROUTES', {}))
+
+    import monitor_telegram_trading as monitor
+    monitor.llm_router = mock_router(args.llm_latency, args.llm_jitter)
+    return monitor
+
+
+def routing_targets() -> List[Tuple[int, Optional[int]]]:
+    table = routing.routing_table
+    return ([(chat_id, None) for chat_id in sorted(table.channels)]
+            + [(chat_id, topic_id) for chat_id, topic_ids in sorted(table.topics.items()) for topic_id in sorted(topic_ids)])
+
+
+async def run_load(args: argparse.Namespace, texts: List[str], workdir: str) -> Dict[str, Any]:
+    monitor = prepare(args, workdir)
+    from paper_exchange import paper_exchange
+    seeded = seed_prices(paper_exchange, texts)
+    targets = routing_targets()
+
+    def set_price(contract: str, price: float):
+        # 风控的限价距离检查读取下单模板的行情缓存，两处同时更新
+        paper_exchange.set_price(contract, price)
+        monitor.order_templates.update_price(contract, price)
+
+    generator = LoadGenerator(monitor, texts, targets, args.rate, args.burst, args.duration, set_price)
+    generator.instrument()
+    client = FakeClient()
+    if args.tracemalloc:
+        tracemalloc.start()
+    baseline = tracemalloc.take_snapshot() if args.tracemalloc else None
+    rss_start = rss_mb()
+    started = time.perf_counter()
+    sampler = asyncio.create_task(generator.sample(args.sample_interval, started))
+    monitor_task = asyncio.create_task(monitor.handle_messages(client, monitor.ExponentialBackoff()))
+    try:
+        await client.registered.wait()
+        await generator.inject(client.handlers[0])
+        injected_in = time.perf_counter() - started
+        drained = await generator.drain(args.drain_timeout)
+        elapsed = time.perf_counter() - started
+    finally:
+        client.disconnect()
+        await monitor_task
+        sampler.cancel()
+        generator.restore()
+
+    rss_end = rss_mb()
+    memory = {'rss_start_mb': rss_start, 'rss_end_mb': rss_end, 'rss_growth_mb': rss_end - rss_start}
+    if baseline is not None:
+        current, peak = tracemalloc.get_traced_memory()
+        diff = tracemalloc.take_snapshot().compare_to(baseline, 'lineno')
+        tracemalloc.stop()
+        memory.update(traced_mb=current / 2 ** 20, traced_peak_mb=peak / 2 ** 20,
+                      top_growth=[{'site': str(stat.traceback), 'kb': stat.size_diff / 1024, 'count': stat.count_diff}
+                                  for stat in diff[:args.top]])
+
+    samples = generator.samples
+    return {
+        'load': {'rate': args.rate, 'burst': args.burst, 'duration': args.duration, 'targets': len(targets),
+                 'sample_texts': len(texts), 'seeded_contracts': seeded,
+                 'llm_latency': args.llm_latency, 'llm_jitter': args.llm_jitter, 'exchange_latency': args.exchange_latency},
+        'messages': {'injected': generator.injected, 'filtered': generator.filtered, 'completed': generator.completed,
+                     'unfinished': generator.in_flight, 'signals': generator.signals, 'updates': generator.updates,
+                     'trades_ok': generator.trades_ok, 'trades_failed': generator.trades_failed, 'drained': drained},
+        'throughput': {'offered_per_s': generator.injected / injected_in if injected_in else 0.0,
+                       'completed_per_s': generator.completed / elapsed if elapsed else 0.0,
+                       'elapsed_s': elapsed, 'drain_s': elapsed - injected_in},
+        'queues': {
+            'in_flight_max': max((s['in_flight'] for s in samples), default=0),
+            'in_flight_avg': sum(s['in_flight'] for s in samples) / len(samples) if samples else 0.0,
+            'scheduler_queue_max': max((s['scheduler_queue'] for s in samples), default=0),
+            'tasks_max': max((s['tasks'] for s in samples), default=0)
+        },
+        'latency_ms': {name: percentiles(values) for name, values in generator.latency.items()},
+        'memory': memory,
+        'scheduler': monitor.request_scheduler.metrics(),
+        'samples': samples
+    }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    load, messages, throughput = report['load'], report['messages'], report['throughput']
+    queues, memory = report['queues'], report['memory']
+    lines = [
+        "=== 压测结果 ===",
+        f"负载: {load['rate']} 条/秒 × {load['duration']} 秒，每批 {load['burst']} 条，{load['targets']} 个频道/话题，"
+        f"样本 {load['sample_texts']} 条（初始化价格 {load['seeded_contracts']} 个合约）",
+        f"模拟延迟: 模型 {load['llm_latency']} 秒 (+抖动均值 {load['llm_jitter']} 秒)，交易所接口 {load['exchange_latency']} 秒",
+        f"消息: 注入 {messages['injected']} | 完成 {messages['completed']} | 未完成 {messages['unfinished']} | "
+        f"信号 {messages['signals']} | 修改指令 {messages['updates']} | 下单成功 {messages['trades_ok']} | 失败 {messages['trades_failed']}",
+        f"吞吐: 注入 {throughput['offered_per_s']:.1f} 条/秒 | 完成 {throughput['completed_per_s']:.1f} 条/秒 | "
+        f"总用时 {throughput['elapsed_s']:.1f} 秒 (排空 {throughput['drain_s']:.1f} 秒)",
+        f"队列: 在途消息 最大 {queues['in_flight_max']} / 平均 {queues['in_flight_avg']:.1f} | "
+        f"请求调度器排队 最大 {queues['scheduler_queue_max']} | 异步任务 最大 {queues['tasks_max']}",
+        "",
+        f"{'延迟 (ms)':<14}{'样本':>8}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}"
+    ]
+    names = {'end_to_end': '端到端', 'extract': '提取', 'execute': '执行', 'handler': '处理程序', 'injector_lag': '注入滞后'}
+    for key, name in names.items():
+        stats = report['latency_ms'][key]
+        if stats['count']:
+            lines.append(f"{name:<14}{stats['count']:>8}{stats['p50']:>10.1f}{stats['p90']:>10.1f}"
+                         f"{stats['p99']:>10.1f}{stats['max']:>10.1f}")
+        else:
+            lines.append(f"{name:<14}{0:>8}")
+    lines += ["", f"内存: RSS {memory['rss_start_mb']:.1f} MB -> {memory['rss_end_mb']:.1f} MB ({memory['rss_growth_mb']:+.1f} MB)"]
+    if 'traced_mb' in memory:
+        lines.append(f"tracemalloc: 当前 {memory['traced_mb']:.1f} MB | 峰值 {memory['traced_peak_mb']:.1f} MB，增长最多的位置:")
+        lines += [f"  {item['kb']:+10.1f} KB {item['count']:+8d} 个  {item['site']}" for item in memory['top_growth']]
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='监听程序压测: 注入合成消息，使用桩模型服务和模拟交易所')
+    parser.add_argument('--history', nargs='*', default=[DEFAULT_HISTORY], help='导出的历史消息文件（支持通配符）')
+    parser.add_argument('--rate', type=float, default=20, help='每秒注入的消息数（全部频道合计）')
+    parser.add_argument('--burst', type=int, default=1, help='每批同时注入的消息数，批次间隔为 burst/rate 秒')
+    parser.add_argument('--duration', type=float, default=30, help='注入时长(秒)')
+    parser.add_argument('--channels', type=int, default=0, help='合成的频道数，默认使用配置中的目标频道/话题')
+    parser.add_argument('--llm-latency', type=float, default=0.5, help='模型服务的固定延迟(秒)')
+    parser.add_argument('--llm-jitter', type=float, default=0.0, help='模型服务的随机额外延迟均值(秒)')
+    parser.add_argument('--exchange-latency', type=float, default=0.05, help='模拟交易所每次接口调用的延迟(秒)')
+    parser.add_argument('--no-dedup', action='store_true', help='关闭重复信号过滤（样本会重复抽到）')
+    parser.add_argument('--no-risk', action='store_true', help='关闭风控和重复开仓检查，让每个信号都进入下单流程')
+    parser.add_argument('--tracemalloc', action='store_true', help='用 tracemalloc 统计内存增长位置（明显变慢）')
+    parser.add_argument('--top', type=int, default=10, help='显示内存增长最多的前N个位置')
+    parser.add_argument('--sample-interval', type=float, default=0.5, help='队列深度和内存的采样间隔(秒)')
+    parser.add_argument('--drain-timeout', type=float, default=60, help='注入结束后等待在途消息处理完成的最长时间(秒)')
+    parser.add_argument('--seed', type=int, default=None, help='随机种子')
+    parser.add_argument('--verbose', action='store_true', help='保留监听程序的输出')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出结果（含采样序列）')
+    args = parser.parse_args()
+
+    texts = load_messages(args.history)
+    if not texts:
+        parser.error(f"没有找到历史消息: {args.history}")
+    random.seed(args.seed)
+
+    with tempfile.TemporaryDirectory(prefix='load_test_') as workdir:
+        if args.verbose:
+            report = asyncio.run(run_load(args, texts, workdir))
+        else:
+            # 监听程序每条消息都会打印多行，压测时丢弃
+            logging.disable(logging.ERROR)
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                report = asyncio.run(run_load(args, texts, workdir))
+            logging.disable(logging.NOTSET)
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2, default=str))
+    else:
+        print(format_report(report))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+本地信号提取模块
+不依赖远程模型的提取后端，与 extract_trade_signal 使用相同的输出格式（模型输出的 JSON 字典）:
+- rules: 针对常见信号格式（"BTC 116000-115500附近多 / 目標 / 止損"）的规则解析，纯 CPU、微秒级
+- llama_cpp: 可选，使用 llama-cpp-python 在本进程 CPU 上运行量化的小模型 (GGUF)，复用相同的提示词模板
+通过 LOCAL_EXTRACTOR_CONFIG['BACKEND'] 选择，在路由配置中设置 EXTRACTOR 为 'local' 启用。
+"""
+
+import json
+import re
+import threading
+from typing import Any, Dict, List, Optional
+
+# 导入配置
+from config import LOCAL_EXTRACTOR_CONFIG
+from prompt_templates import get_template
+
+# llama-cpp-python 为可选依赖
+try:
+    from llama_cpp import Llama
+    LLAMA_CPP_AVAILABLE = True
+except ImportError:
+    LLAMA_CPP_AVAILABLE = False
+
+# 常见中文别名 -> 币种
+ASSET_ALIASES = {
+    '大饼': 'BTC', '大餅': 'BTC', '比特币': 'BTC', '比特幣': 'BTC', '以太': 'ETH', '姨太': 'ETH', '以太坊': 'ETH'
+}
+# 出现在入场部分时说明是条件性指令或分析，不是可执行信号
+CONDITIONAL_WORDS = ('留意', '不破', '如果', '关注', '等待', '观察', '若')
+
+_NORMALIZE = str.maketrans({'：': ':', '；': ';', '，': ',', '—': '-', '－': '-', '~': '-', '～': '-', '（': '(', '）': ')'})
+_NUMBER = re.compile(r'\d+(?:\.\d+)?')
+_ASSET = re.compile(r'^\s*([A-Za-z]{2,15})(?![A-Za-z])')
+_TARGET = re.compile(r'(?:目标|目標)([^止]*)')
+_STOP = re.compile(r'(?:止损|止損)\s*[:;]?\s*(\d+(?:\.\d+)?)')
+_DIRECTION = re.compile(r'[多空]')
+_MARKET = re.compile(r'现价|市价|現價|市價')
+
+
+class RuleExtractor:
+    """常见信号格式的规则解析器"""
+
+    name = 'rules'
+
+    def extract(self, text: str) -> Dict[str, Any]:
+        text = text.translate(_NORMALIZE)
+        asset = self._asset(text)
+        if not asset:
+            return {}
+
+        # 入场部分: 从开头到第一个 目标/止损 关键字
+        cut = min([i for i in (text.find('目标'), text.find('目標'), text.find('止损'), text.find('止損')) if i >= 0],
+                  default=len(text))
+        entry_part = text[:cut]
+        if any(word in entry_part for word in CONDITIONAL_WORDS):
+            return {}
+        direction_match = _DIRECTION.search(entry_part)
+        if not direction_match:
+            return {}
+        direction = 'long' if direction_match.group() == '多' else 'short'
+
+        # 方向之前的部分是入场价，之后通常是备注（例如 "15分钟，轻仓"）
+        entry_text = entry_part[:direction_match.start()]
+        entry_prices: List[Any] = ['现价'] if _MARKET.search(entry_text) else []
+        entry_prices += [float(n) for n in _NUMBER.findall(_ASSET.sub('', entry_text, count=1))]
+
+        target_match = _TARGET.search(text)
+        stop_match = _STOP.search(text)
+        if not entry_prices or not target_match or not stop_match:
+            return {}
+        target_prices = [float(n) for n in _NUMBER.findall(target_match.group(1))]
+        if not target_prices:
+            return {}
+
+        return {
+            'trading_pair': f"{asset}/USDT",
+            'direction': direction,
+            'entry_price': entry_prices,
+            'target_price': target_prices,
+            'stop_loss': float(stop_match.group(1))
+        }
+
+    @staticmethod
+    def _asset(text: str) -> Optional[str]:
+        match = _ASSET.match(text)
+        if match:
+            return match.group(1).upper()
+        stripped = text.lstrip()
+        for alias, asset in ASSET_ALIASES.items():
+            if stripped.startswith(alias):
+                return asset
+        return None
+
+
+class LlamaCppExtractor:
+    """在本进程 CPU 上运行 GGUF 量化模型的提取器"""
+
+    name = 'llama_cpp'
+
+    def __init__(self, config: Dict[str, Any] = None):
+        if not LLAMA_CPP_AVAILABLE:
+            raise ImportError("未安装 llama-cpp-python，无法使用 llama_cpp 本地提取后端")
+        config = config or LOCAL_EXTRACTOR_CONFIG
+        self.llm = Llama(
+            model_path=config['MODEL_PATH'],
+            n_ctx=config.get('N_CTX', 2048),
+            n_threads=config.get('N_THREADS'),
+            verbose=False
+        )
+        self.max_tokens = config.get('MAX_TOKENS', 256)
+        # Llama 实例不是线程安全的
+        self._lock = threading.Lock()
+
+    def extract(self, text: str, prompt: str = None) -> Dict[str, Any]:
+        with self._lock:
+            response = self.llm.create_chat_completion(
+                messages=get_template(prompt).messages(text),
+                response_format={"type": "json_object"},
+                max_tokens=self.max_tokens,
+                temperature=0
+            )
+        return json.loads(response['choices'][0]['message']['content'])
+
+
+_backend = None
+
+def get_local_extractor():
+    """按 LOCAL_EXTRACTOR_CONFIG['BACKEND'] 创建（并复用）本地提取后端"""
+    global _backend
+    if _backend is None:
+        backend = LOCAL_EXTRACTOR_CONFIG.get('BACKEND', 'rules')
+        _backend = LlamaCppExtractor() if backend == 'llama_cpp' else RuleExtractor()
+    return _backend
+
+def extract_local(text: str, prompt: str = None) -> Dict[str, Any]:
+    """本地提取，返回与远程模型相同格式的 JSON 字典（非信号为空字典）"""
+    backend = get_local_extractor()
+    if isinstance(backend, LlamaCppExtractor):
+        return backend.extract(text, prompt)
+    return backend.extract(text)
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+本地消息总线模块
+基于 SQLite (WAL) 的多生产者/多消费者持久化队列，用于在监听、提取、执行
+三个独立进程之间传递消息。领取操作在单条 UPDATE ... RETURNING 中完成，
+多个消费者进程可安全地并发领取；未确认的消息超时后重新投递。
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+# 导入配置
+from config import PIPELINE_CONFIG
+
+# 总线主题
+TOPIC_MESSAGES = 'messages'   # 监听进程 -> 提取进程
+TOPIC_SIGNALS = 'signals'     # 提取进程 -> 执行进程
+
+
+class MessageBus:
+    """SQLite 持久化消息队列"""
+
+    def __init__(self, db_file: str = None, consumer_id: str = None):
+        self.db_file = db_file or PIPELINE_CONFIG['BUS_FILE']
+        self.consumer_id = consumer_id or f"pid-{os.getpid()}"
+        # 自动提交模式，每条语句即一个事务；多进程写入时等待锁而不是立即报错
+        self.conn = sqlite3.connect(self.db_file, timeout=10, isolation_level=None, check_same_thread=False)
+        # 同一进程内的多个协程经由线程池访问同一连接，需要串行化
+        self._lock = threading.Lock()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS bus (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                topic TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created REAL NOT NULL,
+                claimed_by TEXT,
+                claimed_at REAL,
+                attempts INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_bus_topic_claim ON bus (topic, claimed_at, id)")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS bus_dead (
+                id INTEGER PRIMARY KEY,
+                topic TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created REAL NOT NULL,
+                attempts INTEGER NOT NULL
+            )
+        """)
+
+    def close(self):
+        self.conn.close()
+
+    def publish(self, topic: str, payload: Dict[str, Any]) -> int:
+        """发布一条消息，返回消息ID"""
+        with self._lock:
+            cursor = self.conn.execute(
+                "INSERT INTO bus (topic, payload, created) VALUES (?, ?, ?)",
+                (topic, json.dumps(payload, ensure_ascii=False), time.time())
+            )
+            return cursor.lastrowid
+
+    def claim(self, topic: str) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """
+        领取一条消息（未被领取，或领取已超时的最早一条），返回 (消息ID, 内容)；队列为空时返回 None。
+        """
+        while True:
+            now = time.time()
+            expired = now - PIPELINE_CONFIG['VISIBILITY_TIMEOUT']
+            with self._lock:
+                row = self.conn.execute(
+                    "UPDATE bus SET claimed_by = ?, claimed_at = ?, attempts = attempts + 1 "
+                    "WHERE id = (SELECT id FROM bus WHERE topic = ? AND (claimed_at IS NULL OR claimed_at < ?) "
+                    "ORDER BY id LIMIT 1) RETURNING id, payload, attempts",
+                    (self.consumer_id, now, topic, expired)
+                ).fetchone()
+                if row is None:
+                    return None
+                message_id, payload, attempts = row
+                if attempts <= PIPELINE_CONFIG['MAX_ATTEMPTS']:
+                    return message_id, json.loads(payload)
+                # 反复处理失败（例如导致进程崩溃）的消息移入死信表
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO bus_dead SELECT id, topic, payload, created, attempts FROM bus WHERE id = ?",
+                    (message_id,)
+                )
+                self.conn.execute("DELETE FROM bus WHERE id = ?", (message_id,))
+
+    def ack(self, message_id: int):
+        """确认消息已处理"""
+        with self._lock:
+            self.conn.execute("DELETE FROM bus WHERE id = ?", (message_id,))
+
+    def depth(self, topic: str) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM bus WHERE topic = ?", (topic,)).fetchone()[0]
+
+    async def ack_async(self, message_id: int):
+        await asyncio.to_thread(self.ack, message_id)
+
+    async def publish_async(self, topic: str, payload: Dict[str, Any]) -> int:
+        return await asyncio.to_thread(self.publish, topic, payload)
+
+    async def consume(self, topic: str):
+        """
+        异步迭代某个主题的消息，产出 (消息ID, 内容)；处理完成后需调用 ack()。
+        队列为空时按指数退避轮询，有消息时立即继续领取。
+        """
+        interval = PIPELINE_CONFIG['POLL_INTERVAL_MIN']
+        while True:
+            item = await asyncio.to_thread(self.claim, topic)
+            if item is None:
+                await asyncio.sleep(interval)
+                interval = min(interval * 2, PIPELINE_CONFIG['POLL_INTERVAL_MAX'])
+                continue
+            interval = PIPELINE_CONFIG['POLL_INTERVAL_MIN']
+            yield item
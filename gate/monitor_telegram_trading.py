@@ -1,14 +1,14 @@
 import asyncio
 import json
 import random
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from telethon import TelegramClient, events, errors
 from telethon.network.connection import ConnectionTcpAbridged, ConnectionTcpFull
 from telethon.tl.functions.updates import GetStateRequest
-from openai import OpenAI
-from pydantic import BaseModel, ValidationError, model_validator
-from typing import List, Optional, Union, Dict, Any, Tuple
+from typing import List, Optional, Dict, Any, Tuple
 
 # 性能优化模块
 try:
@@ -23,154 +23,157 @@ except ImportError:
     print("⚠️ 性能优化模块不可用，使用默认配置")
 
 # 导入配置
-from config import TELEGRAM_CONFIG, OPENAI_CONFIG, OTHER_CONFIG
+from config import TELEGRAM_CONFIG, OPENAI_CONFIG, OTHER_CONFIG, SIGNAL_HISTORY_CONFIG, SIGNAL_UPDATE_CONFIG
 # 导入交易模块
-from gate_trading import execute_trade
-
-# 从test.py复制的交易信号模型
-class TradingSignal(BaseModel):
-    trading_pair: str
-    direction: str
-    entry_price: List[Union[str, float]]
-    target_price: List[float]
-    stop_loss: float
-
-    @model_validator(mode='after')
-    def check_prices_logic(self) -> 'TradingSignal':
-        """
-        验证交易信号中的价格逻辑是否一致。
-        - 多单: 目标价应高于入场价，止损价应低于入场价。
-        - 空单: 目标价应低于入场价，止损价应高于入场价。
-        """
-        # 获取一个纯数字的入场价格列表用于比较
-        numeric_entry_prices = [p for p in self.entry_price if isinstance(p, (int, float))]
-        
-        # 如果没有数字价格（例如只有 "现价"），则无法进行逻辑比较，跳过验证
-        if not numeric_entry_prices:
-            return self
-
-        min_entry = min(numeric_entry_prices)
-        max_entry = max(numeric_entry_prices)
-        
-        min_target = min(self.target_price)
-        max_target = max(self.target_price)
-
-        if self.direction == 'long':
-            if min_target <= max_entry:
-                raise ValueError(f"逻辑冲突 (多单): 最低目标价 {min_target} 必须高于最高入场价 {max_entry}。")
-            if self.stop_loss >= min_entry:
-                raise ValueError(f"逻辑冲突 (多单): 止损价 {self.stop_loss} 必须低于最低入场价 {min_entry}。")
-        
-        elif self.direction == 'short':
-            if max_target >= min_entry:
-                raise ValueError(f"逻辑冲突 (空单): 最高目标价 {max_target} 必须低于最低入场价 {min_entry}。")
-            if self.stop_loss <= max_entry:
-                raise ValueError(f"逻辑冲突 (空单): 止损价 {self.stop_loss} 必须高于最高入场价 {max_entry}。")
-                
-        return self
-
-# 设置OpenAI客户端
-client = OpenAI(
-    api_key=OPENAI_CONFIG['API_KEY'],
-    base_url=OPENAI_CONFIG['BASE_URL']
-)
+from multi_account import apply_signal_update, execute_trade, start_book_sync
+from request_scheduler import request_scheduler
+import routing
+from config_reloader import config_reloader
+from entity_cache import EntityCache, cache_path_for, verify_entities
+from prompt_templates import get_template, prompt_stats
+from batch_extractor import MicroBatcher
+from llm_router import LLMRouter, LLMUnavailable
+from json_stream import IncrementalObjectParser
+from local_extractor import extract_local
+from signal_tracker import SignalUpdate, parse_update, signal_tracker
+from signal_model import SIGNAL_FIELDS, Signal, SignalValidationError, parse_signal
+from signal_history import STATUS_FAILED, signal_history
+from signal_store import get_store
+from order_templates import order_templates
+from paper_exchange import paper_exchange
+
+# 设置模型服务路由（一个或多个 OpenAI 兼容服务，按延迟选择、超时对冲、熔断降级）
+llm_router = LLMRouter.from_config()
+# 提取线程池: 同步的提取函数在这里等待模型返回，大小与路由器的并发上限一致（默认线程池只有 CPU 核数 + 4 个线程）
+extract_executor = ThreadPoolExecutor(max_workers=OPENAI_CONFIG.get('MAX_CONCURRENCY', 64), thread_name_prefix='extract')
 
 # 从test.py复制的交易信号提取函数，修改为同时返回原始JSON响应和解析后的信号
-def extract_trade_signal(text: str) -> Tuple[Optional[TradingSignal], Dict[str, Any]]:
+def extract_trade_signal(text: str, prompt: str = None) -> Tuple[Optional[Signal], Dict[str, Any]]:
     """
-    使用 OpenAI 模型从文本中提取交易信号并用 Pydantic 进行验证。
-    成功则返回 TradingSignal 对象和原始JSON，失败则返回 None和原始JSON。
+    使用 OpenAI 模型从文本中提取交易信号并进行验证。
+    prompt 为 prompt_templates.TEMPLATES 中的模板名（按频道配置），默认使用完整示例模板。
+    成功则返回 Signal 对象和原始JSON，失败则返回 None和原始JSON。
     """
-    # 增强的提示，包含处理"现价"的例子
-    prompt = f"""
-你是一个专业的金融交易信号提取助手。
-你的任务是从给定的文本中提取交易信息，并严格按照指定的 JSON 格式输出。
-
-这里有四个例子来指导你：
-
----
-例子 1：范围价格 (可执行指令)
-- 输入文本:
-"BTC 116000-115500附近多
-目標 ；117000-118000附近
-止損: 114800附近"
-- 输出 JSON:
-{{
-  "trading_pair": "BTC/USDT",
-  "direction": "long",
-  "entry_price": [116000, 115500],
-  "target_price": [117000, 118000],
-  "stop_loss": 114800
-}}
-
----
-例子 2：现价 (可执行指令)
-- 输入文本:
-"ETH ；现价轻仓进-3625附近补仓多
-目標 ；3674-—3700
-止損:3615附近"
-- 输出 JSON:
-{{
-  "trading_pair": "ETH/USDT",
-  "direction": "long",
-  "entry_price": ["现价", 3625],
-  "target_price": [3674, 3700],
-  "stop_loss": 3615
-}}
-
----
-例子 3：条件性指令 (非可执行指令，应忽略)
-- 输入文本:
-"白盤留意117100-117600附近不破區間留意多單"
-- 输出 JSON:
-{{}}
-
----
-例子 4：缺少明确方向 (非可执行指令，应忽略)
-- 输入文本:
-"移動到116000-116500附近，目標在117000-118000附近，止損在115300附近"
-- 输出 JSON:
-{{}}
----
-
-现在，请从以下文本中提取交易信号。只提取可直接执行的明确指令。信号必须包含明确的 '多' 或 '空' 方向。对于市场分析、条件性指令、或不完整的信号，请返回一个空的 JSON 对象 {{}}。
----
-文本：
-{text}
----
-"""
+    if OPENAI_CONFIG.get('STREAMING'):
+        return extract_trade_signal_streaming(text, prompt)
+    template = get_template(prompt)
     try:
-        response = client.chat.completions.create(
-            model=OPENAI_CONFIG['MODEL'],
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant designed to output JSON, strictly following the user's specified format."},
-                {"role": "user", "content": prompt}
-            ],
+        start = time.perf_counter()
+        response, provider = llm_router.complete(
+            # 静态的指令和示例在 system 消息中且始终位于最前，只有待分析文本变化
+            template.messages(text),
             response_format={"type": "json_object"}
         )
-        
+        tokens = prompt_stats.record(template.name, getattr(response, 'usage', None), time.perf_counter() - start)
+        print(f"  - 提示词 [{template.name} @ {provider}]: {tokens['prompt_tokens']} tokens (缓存 {tokens['cached_tokens']}), "
+              f"输出 {tokens['completion_tokens']} tokens")
+
         raw_response = response.choices[0].message.content
         response_data = json.loads(raw_response)
-        
-        # 预先检查关键字段是否存在，如果不存在或为空，则认为不是有效信号
-        required_keys = ["direction", "entry_price", "target_price", "stop_loss"]
-        if not response_data or not all(key in response_data for key in required_keys):
-            return None, response_data
+        return validate_signal_data(response_data)
 
-        trade_data = TradingSignal.model_validate(response_data)
-        return trade_data, response_data
+    except (json.JSONDecodeError, IndexError) as e:
+        print(f"  - JSON 解析或响应格式错误: {e}")
+        return None, {"error": str(e)}
+    except LLMUnavailable as e:
+        print(f"  - 模型服务不可用: {e}")
+        return None, {"error": str(e)}
+    except Exception as e:
+        print(f"  - 发生未知错误: {e}")
+        return None, {"error": str(e)}
 
-    except ValidationError as e:
-        # 直接打印ValidationError的字符串形式，可以更清晰地显示自定义错误
+def validate_signal_data(response_data: Dict[str, Any]) -> Tuple[Optional[Signal], Dict[str, Any]]:
+    """校验模型输出的单个信号，返回 (Signal 或 None, 原始JSON)"""
+    # 预先检查关键字段是否存在，如果不存在或为空，则认为不是有效信号
+    required_keys = ["direction", "entry_price", "target_price", "stop_loss"]
+    if not response_data or not all(key in response_data for key in required_keys):
+        return None, response_data
+    try:
+        # 热路径使用 signal_model 的快速校验，规则与 Pydantic 模型 TradingSignal 相同
+        return parse_signal(response_data), response_data
+    except SignalValidationError as e:
         print(f"  - 数据验证失败: {e}")
         return None, {"error": str(e)}
-    except (json.JSONDecodeError, IndexError) as e:
+
+def extract_trade_signal_local(text: str, prompt: str = None) -> Tuple[Optional[Signal], Dict[str, Any]]:
+    """使用本地后端（local_extractor.py）提取信号，不请求远程模型，返回格式与 extract_trade_signal 相同"""
+    try:
+        return validate_signal_data(extract_local(text, prompt))
+    except Exception as e:
+        print(f"  - 本地提取失败: {e}")
+        return None, {"error": str(e)}
+
+def extract_trade_signal_streaming(text: str, prompt: str = None) -> Tuple[Optional[Signal], Dict[str, Any]]:
+    """
+    流式提取: 边接收边解析，输出为空对象或信号字段全部完整时立即结束请求。
+    返回值与 extract_trade_signal 相同。
+    """
+    template = get_template(prompt)
+    parser = IncrementalObjectParser()
+    try:
+        start = time.perf_counter()
+        chunks, provider = llm_router.stream(template.messages(text), response_format={"type": "json_object"})
+        early = False
+        try:
+            for chunk in chunks:
+                parser.feed(chunk)
+                if parser.closed or parser.has_fields(SIGNAL_FIELDS):
+                    early = not parser.closed
+                    break
+        finally:
+            # 提前结束时关闭连接，不再接收剩余输出
+            chunks.close()
+        elapsed = time.perf_counter() - start
+        prompt_stats.record(f"{template.name}/stream", None, elapsed)
+        print(f"  - 流式提取 [{template.name} @ {provider}]: {elapsed * 1000:.0f} ms, 接收 {len(parser.text)} 字符"
+              f"{' (提前结束)' if early else ''}")
+
+        if parser.closed or parser.has_fields(SIGNAL_FIELDS):
+            return validate_signal_data(parser.fields)
+        # 流结束但对象不完整（例如输出被截断），按完整文本解析
+        return validate_signal_data(json.loads(parser.text[parser.text.index('{'):]))
+
+    except (json.JSONDecodeError, ValueError) as e:
         print(f"  - JSON 解析或响应格式错误: {e}")
         return None, {"error": str(e)}
+    except LLMUnavailable as e:
+        print(f"  - 模型服务不可用: {e}")
+        return None, {"error": str(e)}
     except Exception as e:
         print(f"  - 发生未知错误: {e}")
         return None, {"error": str(e)}
 
+def extract_trade_signals_batch(texts: List[str], prompt: str = None) -> List[Tuple[Optional[Signal], Dict[str, Any]]]:
+    """
+    一次请求提取多条消息的交易信号，结果顺序与 texts 一致，每条结果单独校验。
+    模型漏掉或返回格式错误的消息回退到单条提取。
+    """
+    template = get_template(prompt)
+    items = {}
+    try:
+        start = time.perf_counter()
+        response, provider = llm_router.complete(
+            template.batch_messages(texts),
+            response_format={"type": "json_object"}
+        )
+        tokens = prompt_stats.record(f"{template.name}/batch", getattr(response, 'usage', None), time.perf_counter() - start)
+        print(f"  - 批量提示词 [{template.name} @ {provider}]: {tokens['prompt_tokens']} tokens (缓存 {tokens['cached_tokens']}), "
+              f"{len(texts)} 条消息")
+        response_data = json.loads(response.choices[0].message.content)
+        for item in response_data.get('results', []):
+            if isinstance(item, dict) and str(item.get('id', '')).isdigit():
+                items[int(item.pop('id'))] = item
+    except Exception as e:
+        print(f"  - 批量提取失败，逐条重试: {e}")
+
+    results = []
+    for i, text in enumerate(texts, 1):
+        if i in items:
+            results.append(validate_signal_data(items[i]))
+        else:
+            results.append(extract_trade_signal(text, prompt))
+    return results
+
 # 从配置文件获取Telegram API配置
 API_ID = TELEGRAM_CONFIG['API_ID']
 API_HASH = TELEGRAM_CONFIG['API_HASH']
@@ -179,8 +182,19 @@ SESSION_FILE = TELEGRAM_CONFIG['SESSION_FILE']
 TARGET_CHANNEL_IDS = TELEGRAM_CONFIG['TARGET_CHANNEL_IDS']
 TARGET_TOPICS = TELEGRAM_CONFIG.get('TARGET_TOPICS', {})
 
-# 信号历史存储
-signal_history = []
+# 提取器注册表: 路由配置中的 EXTRACTOR 名称 -> 提取函数
+EXTRACTORS = {
+    'llm': extract_trade_signal,
+    'local': extract_trade_signal_local
+}
+
+# 微批量提取（仅用于 'llm' 提取器），BATCH_WINDOW_MS 为 0 时关闭
+batcher = MicroBatcher(
+    extract_trade_signal,
+    extract_trade_signals_batch,
+    window=OPENAI_CONFIG.get('BATCH_WINDOW_MS', 0) / 1000,
+    max_size=OPENAI_CONFIG.get('BATCH_MAX_SIZE', 8)
+) if OPENAI_CONFIG.get('BATCH_WINDOW_MS') else None
 
 class ExponentialBackoff:
     """指数退避重试策略"""
@@ -203,13 +217,13 @@ class ExponentialBackoff:
         """重置尝试次数"""
         self.attempt = 0
 
-async def create_telegram_client():
-    """创建并返回一个优化的Telegram客户端"""
+async def create_telegram_client(session_file=None, api_id=None, api_hash=None):
+    """创建并返回一个优化的Telegram客户端（默认使用 TELEGRAM_CONFIG 中的会话）"""
     # 🚀 高性能连接配置
     client = TelegramClient(
-        SESSION_FILE,
-        API_ID,
-        API_HASH,
+        session_file or SESSION_FILE,
+        api_id or API_ID,
+        api_hash or API_HASH,
         # 连接优化
         connection=ConnectionTcpFull,     # 使用完整TCP连接，更稳定
         connection_retries=5,             # 减少重试次数，加快失败检测
@@ -224,177 +238,286 @@ async def create_telegram_client():
     )
     return client
 
+# 信号文件的读-改-写在工作线程中进行，同一进程内的并发保存由该锁串行化；
+# 分进程模式下只有唯一的执行进程写信号文件
+_signals_file_lock = threading.Lock()
+
 async def save_signal_to_file(signal_dict):
-    """将交易信号异步地保存到JSON文件，避免阻塞事件循环"""
+    """将交易信号异步地保存到JSON文件（并写入信号数据库），避免阻塞事件循环"""
     def _save():
         try:
-            # 读取现有信号
-            try:
-                with open(OTHER_CONFIG['SIGNALS_FILE'], 'r', encoding='utf-8') as f:
-                    signals = json.load(f)
-            except (FileNotFoundError, json.JSONDecodeError):
-                signals = []
+            with _signals_file_lock:
+                # 读取现有信号
+                try:
+                    with open(OTHER_CONFIG['SIGNALS_FILE'], 'r', encoding='utf-8') as f:
+                        signals = json.load(f)
+                except (FileNotFoundError, json.JSONDecodeError):
+                    signals = []
 
-            # 添加新信号
-            signals.append(signal_dict)
+                # 添加新信号
+                signals.append(signal_dict)
 
-            # 写入文件
-            with open(OTHER_CONFIG['SIGNALS_FILE'], 'w', encoding='utf-8') as f:
-                json.dump(signals, f, ensure_ascii=False, indent=4)
+                # 写入文件
+                with open(OTHER_CONFIG['SIGNALS_FILE'], 'w', encoding='utf-8') as f:
+                    json.dump(signals, f, ensure_ascii=False, indent=4)
 
             print(f"交易信号已保存到 {OTHER_CONFIG['SIGNALS_FILE']}")
         except Exception as e:
             print(f"保存交易信号时出错: {e}")
 
+        try:
+            store = get_store()
+            if store:
+                store.save_record(signal_dict)
+        except Exception as e:
+            print(f"写入信号数据库时出错: {e}")
+
     await asyncio.to_thread(_save)
 
-async def handle_messages(client, backoff):
-    """处理消息并设置事件处理程序"""
+def is_duplicate_signal(signal_dict):
+    """
+    窗口期内已出现过相同信号（多个频道转发同一信号）时返回 True，否则把信号加入信号历史。
+    查询和加入之间没有 await，同一进程内并发的信号不会同时通过；
+    信号历史是进程内状态，分进程模式下只能在唯一的执行进程中调用。
+    """
+    if SIGNAL_HISTORY_CONFIG.get('DEDUP_ENABLED', True):
+        duplicate = signal_history.find_duplicate(signal_dict)
+        if duplicate:
+            print(f"\n⚠️ 与频道 {duplicate.chat_id} 的消息 {duplicate.message_id} 信号重复，跳过 (消息ID: {signal_dict['message_id']})")
+            return True
+    signal_history.add(signal_dict)
+    return False
+
+async def extract_signal_from_text(message_id, text, chat_id, topic_id, timestamp, reply_to_msg_id=None, dedup=True):
+    """
+    提取交易信号并保存，返回信号字典；未检测到有效信号时返回 None
+    修改/取消已有信号的消息返回带 'update' 字段的指令字典，由 execute_signal 处理
+    dedup 为 False 时不做重复信号过滤、也不保存到信号文件（分进程模式的提取进程，由执行进程过滤并保存）
+    """
+    print(f"\n\n{'='*60}")
+    print(f"🔄 异步处理消息 (ID: {message_id}, 时间: {timestamp}):")
+    print(f"{'='*60}")
+    print(f"{text}")
+    print(f"{'='*60}")
+
+    # 按路由配置选择提取器和提示词模板
+    route = routing.routing_table.lookup(chat_id, topic_id)
+    extractor = EXTRACTORS.get(route.extractor, extract_trade_signal) if route else extract_trade_signal
+    prompt = route.prompt if route else None
+
+    # 提取交易信号
+    print("正在分析消息...")
+    if batcher and extractor is extract_trade_signal:
+        signal, raw_json = await batcher.extract(text, prompt)
+    else:
+        signal, raw_json = await asyncio.get_running_loop().run_in_executor(extract_executor, extractor, text, prompt)
+
+    # 输出大模型返回的原始JSON数据
+    print(f"\n【大模型原始JSON输出】:")
+    print(f"{'-'*60}")
+    print(json.dumps(raw_json, ensure_ascii=False, indent=2))
+    print(f"{'-'*60}")
+
+    if not signal:
+        # 不是完整信号时再识别修改/取消指令（"止損放在；3102"、"空單先取消"），新信号不会被当成修改
+        update = parse_update(text) if SIGNAL_UPDATE_CONFIG.get('ENABLED', True) else None
+        if update:
+            print(f"\n✏️ 识别为信号修改指令: {update} (回复消息: {reply_to_msg_id})")
+            return {
+                'update': update.to_dict(),
+                'timestamp': timestamp,
+                'message_id': message_id,
+                'chat_id': chat_id,
+                'topic_id': topic_id,
+                'reply_to_msg_id': reply_to_msg_id,
+                'original_text': text
+            }
+        print(f"\n❌ 未检测到有效交易信号 (消息ID: {message_id})。")
+        return None
+
+    signal_dict = signal.to_dict()
+    signal_dict['timestamp'] = timestamp
+    signal_dict['message_id'] = message_id
+    signal_dict['chat_id'] = chat_id
+    signal_dict['topic_id'] = topic_id
+    signal_dict['sizing_profile'] = route.sizing_profile if route else routing.DEFAULT_SIZING_PROFILE
+    signal_dict['original_text'] = text
+    signal_dict['raw_json'] = raw_json  # 保存原始JSON数据
+
+    # 跳过窗口期内已出现过的相同信号（多个频道转发同一信号时只执行一次）
+    if dedup and is_duplicate_signal(signal_dict):
+        return None
+
+    print(f"\n✅ 检测到交易信号! (消息ID: {message_id})")
+    print(f"{'='*60}")
+    print(f"交易对: {signal.trading_pair}")
+    print(f"方向: {'多' if signal.direction == 'long' else '空'}")
+    print(f"入场价: {signal.entry_price}")
+    print(f"目标价: {signal.target_price}")
+    print(f"止损: {signal.stop_loss}")
+    print(f"{'='*60}")
+
+    # 将信号保存到文件（分进程模式下由执行进程在过滤重复信号后保存）
+    if dedup:
+        await save_signal_to_file(signal_dict)
+    return signal_dict
+
+def load_saved_signals():
+    """读取信号文件中的全部记录"""
+    try:
+        with open(OTHER_CONFIG['SIGNALS_FILE'], 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return []
+
+async def execute_update(update_dict):
+    """把修改/取消指令应用到对应的已执行信号，并保存指令记录"""
+    message_id = update_dict['message_id']
+    chat_id = update_dict['chat_id']
+    reply_to_msg_id = update_dict.get('reply_to_msg_id')
+    update = SignalUpdate.from_dict(update_dict['update'])
+
+    targets = signal_tracker.resolve(chat_id, reply_to_msg_id, update)
+    if not targets:
+        # 本进程没有记录（重启后，或由其他执行进程下单），从信号文件恢复后再找一次
+        signal_tracker.restore(await asyncio.to_thread(load_saved_signals))
+        targets = signal_tracker.resolve(chat_id, reply_to_msg_id, update)
+    if not targets:
+        print(f"⚠️ 未找到对应的已执行信号，忽略修改指令 (消息ID: {message_id})")
+        return update_dict
+
+    results = {}
+    for tracked in targets:
+        target_id = tracked.signal['message_id']
+        print(f"\n✏️ 修改信号 {tracked}: {update}")
+        result = await apply_signal_update(tracked.signal, update)
+        signal_tracker.record_update(tracked, update, message_id, result)
+        results[str(target_id)] = result
+        if result.get('success'):
+            print(f"✅ 信号修改完成 (原信号消息ID: {target_id}): {result.get('actions') or result.get('note')}")
+        else:
+            print(f"❌ 信号修改失败 (原信号消息ID: {target_id}): {result.get('error', '未知错误')}")
+        # 重新保存原信号，记录其最新的订单和止损/目标
+        await save_signal_to_file(tracked.signal)
+
+    update_dict['target_message_ids'] = [tracked.signal['message_id'] for tracked in targets]
+    update_dict['update_result'] = {
+        'success': all(result.get('success') for result in results.values()),
+        'signals': results
+    }
+    await save_signal_to_file(update_dict)
+    return update_dict
+
+async def execute_signal(signal_dict):
+    """执行交易并将交易结果追加保存到信号记录"""
+    if 'update' in signal_dict:
+        return await execute_update(signal_dict)
+    message_id = signal_dict['message_id']
+    print(f"\n🚀 开始执行交易... (消息ID: {message_id})")
+    try:
+        trade_result = await execute_trade(signal_dict)
+
+        if trade_result.get('success'):
+            print(f"✅ 交易执行成功! (消息ID: {message_id})")
+            print(f"交易对: {trade_result['symbol']}")
+            print(f"方向: {'多' if trade_result['direction'] == 'long' else '空'}")
+            print(f"入场价格: {trade_result['entry_price']}")
+            print(f"仓位大小: {trade_result['position_size']}")
+            print(f"创建订单数: {len(trade_result['orders'])}")
+            if 'accounts' in trade_result:
+                print(f"成功账户: {trade_result['accounts_succeeded']}/{trade_result['accounts_total']}")
+
+            # 更新信号字典，添加交易结果
+            signal_dict['trade_result'] = trade_result
+            signal_dict['trade_executed'] = True
+            # 跟踪信号状态，后续的修改/取消消息据此调整订单
+            signal_tracker.track(signal_dict)
+
+            # 重新保存包含交易结果的信号
+            await save_signal_to_file(signal_dict)
+
+        else:
+            print(f"❌ 交易执行失败 (消息ID: {message_id}): {trade_result.get('error', '未知错误')}")
+            signal_dict['trade_result'] = trade_result
+            signal_dict['trade_executed'] = False
+            signal_history.mark(signal_dict['chat_id'], message_id, STATUS_FAILED)
+            await save_signal_to_file(signal_dict)
+
+    except Exception as e:
+        print(f"❌ 交易执行异常 (消息ID: {message_id}): {e}")
+        signal_dict['trade_result'] = {'success': False, 'error': str(e)}
+        signal_dict['trade_executed'] = False
+        signal_history.mark(signal_dict['chat_id'], message_id, STATUS_FAILED)
+        await save_signal_to_file(signal_dict)
+    return signal_dict
+
+async def process_message_async(message_id, text, chat_id, topic_id, timestamp, reply_to_msg_id=None):
+    """异步处理消息的核心逻辑（单进程模式: 提取后立即执行交易）"""
+    try:
+        signal_dict = await extract_signal_from_text(message_id, text, chat_id, topic_id, timestamp, reply_to_msg_id)
+        if signal_dict:
+            await execute_signal(signal_dict)
+    except Exception as e:
+        print(f"❌ 异步处理消息时出错 (消息ID: {message_id}): {e}")
+        import traceback
+        traceback.print_exc()
+
+async def handle_messages(client, backoff, dispatch=None, chats=None):
+    """
+    处理消息并设置事件处理程序
+    dispatch(message_id, text, chat_id, topic_id, timestamp, reply_to_msg_id) 为消息分发函数；
+    默认在本进程内提取并执行（单进程模式），pipeline.py / session_pool.py 会传入各自的分发函数
+    chats 为本客户端负责的频道/群组ID集合，默认监听全部目标
+    """
+    local_mode = dispatch is None
+    if local_mode:
+        def dispatch(message_id, text, chat_id, topic_id, timestamp, reply_to_msg_id=None):
+            asyncio.create_task(process_message_async(message_id, text, chat_id, topic_id, timestamp, reply_to_msg_id))
+
     print(f"\n=== 设置消息监听器 ===")
-    print(f"目标频道IDs: {TARGET_CHANNEL_IDS}")
-    print(f"目标话题配置: {TARGET_TOPICS}")
+    print(f"目标频道IDs: {sorted(routing.routing_table.channels)}")
+    print(f"目标话题配置: {routing.routing_table.topics}")
 
     # 🚀 高性能消息监听器配置
-    target_chats = list(TARGET_CHANNEL_IDS) + list(TARGET_TOPICS.keys())
-
-    @client.on(events.NewMessage(
-        chats=target_chats,
-        # 优化参数
-        incoming=True,              # 只监听传入消息
-        outgoing=False,             # 不监听发出消息
-        from_users=None,            # 监听所有用户
-        forwards=None,              # 包含转发消息
-        pattern=None,               # 不使用模式匹配（更快）
-        blacklist_chats=False,      # 不使用黑名单
-        func=None                   # 不使用额外过滤函数
-    ))
+    # chats 过滤在 Telethon 内部完成，func 使用预编译路由表丢弃非目标话题、媒体和空消息，
+    # 无关更新不会进入下面的处理函数
+    def build_event(table):
+        target_chats = table.chats
+        if chats is not None:
+            target_chats = target_chats & frozenset(chats)
+        return events.NewMessage(
+            chats=list(target_chats),
+            # 优化参数
+            incoming=True,              # 只监听传入消息
+            outgoing=False,             # 不监听发出消息
+            from_users=None,            # 监听所有用户
+            forwards=None,              # 包含转发消息
+            pattern=None,               # 不使用模式匹配（更快）
+            blacklist_chats=False,      # 不使用黑名单
+            func=lambda event: routing.routing_table.event_filter(event)
+        )
+
     async def handle_new_message(event):
         message = event.message
+        chat_id = event.route.chat_id
+        topic_id, reply_to_msg_id = routing.message_thread(message.reply_to)
+
+        # 🚀 分发消息（默认创建异步任务处理），立即返回继续监听
+        print(f"\n⚡ [快速处理] 目标消息 (ID: {message.id}) | 频道ID: {chat_id} | 话题ID: {topic_id}")
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        dispatch(message.id, message.text, chat_id, topic_id, timestamp, reply_to_msg_id)
 
-        # 检查消息来源
-        chat_id = None
-        if hasattr(message, 'peer_id'):
-            if hasattr(message.peer_id, 'channel_id'):
-                chat_id = -int(message.peer_id.channel_id) - 1000000000000
-            elif hasattr(message.peer_id, 'chat_id'):
-                chat_id = -message.peer_id.chat_id
-            elif hasattr(message.peer_id, 'user_id'):
-                chat_id = message.peer_id.user_id
-
-        # 检查话题信息（如果是超级群组消息）
-        topic_id = None
-        if hasattr(message, 'reply_to') and message.reply_to:
-            if hasattr(message.reply_to, 'reply_to_msg_id'):
-                topic_id = message.reply_to.reply_to_msg_id
-
-        # 快速预过滤：只对目标频道/群组显示调试信息
-        if chat_id in TARGET_TOPICS or chat_id in TARGET_CHANNEL_IDS:
-            print(f"\n⚡ [快速处理] 目标消息 (ID: {message.id}):")
-            print(f"   频道ID: {chat_id} | 话题ID: {topic_id}")
-            print(f"   文本预览: {message.text[:30] if message.text else 'None'}...")
-
-        # 🚀 快速过滤：提前退出不相关消息
-        # 1. 快速检查是否为目标频道
-        is_target_channel = chat_id in TARGET_CHANNEL_IDS
-
-        # 2. 快速检查是否为目标话题
-        is_target_topic = False
-        if chat_id in TARGET_TOPICS:
-            target_topics = TARGET_TOPICS[chat_id]
-            is_target_topic = topic_id in target_topics
-
-        # 如果不是目标频道或话题，立即返回
-        if not (is_target_channel or is_target_topic):
-            return
+    client.add_event_handler(handle_new_message, build_event(routing.routing_table))
 
-        # 快速过滤：媒体消息和无文本消息
-        if message.media or not message.text:
+    def on_config_reload(old_table, new_table):
+        # 监听目标变化时在现有连接上重新注册处理程序，不断开会话
+        if new_table.chats == old_table.chats:
             return
+        client.remove_event_handler(handle_new_message, events.NewMessage)
+        client.add_event_handler(handle_new_message, build_event(new_table))
+        print(f"🔄 已重新注册消息监听器，目标数: {len(new_table.chats)}")
 
-        # 🚀 创建异步任务处理消息，立即返回继续监听
-        print(f"   🚀 处理消息 {message.id}")
-        asyncio.create_task(process_message_async(message, chat_id, topic_id, timestamp))
-
-    async def process_message_async(message, chat_id, topic_id, timestamp):
-        """异步处理消息的核心逻辑"""
-        try:
-            text = message.text
-
-            print(f"\n\n{'='*60}")
-            print(f"🔄 异步处理消息 (ID: {message.id}, 时间: {timestamp}):")
-            print(f"{'='*60}")
-            print(f"{text}")
-            print(f"{'='*60}")
-
-            # 提取交易信号
-            print("正在分析消息...")
-            signal, raw_json = await asyncio.to_thread(extract_trade_signal, text)
-
-            # 输出大模型返回的原始JSON数据
-            print(f"\n【大模型原始JSON输出】:")
-            print(f"{'-'*60}")
-            print(json.dumps(raw_json, ensure_ascii=False, indent=2))
-            print(f"{'-'*60}")
-
-            if signal:
-                signal_dict = signal.model_dump()
-                signal_dict['timestamp'] = timestamp
-                signal_dict['message_id'] = message.id
-                signal_dict['original_text'] = text
-                signal_dict['raw_json'] = raw_json  # 保存原始JSON数据
-                signal_history.append(signal_dict)
-
-                print(f"\n✅ 检测到交易信号! (消息ID: {message.id})")
-                print(f"{'='*60}")
-                print(f"交易对: {signal.trading_pair}")
-                print(f"方向: {'多' if signal.direction == 'long' else '空'}")
-                print(f"入场价: {signal.entry_price}")
-                print(f"目标价: {signal.target_price}")
-                print(f"止损: {signal.stop_loss}")
-                print(f"{'='*60}")
-
-                # 将信号保存到文件
-                await save_signal_to_file(signal_dict)
-
-                # 执行交易
-                print(f"\n🚀 开始执行交易... (消息ID: {message.id})")
-                try:
-                    trade_result = await execute_trade(signal_dict)
-
-                    if trade_result.get('success'):
-                        print(f"✅ 交易执行成功! (消息ID: {message.id})")
-                        print(f"交易对: {trade_result['symbol']}")
-                        print(f"方向: {'多' if trade_result['direction'] == 'long' else '空'}")
-                        print(f"入场价格: {trade_result['entry_price']}")
-                        print(f"仓位大小: {trade_result['position_size']}")
-                        print(f"创建订单数: {len(trade_result['orders'])}")
-
-                        # 更新信号字典，添加交易结果
-                        signal_dict['trade_result'] = trade_result
-                        signal_dict['trade_executed'] = True
-
-                        # 重新保存包含交易结果的信号
-                        await save_signal_to_file(signal_dict)
-
-                    else:
-                        print(f"❌ 交易执行失败 (消息ID: {message.id}): {trade_result.get('error', '未知错误')}")
-                        signal_dict['trade_result'] = trade_result
-                        signal_dict['trade_executed'] = False
-                        await save_signal_to_file(signal_dict)
-
-                except Exception as e:
-                    print(f"❌ 交易执行异常 (消息ID: {message.id}): {e}")
-                    signal_dict['trade_result'] = {'success': False, 'error': str(e)}
-                    signal_dict['trade_executed'] = False
-                    await save_signal_to_file(signal_dict)
-            else:
-                print(f"\n❌ 未检测到有效交易信号 (消息ID: {message.id})。")
-
-        except Exception as e:
-            print(f"❌ 异步处理消息时出错 (消息ID: {message.id}): {e}")
-            import traceback
-            traceback.print_exc()
+    config_reloader.add_listener(on_config_reload)
 
     # 重置退避计时器，因为连接成功了
     backoff.reset()
@@ -410,12 +533,29 @@ async def handle_messages(client, backoff):
                 ping_count += 1
                 if ping_count % 2 == 0:  # 每60秒显示一次状态
                     print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 监听状态正常，等待消息...")
+                    llm_stats = '\n'.join(filter(None, [
+                        prompt_stats.format_stats(), llm_router.format_stats(), batcher.format_stats() if batcher else ''
+                    ]))
+                    if llm_stats:
+                        print(f"信号提取统计:\n{llm_stats}")
+                    print(signal_history.format_stats())
+                    scheduler_metrics = request_scheduler.format_metrics()
+                    if scheduler_metrics:
+                        print(f"Gate请求调度统计:\n{scheduler_metrics}")
+                    template_stats = order_templates.format_stats()
+                    if template_stats:
+                        print(f"下单模板统计:\n{template_stats}")
+                    paper_stats = paper_exchange.format_stats()
+                    if paper_stats:
+                        print(f"模拟交易账户:\n{paper_stats}")
             except Exception as e:
                 print(f"保活ping失败: {e}")
                 # 不中断循环，继续尝试
 
     # 启动保活任务
     keep_alive_task = asyncio.create_task(keep_alive())
+    # 启动订单簿同步任务（定期对账 + 可选用户数据流）；分进程模式下由执行进程负责
+    book_tasks = await start_book_sync() if local_mode else []
     
     try:
         # 等待直到断开连接
@@ -423,14 +563,16 @@ async def handle_messages(client, backoff):
     except Exception as e:
         print(f"运行时发生错误: {e}")
     finally:
-        # 取消保活任务
-        keep_alive_task.cancel()
-        try:
-            await keep_alive_task
-        except asyncio.CancelledError:
-            pass
+        config_reloader.remove_listener(on_config_reload)
+        # 取消保活任务和订单簿同步任务
+        for task in [keep_alive_task] + book_tasks:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
 
-async def main():
+async def main(dispatch=None):
     """主函数，连接到Telegram并开始监听消息"""
     print("🚀 正在启动高性能Telegram监听程序...")
 
@@ -442,6 +584,25 @@ async def main():
     # 创建性能监控器
     performance_monitor = PerformanceOptimizer() if PERFORMANCE_MODULE_AVAILABLE else None
 
+    # 监视运行时配置文件，修改后无需重启即可生效
+    watcher = asyncio.create_task(config_reloader.watch())
+    try:
+        await run_session(dispatch)
+    finally:
+        watcher.cancel()
+
+async def run_session(dispatch=None, session=None, chats=None):
+    """
+    运行单个Telegram会话的连接/重连循环
+    session 为 TELEGRAM_CONFIG['SESSIONS'] 中的会话配置（默认使用主会话），
+    chats 为该会话负责的频道/群组ID集合（默认全部）
+    """
+    session = session or {}
+    session_name = session.get('NAME', 'default')
+    phone_number = session.get('PHONE_NUMBER', PHONE_NUMBER)
+    # 实体缓存在重连之间复用，重连时不再重复验证；access_hash 按账户区分，会话池中每个会话单独一个文件
+    entity_cache = EntityCache(cache_path_for(session.get('NAME')))
+
     backoff = ExponentialBackoff()
     max_retries = 20
     retry_count = 0
@@ -450,42 +611,47 @@ async def main():
         client = None
         try:
             # 创建新的客户端
-            client = await create_telegram_client()
+            client = await create_telegram_client(
+                session.get('SESSION_FILE'), session.get('API_ID'), session.get('API_HASH')
+            )
             
             # 连接到Telegram
-            await client.start(PHONE_NUMBER)
-            print("成功连接到Telegram！")
-            print(f"开始监听频道IDs: {TARGET_CHANNEL_IDS}")
-            print(f"开始监听话题配置: {TARGET_TOPICS}")
-
-            # 获取用户信息进行验证
-            me = await client.get_me()
+            connect_start = time.perf_counter()
+            await client.start(phone_number)
+            connect_ms = (time.perf_counter() - connect_start) * 1000
+            print(f"[{session_name}] 成功连接到Telegram！")
+            print(f"开始监听频道IDs: {sorted(routing.routing_table.channels)}")
+            print(f"开始监听话题配置: {routing.routing_table.topics}")
+
+            # 获取用户信息并并发验证频道/超级群组访问权限（命中本地缓存的跳过请求）
+            target_chats = routing.routing_table.chats
+            if chats is not None:
+                target_chats = target_chats & frozenset(chats)
+            me, verified = await asyncio.gather(
+                client.get_me(),
+                verify_entities(client, target_chats, entity_cache)
+            )
             print(f"当前登录用户: {me.first_name} (@{me.username})")
 
-            # 验证所有频道信息
-            print("\n=== 验证频道访问权限 ===")
-            for channel_id in TARGET_CHANNEL_IDS:
-                try:
-                    entity = await client.get_entity(channel_id)
-                    print(f"✅ 频道 (ID: {channel_id}): {entity.title}")
-                except Exception as e:
-                    print(f"❌ 无法访问频道 (ID: {channel_id}): {e}")
-
-            # 验证所有超级群组信息
-            print("\n=== 验证超级群组访问权限 ===")
-            for group_id, topic_ids in TARGET_TOPICS.items():
-                try:
-                    entity = await client.get_entity(group_id)
-                    print(f"✅ 超级群组 (ID: {group_id}): {entity.title}")
-                    print(f"   监听话题IDs: {topic_ids}")
-                except Exception as e:
-                    print(f"❌ 无法访问超级群组 (ID: {group_id}): {e}")
-            
+            print("\n=== 验证频道/超级群组访问权限 ===")
+            for chat_id in sorted(target_chats):
+                entry = verified['entities'].get(chat_id)
+                kind = '超级群组' if chat_id in routing.routing_table.topics else '频道'
+                if entry is None:
+                    print(f"❌ 无法访问{kind} (ID: {chat_id}): {verified['failed'].get(chat_id)}")
+                    continue
+                print(f"✅ {kind} (ID: {chat_id}): {entry['title']}")
+                if chat_id in routing.routing_table.topics:
+                    print(f"   监听话题IDs: {sorted(routing.routing_table.topics[chat_id])}")
+            print(f"⏱️ [{session_name}] 启动耗时: 连接 {connect_ms:.0f} ms | 实体验证 {verified['elapsed_ms']:.0f} ms "
+                  f"(缓存命中 {verified['cached']}, 请求 {verified['fetched']}, 失败 {len(verified['failed'])}) | "
+                  f"总计 {(time.perf_counter() - connect_start) * 1000:.0f} ms")
+
             # 处理消息
-            await handle_messages(client, backoff)
+            await handle_messages(client, backoff, dispatch, chats)
             
         except errors.FloodWaitError as e:
-            print(f"⚠️ 触发Telegram限流，需要等待 {e.seconds} 秒")
+            print(f"⚠️ [{session_name}] 触发Telegram限流，需要等待 {e.seconds} 秒")
             # 遇到限流时，等待指定的时间
             await asyncio.sleep(e.seconds + 5)  # 多等5秒以确保安全
         except errors.NetworkError as e:
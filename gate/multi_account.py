@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+多账户执行模块
+将一个已验证的交易信号并发地分发到多个 Gate.io 子账户，
+每个账户使用长期复用的客户端、独立的订单簿/风控/限流器，并按各自的保证金和杠杆计算仓位。
+"""
+
+import asyncio
+import logging
+import time
+from functools import partial
+from typing import Any, Dict, List
+
+# 导入配置
+from config import GATE_ACCOUNTS
+# 导入交易模块
+from gate_trading import (
+    GateTrading, apply_signal_update as apply_single_update, execute_trade as execute_single_trade, get_trader
+)
+from position_book import PositionBook
+from request_scheduler import RequestScheduler
+from risk_engine import RiskEngine
+from signal_store import get_store
+from signal_tracker import SignalUpdate
+
+# 设置日志
+logger = logging.getLogger(__name__)
+
+
+class MultiAccountExecutor:
+    """多账户并发执行器"""
+
+    def __init__(self, accounts: List[Dict[str, Any]] = None):
+        accounts = GATE_ACCOUNTS if accounts is None else accounts
+        self.traders: Dict[str, GateTrading] = {}
+        for account in accounts:
+            if not account.get('ENABLED', True):
+                continue
+            # 每个账户有独立的持仓、风控状态和 API 限额
+            book = PositionBook()
+            self.traders[account['NAME']] = GateTrading(
+                book=book,
+                risk=RiskEngine(book=book),
+                scheduler=RequestScheduler(),
+                account=account
+            )
+        logger.info(f"多账户执行器初始化完成: {list(self.traders)}")
+
+    async def _execute_one(self, name: str, trader: GateTrading, signal_data: Dict[str, Any]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            result = await trader.execute_trading_signal(signal_data)
+        except Exception as e:
+            logger.error(f"账户 {name} 交易执行失败: {e}")
+            result = {'success': False, 'error': str(e)}
+        result['latency_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        return result
+
+    async def execute(self, signal_data: Dict[str, Any]) -> Dict[str, Any]:
+        """在所有账户并发执行信号，返回汇总结果（每个账户的结果在 'accounts' 中）"""
+        names = list(self.traders)
+        results = await asyncio.gather(*(
+            self._execute_one(name, self.traders[name], signal_data) for name in names
+        ))
+        per_account = dict(zip(names, results))
+        succeeded = [name for name in names if per_account[name].get('success')]
+
+        aggregated = {
+            'success': bool(succeeded),
+            'accounts': per_account,
+            'accounts_succeeded': len(succeeded),
+            'accounts_total': len(names)
+        }
+        if succeeded:
+            first = per_account[succeeded[0]]
+            aggregated.update({
+                'symbol': first['symbol'],
+                'direction': first['direction'],
+                'entry_price': first['entry_price'],
+                'position_size': {name: per_account[name]['position_size'] for name in succeeded},
+                'orders': [dict(order, account=name) for name in succeeded for order in per_account[name]['orders']]
+            })
+        else:
+            aggregated['error'] = '; '.join(f"{name}: {per_account[name].get('error', '未知错误')}" for name in names)
+
+        logger.info(f"多账户执行完成: 成功 {len(succeeded)}/{len(names)}")
+        return aggregated
+
+    async def apply_update(self, signal_data: Dict[str, Any], update: SignalUpdate) -> Dict[str, Any]:
+        """在执行过该信号的所有账户上并发应用修改/取消指令"""
+        per_account_trades = (signal_data.get('trade_result') or {}).get('accounts', {})
+        names = [name for name, result in per_account_trades.items()
+                 if result.get('success') and name in self.traders]
+        results = await asyncio.gather(*(
+            self.traders[name].apply_signal_update(signal_data, per_account_trades[name], update) for name in names
+        ))
+        per_account = dict(zip(names, results))
+        succeeded = [name for name in names if per_account[name].get('success')]
+        aggregated = {'success': bool(succeeded), 'accounts': per_account}
+        if not succeeded:
+            aggregated['error'] = '; '.join(f"{name}: {per_account[name].get('error', '未知错误')}" for name in names) \
+                or '信号没有成功执行的账户'
+        logger.info(f"多账户信号修改完成: 成功 {len(succeeded)}/{len(names)}")
+        return aggregated
+
+    async def start_book_sync(self) -> List[asyncio.Task]:
+        """启动所有账户的订单簿同步任务"""
+        tasks = []
+        for trader in self.traders.values():
+            tasks.extend(await trader.start_book_sync())
+        return tasks
+
+
+_executor = None
+
+def get_executor() -> MultiAccountExecutor:
+    """获取进程内共享的多账户执行器"""
+    global _executor
+    if _executor is None:
+        _executor = MultiAccountExecutor()
+    return _executor
+
+def multi_account_enabled() -> bool:
+    return any(account.get('ENABLED', True) for account in GATE_ACCOUNTS)
+
+async def execute_trade(signal_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    执行交易的入口，供monitor_telegram_trading.py调用
+    配置了 GATE_ACCOUNTS 时分发到所有账户，否则使用 GATE_CONFIG 的单账户
+    """
+    if not multi_account_enabled():
+        return await execute_single_trade(signal_data)
+    try:
+        return await get_executor().execute(signal_data)
+    except Exception as e:
+        logger.error(f"多账户交易执行失败: {e}")
+        return {'success': False, 'error': str(e)}
+
+async def apply_signal_update(signal_data: Dict[str, Any], update: SignalUpdate) -> Dict[str, Any]:
+    """按修改/取消指令调整已执行信号的订单（单账户或全部账户）"""
+    if not multi_account_enabled():
+        return await apply_single_update(signal_data, update)
+    try:
+        return await get_executor().apply_update(signal_data, update)
+    except Exception as e:
+        logger.error(f"多账户信号修改失败: {e}")
+        return {'success': False, 'error': str(e)}
+
+def traders() -> List[GateTrading]:
+    """当前使用的全部交易客户端（单账户或全部账户）"""
+    if not multi_account_enabled():
+        return [get_trader()]
+    return list(get_executor().traders.values())
+
+async def start_book_sync() -> List[asyncio.Task]:
+    """启动订单簿同步（单账户或全部账户），订单簿上的成交同时写入信号数据库"""
+    store = get_store()
+    if store:
+        for trader in traders():
+            trader.book.fill_listeners.append(partial(store.record_fill, trader.account_name))
+    if not multi_account_enabled():
+        return await get_trader().start_book_sync()
+    return await get_executor().start_book_sync()
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+下单模板模块
+为每个合约预先准备下单所需的全部输入，信号到达后只需填入数量和价格:
+- 请求体骨架: 限价/市价入场单和价格触发单（止盈止损）的字典，直接作为 SDK 请求体，
+  不再为每个订单构造 gate_api 模型对象再序列化
+- 规格派生参数: 价格精度、合约乘数、数量上下限（来自合约规格缓存，规格刷新后自动重建）
+- 最新价: 后台定期批量拉取全部合约行情，开仓和判断止盈止损触发规则时不再单独查询合约
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional, Tuple
+
+# 导入配置
+from config import GATE_CONFIG, TEMPLATE_CONFIG
+# 导入合约规格缓存与取整函数
+from contract_specs import ContractSpecCache, calculate_contract_size, contract_specs, round_entry_price, round_price
+# 导入请求调度器（行情请求走查询令牌桶）
+from request_scheduler import PRIORITY_QUERY
+
+# 设置日志
+logger = logging.getLogger(__name__)
+
+
+class ContractTemplate:
+    """一个合约的下单模板；spec 为 None 时（规格未知）价格不取整"""
+    __slots__ = ('contract', 'spec', 'limit_body', 'market_body', 'trigger_initial', 'trigger_base')
+
+    def __init__(self, contract: str, spec: Optional[Dict[str, Any]]):
+        self.contract = contract
+        self.spec = spec
+        self.limit_body = {'contract': contract, 'tif': 'gtc'}
+        # 市价单价格为 0，必须使用 ioc
+        self.market_body = {'contract': contract, 'price': '0', 'tif': 'ioc'}
+        # 止盈止损: 平仓单 size 必须为 0，price 为 0 表示触发后按市价平仓
+        self.trigger_initial = {'contract': contract, 'size': 0, 'price': '0', 'close': True,
+                                'reduce_only': True, 'tif': 'ioc'}
+        # 价格触发策略，按最新价触发
+        self.trigger_base = {'strategy_type': 0, 'price_type': 0}
+
+    @property
+    def multiplier(self) -> float:
+        return self.spec['quanto_multiplier'] if self.spec else 1.0
+
+    def format_price(self, price: float, direction: str = None) -> str:
+        """按价格精度格式化；传入 direction 时按入场价规则取整（多单向下、空单向上）"""
+        if not self.spec:
+            return str(price)
+        if direction:
+            return round_entry_price(price, direction, self.spec)
+        return round_price(price, self.spec)
+
+    def position_size(self, margin: float, leverage: float, entry_price: float) -> int:
+        if self.spec:
+            return calculate_contract_size(margin, leverage, entry_price, self.spec)
+        raw_size = margin * leverage / entry_price
+        return max(int(raw_size), 1) if raw_size > 0 else 0
+
+    def limit_order(self, size: int, price: str) -> Dict[str, Any]:
+        body = self.limit_body.copy()
+        body['size'] = size
+        body['price'] = price
+        return body
+
+    def market_order(self, size: int) -> Dict[str, Any]:
+        body = self.market_body.copy()
+        body['size'] = size
+        return body
+
+    def trigger_order(self, trigger_price: str, rule: int, order_price: str = None) -> Dict[str, Any]:
+        initial = self.trigger_initial.copy()
+        if order_price:
+            initial['price'] = order_price
+            initial['tif'] = 'gtc'
+        trigger = self.trigger_base.copy()
+        trigger['price'] = trigger_price
+        trigger['rule'] = rule
+        return {'initial': initial, 'trigger': trigger}
+
+
+class OrderTemplateCache:
+    """按合约缓存下单模板和最新价"""
+
+    def __init__(self, specs: ContractSpecCache = None, config: Dict[str, Any] = None):
+        self.specs = specs or contract_specs
+        self.config = config if config is not None else TEMPLATE_CONFIG
+        self._templates: Dict[str, ContractTemplate] = {}
+        # 合约 -> (最新价, 更新时间)
+        self._prices: Dict[str, Tuple[float, float]] = {}
+        self._feed_task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, contract: str) -> ContractTemplate:
+        """获取合约模板；规格缓存更新（规格字典被替换）后重建，规格未知时返回不缓存的临时模板"""
+        template = self._templates.get(contract)
+        spec = self.specs.specs.get(contract)
+        if template is not None and template.spec is spec:
+            return template
+        template = ContractTemplate(contract, spec)
+        if spec is not None:
+            self._templates[contract] = template
+        return template
+
+    def warm(self) -> int:
+        """为规格缓存中的全部合约预先生成模板"""
+        for contract in self.specs.specs:
+            self.get(contract)
+        return len(self._templates)
+
+    def update_price(self, contract: str, price: float, now: float = None):
+        if price:
+            self._prices[contract] = (price, now or time.time())
+
+    def last_price(self, contract: str) -> Optional[float]:
+        """未过期的最新价，没有或已过期时返回 None（调用方改为查询交易所）"""
+        cached = self._prices.get(contract)
+        if cached and time.time() - cached[1] <= self.config.get('PRICE_MAX_AGE', 10):
+            self.hits += 1
+            return cached[0]
+        self.misses += 1
+        return None
+
+    def update_from_tickers(self, tickers: Any) -> int:
+        now = time.time()
+        for ticker in tickers:
+            try:
+                self.update_price(ticker.contract, float(ticker.last), now)
+            except (TypeError, ValueError):
+                continue
+        return len(tickers)
+
+    async def run_price_feed(self, futures_api: Any, settle: str = None, scheduler: Any = None, interval: float = None):
+        """定期批量拉取全部合约行情，保持最新价缓存有效"""
+        settle = settle or GATE_CONFIG['SETTLE']
+        interval = interval or self.config.get('PRICE_REFRESH_INTERVAL', 2)
+        while True:
+            try:
+                if scheduler:
+                    tickers = await scheduler.call('list_futures_tickers', futures_api.list_futures_tickers,
+                                                   settle, priority=PRIORITY_QUERY)
+                else:
+                    tickers = await asyncio.to_thread(futures_api.list_futures_tickers, settle)
+                self.update_from_tickers(tickers)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"刷新行情缓存失败: {e}")
+            await asyncio.sleep(interval)
+
+    def start_price_feed(self, futures_api: Any, settle: str = None, scheduler: Any = None) -> Optional[asyncio.Task]:
+        """启动行情刷新任务；进程内只运行一个（多账户共用行情），已在运行或未启用时返回 None"""
+        if not self.config.get('PRICE_FEED_ENABLED', True):
+            return None
+        if self._feed_task is not None and not self._feed_task.done():
+            return None
+        self._feed_task = asyncio.create_task(self.run_price_feed(futures_api, settle, scheduler))
+        return self._feed_task
+
+    def format_stats(self) -> str:
+        total = self.hits + self.misses
+        if not total:
+            return ''
+        return (f"  下单模板 {len(self._templates)} 个合约 | 行情缓存 {len(self._prices)} 个合约, "
+                f"命中 {self.hits}/{total} ({self.hits / total:.0%})")
+
+
+# 进程内共享的下单模板缓存
+order_templates = OrderTemplateCache()
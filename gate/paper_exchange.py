@@ -0,0 +1,553 @@
+# -*- coding: utf-8 -*-
+"""
+模拟交易所模块（纸面交易 / 影子模式）
+在进程内实现交易模块用到的 gate-api FuturesApi 接口（下单、撤单、价格触发单、持仓、账户、合约、行情），
+GATE_CONFIG['MODE'] = 'paper' 时注入 GateTrading，完整流程不向交易所提交任何订单:
+- 限价单: 可立即成交的按最新价成交（吃单），否则挂单，行情穿过限价时按限价成交（挂单）
+- 市价单 (price 为 0，ioc): 按最新价加滑点成交
+- 价格触发单: rule 1 为 价格 >= 触发价，rule 2 为 价格 <= 触发价；创建时已满足条件的按 Gate 规则拒绝，
+  触发后按 initial 下单，close=True 平掉整个持仓（无持仓时触发单失败）
+- 持仓按加权均价计算，平仓计入已实现盈亏，手续费按吃单/挂单费率从余额扣除
+行情来源 (PAPER_CONFIG['MARKET_DATA']):
+- 'live': 影子模式，从 Gate 公共行情接口（无需密钥）读取合约规格和最新价
+- 'local': 使用 PAPER_CONFIG 中的合约规格和初始价格，可按波动率随机游走，或由 set_price() 驱动（测试、压测）
+异步成交（挂单成交、触发单执行）以 Gate 用户数据流的频道格式推送，订单簿可直接消费。
+PAPER_CONFIG['LATENCY'] 为每次接口调用的模拟延迟，用于压测。
+"""
+
+import asyncio
+import itertools
+import logging
+import random
+import threading
+import time
+from collections import deque
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from gate_api.exceptions import ApiException
+
+# 导入配置
+from config import GATE_CONFIG, PAPER_CONFIG
+
+# 设置日志
+logger = logging.getLogger(__name__)
+
+# 触发规则: 1 为 价格 >= 触发价，2 为 价格 <= 触发价
+RULE_GE = 1
+RULE_LE = 2
+
+
+def _reject(label: str, message: str):
+    """与交易所拒单相同的异常类型，交易模块按原有逻辑处理"""
+    error = ApiException(status=400, reason=label)
+    error.body = message
+    raise error
+
+
+def _as_dict(obj: Any) -> Dict[str, Any]:
+    """请求体可以是字典（下单模板）或 gate-api 模型对象"""
+    if isinstance(obj, dict):
+        return obj
+    if hasattr(obj, 'to_dict'):
+        return obj.to_dict()
+    return dict(vars(obj))
+
+
+def _obj(data: Dict[str, Any]) -> SimpleNamespace:
+    """返回给调用方的快照，支持与 gate-api 模型相同的属性访问，嵌套字典同样转换"""
+    return SimpleNamespace(**{k: _obj(v) if isinstance(v, dict) else v for k, v in data.items()})
+
+
+class PaperExchange:
+    """各模拟账户共用的行情和合约规格"""
+
+    def __init__(self, config: Dict[str, Any] = None, market_api: Any = None):
+        self.config = config if config is not None else PAPER_CONFIG
+        self.live = self.config.get('MARKET_DATA', 'local') == 'live'
+        self._market_api = market_api
+        self.contracts: Dict[str, Dict[str, Any]] = {
+            name: dict(self.config.get('DEFAULT_CONTRACT', {}), **spec)
+            for name, spec in self.config.get('CONTRACTS', {}).items()
+        }
+        self.prices: Dict[str, float] = {name: float(price) for name, price in self.config.get('PRICES', {}).items()}
+        self.accounts: Dict[str, 'PaperAccount'] = {}
+        self._lock = threading.Lock()
+        self._feed_task: Optional[asyncio.Task] = None
+        # 影子模式上次加载全部合约规格的时间；未知合约（例如误提取的交易对）在 CONTRACTS_REFRESH 秒内不再重新加载
+        self._contracts_loaded_at: Optional[float] = None
+        self._load_lock = threading.Lock()
+
+    @property
+    def market_api(self) -> Any:
+        """影子模式下读取公共行情的 Gate 客户端（不带密钥）"""
+        if self._market_api is None:
+            import gate_api
+            configuration = gate_api.Configuration(host=self.config.get('MARKET_DATA_HOST', GATE_CONFIG['HOST']))
+            self._market_api = gate_api.FuturesApi(gate_api.ApiClient(configuration))
+        return self._market_api
+
+    def account(self, name: str = 'default', leverage: float = None, balance: float = None) -> 'PaperAccount':
+        """获取（或创建）一个模拟账户，账户实现 FuturesApi 接口"""
+        with self._lock:
+            if name not in self.accounts:
+                self.accounts[name] = PaperAccount(
+                    self, name,
+                    balance=balance if balance is not None else self.config.get('BALANCE', 10000),
+                    leverage=leverage or GATE_CONFIG['LEVERAGE']
+                )
+            return self.accounts[name]
+
+    # ---------- 合约与行情 ----------
+
+    def load_live_contracts(self):
+        """影子模式: 一次请求加载全部合约规格和价格"""
+        self._contracts_loaded_at = time.monotonic()
+        for contract in self.market_api.list_futures_contracts(GATE_CONFIG['SETTLE']):
+            self.contracts[contract.name] = {
+                'quanto_multiplier': contract.quanto_multiplier,
+                'order_size_min': contract.order_size_min,
+                'order_size_max': contract.order_size_max,
+                'order_price_round': contract.order_price_round,
+                'leverage_min': contract.leverage_min,
+                'leverage_max': contract.leverage_max
+            }
+            if contract.last_price and contract.name not in self.prices:
+                self.prices[contract.name] = float(contract.last_price)
+
+    def ensure_contract(self, contract: str):
+        """
+        影子模式下遇到未知合约时重新加载合约列表（网络请求），距上次加载不足 CONTRACTS_REFRESH 秒时直接返回。
+        下单前在账户锁之外调用，避免网络请求期间阻塞持有同一把锁的行情撮合。
+        """
+        if not self.live or contract in self.contracts:
+            return
+        with self._load_lock:
+            loaded_at = self._contracts_loaded_at
+            if contract in self.contracts or (
+                    loaded_at is not None and time.monotonic() - loaded_at < self.config.get('CONTRACTS_REFRESH', 300)):
+                return
+            self.load_live_contracts()
+
+    def spec(self, contract: str) -> Dict[str, Any]:
+        self.ensure_contract(contract)
+        spec = self.contracts.get(contract)
+        if spec is None:
+            if contract not in self.prices:
+                _reject('CONTRACT_NOT_FOUND', f"合约 {contract} 不存在")
+            # 本地行情中只设置了价格的合约使用默认规格
+            spec = self.contracts[contract] = dict(self.config.get('DEFAULT_CONTRACT', {}))
+        return spec
+
+    def multiplier(self, contract: str) -> float:
+        return float(self.spec(contract).get('quanto_multiplier') or 1)
+
+    def last_price(self, contract: str) -> float:
+        price = self.prices.get(contract)
+        if price is None:
+            _reject('CONTRACT_NOT_FOUND', f"合约 {contract} 没有行情")
+        return price
+
+    def contract_info(self, contract: str) -> Dict[str, Any]:
+        spec = self.spec(contract)
+        price = self.last_price(contract)
+        return dict(spec, name=contract, last_price=str(price), mark_price=str(price))
+
+    def set_price(self, contract: str, price: float):
+        """更新最新价，并撮合所有账户在该合约上的挂单和触发单"""
+        self.prices[contract] = float(price)
+        for account in list(self.accounts.values()):
+            account.on_price(contract, float(price))
+
+    async def run_feed(self, interval: float = None):
+        """行情任务: 影子模式轮询 Gate 公共行情；本地模式按 VOLATILITY 随机游走（为 0 时价格不动）"""
+        interval = interval or self.config.get('FEED_INTERVAL', 1)
+        volatility = self.config.get('VOLATILITY', 0)
+        while True:
+            try:
+                if self.live:
+                    tickers = await asyncio.to_thread(self.market_api.list_futures_tickers, GATE_CONFIG['SETTLE'])
+                    for ticker in tickers:
+                        if ticker.last:
+                            self.set_price(ticker.contract, float(ticker.last))
+                elif volatility:
+                    for contract, price in list(self.prices.items()):
+                        self.set_price(contract, price * (1 + random.gauss(0, volatility)))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"模拟交易所行情更新失败: {e}")
+            await asyncio.sleep(interval)
+
+    def start_feed(self) -> Optional[asyncio.Task]:
+        """启动行情任务；进程内只运行一个（多账户共用），已在运行时返回 None"""
+        if self._feed_task is not None and not self._feed_task.done():
+            return None
+        if not self.live and not self.config.get('VOLATILITY', 0):
+            return None
+        self._feed_task = asyncio.create_task(self.run_feed())
+        return self._feed_task
+
+    def format_stats(self) -> str:
+        lines = []
+        for account in list(self.accounts.values()):
+            summary = account.summary()
+            lines.append(f"  [{summary['account']}] 权益 {summary['equity']:.2f} (已实现 {summary['realised_pnl']:+.2f}, "
+                         f"未实现 {summary['unrealised_pnl']:+.2f}, 手续费 {summary['fees']:.2f}) | 成交 {summary['fills']} | "
+                         f"挂单 {summary['open_orders']} | 触发单 {summary['open_triggers']} | 持仓 {len(summary['positions'])}")
+        return '\n'.join(lines)
+
+
+class PaperAccount:
+    """一个模拟账户，方法签名与 gate-api FuturesApi 相同（settle 参数被忽略）"""
+
+    def __init__(self, exchange: PaperExchange, name: str, balance: float, leverage: float):
+        self.exchange = exchange
+        self.name = name
+        self.balance = float(balance)
+        self.initial_balance = float(balance)
+        self.leverage = float(leverage)
+        self.realised_pnl = 0.0
+        self.fees = 0.0
+        self.fill_count = 0
+        # 持仓: contract -> {'size': 带符号张数, 'entry_price': 均价}
+        self.positions: Dict[str, Dict[str, Any]] = {}
+        self.orders: Dict[str, Dict[str, Any]] = {}
+        self.triggers: Dict[str, Dict[str, Any]] = {}
+        self.finished_orders: Deque[Dict[str, Any]] = deque(maxlen=PAPER_CONFIG.get('HISTORY_SIZE', 1000))
+        self.finished_triggers: Deque[Dict[str, Any]] = deque(maxlen=PAPER_CONFIG.get('HISTORY_SIZE', 1000))
+        self._ids = itertools.count(int(time.time() * 1000))
+        # 调用来自调度器的工作线程，行情更新来自事件循环
+        self._lock = threading.RLock()
+        self._subscribers: List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = []
+
+    def _simulate_latency(self):
+        # 模拟接口往返延迟（在调度器的工作线程中调用，不阻塞事件循环）
+        latency = self.exchange.config.get('LATENCY', 0)
+        if latency:
+            time.sleep(latency)
+
+    # ---------- 合约与行情 ----------
+
+    def get_futures_contract(self, settle: str, contract: str) -> SimpleNamespace:
+        self._simulate_latency()
+        return _obj(self.exchange.contract_info(contract))
+
+    def list_futures_contracts(self, settle: str) -> List[SimpleNamespace]:
+        self._simulate_latency()
+        if self.exchange.live and not self.exchange.contracts:
+            self.exchange.load_live_contracts()
+        return [_obj(self.exchange.contract_info(name)) for name in list(self.exchange.contracts)
+                if name in self.exchange.prices]
+
+    def list_futures_tickers(self, settle: str, contract: str = None) -> List[SimpleNamespace]:
+        self._simulate_latency()
+        prices = self.exchange.prices
+        names = [contract] if contract else list(prices)
+        return [_obj({'contract': name, 'last': str(prices[name]), 'mark_price': str(prices[name])})
+                for name in names if name in prices]
+
+    # ---------- 普通订单 ----------
+
+    def create_futures_order(self, settle: str, futures_order: Any) -> SimpleNamespace:
+        self._simulate_latency()
+        request = _as_dict(futures_order)
+        self.exchange.ensure_contract(request['contract'])
+        with self._lock:
+            return _obj(self._place(request))
+
+    def cancel_futures_order(self, settle: str, order_id: str) -> SimpleNamespace:
+        self._simulate_latency()
+        with self._lock:
+            order = self.orders.pop(str(order_id), None)
+            if order is None:
+                _reject('ORDER_NOT_FOUND', f"订单 {order_id} 不存在或已完成")
+            self._finish(order, 'cancelled')
+            return _obj(order)
+
+    def list_futures_orders(self, settle: str, status: str, contract: str = None, **kwargs) -> List[SimpleNamespace]:
+        self._simulate_latency()
+        with self._lock:
+            orders = self.orders.values() if status == 'open' else self.finished_orders
+            return [_obj(order) for order in orders if contract is None or order['contract'] == contract]
+
+    # ---------- 价格触发单 ----------
+
+    def create_price_triggered_order(self, settle: str, futures_price_triggered_order: Any) -> SimpleNamespace:
+        self._simulate_latency()
+        request = _as_dict(futures_price_triggered_order)
+        initial = _as_dict(request['initial'])
+        trigger = _as_dict(request['trigger'])
+        contract = initial['contract']
+        self.exchange.ensure_contract(contract)
+        with self._lock:
+            price = float(trigger['price'])
+            rule = int(trigger['rule'])
+            last = self.exchange.last_price(contract)
+            # 与 Gate 相同: 创建时已满足触发条件的拒绝
+            if rule == RULE_GE and price <= last:
+                _reject('AUTO_TRIGGER_PRICE_LESS_LAST', f"rule 为 >= 时触发价 {price} 必须高于最新价 {last}")
+            if rule == RULE_LE and price >= last:
+                _reject('AUTO_TRIGGER_PRICE_GREATER_LAST', f"rule 为 <= 时触发价 {price} 必须低于最新价 {last}")
+            order = {
+                'id': next(self._ids),
+                'status': 'open',
+                'finish_as': None,
+                'initial': dict(initial),
+                'trigger': {'strategy_type': trigger.get('strategy_type', 0), 'price_type': trigger.get('price_type', 0),
+                            'price': str(trigger['price']), 'rule': rule},
+                'trade_id': None,
+                'create_time': time.time(),
+                'finish_time': None
+            }
+            self.triggers[str(order['id'])] = order
+            return _obj(order)
+
+    def cancel_price_triggered_order(self, settle: str, order_id: str) -> SimpleNamespace:
+        self._simulate_latency()
+        with self._lock:
+            order = self.triggers.pop(str(order_id), None)
+            if order is None:
+                _reject('AUTO_ORDER_NOT_FOUND', f"触发单 {order_id} 不存在或已完成")
+            self._finish_trigger(order, 'cancelled')
+            return _obj(order)
+
+    def list_price_triggered_orders(self, settle: str, status: str, contract: str = None, **kwargs) -> List[SimpleNamespace]:
+        self._simulate_latency()
+        with self._lock:
+            orders = self.triggers.values() if status == 'open' else self.finished_triggers
+            return [_obj(order) for order in orders if contract is None or order['initial']['contract'] == contract]
+
+    # ---------- 持仓与账户 ----------
+
+    def list_positions(self, settle: str, **kwargs) -> List[SimpleNamespace]:
+        self._simulate_latency()
+        with self._lock:
+            return [_obj(self._position_info(contract)) for contract in self.positions]
+
+    def list_futures_accounts(self, settle: str) -> SimpleNamespace:
+        self._simulate_latency()
+        with self._lock:
+            unrealised = self.unrealised_pnl()
+            return _obj({
+                'user': self.name,
+                'currency': settle.upper(),
+                'total': str(self.balance),
+                'unrealised_pnl': str(unrealised),
+                'available': str(self.available()),
+                'position_margin': str(self._position_margin()),
+                'order_margin': str(self._order_margin())
+            })
+
+    def unrealised_pnl(self) -> float:
+        total = 0.0
+        for contract, position in self.positions.items():
+            last = self.exchange.prices.get(contract, position['entry_price'])
+            total += (last - position['entry_price']) * position['size'] * self.exchange.multiplier(contract)
+        return total
+
+    def _position_margin(self) -> float:
+        return sum(abs(p['size']) * p['entry_price'] * self.exchange.multiplier(c) / self.leverage
+                   for c, p in self.positions.items())
+
+    def _order_margin(self) -> float:
+        return sum(abs(o['left']) * float(o['price']) * self.exchange.multiplier(o['contract']) / self.leverage
+                   for o in self.orders.values() if not o['is_reduce_only'])
+
+    def available(self) -> float:
+        return self.balance + self.unrealised_pnl() - self._position_margin() - self._order_margin()
+
+    def _position_info(self, contract: str) -> Dict[str, Any]:
+        position = self.positions.get(contract, {'size': 0, 'entry_price': 0.0})
+        last = self.exchange.prices.get(contract, position['entry_price'])
+        multiplier = self.exchange.multiplier(contract)
+        return {
+            'contract': contract,
+            'size': position['size'],
+            'entry_price': str(position['entry_price']),
+            'mark_price': str(last),
+            'leverage': str(self.leverage),
+            'margin': str(abs(position['size']) * position['entry_price'] * multiplier / self.leverage),
+            'unrealised_pnl': str((last - position['entry_price']) * position['size'] * multiplier)
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        """账户概况: 余额、已实现/未实现盈亏、手续费、成交数、持仓"""
+        with self._lock:
+            return {
+                'account': self.name,
+                'balance': round(self.balance, 4),
+                'equity': round(self.balance + self.unrealised_pnl(), 4),
+                'realised_pnl': round(self.realised_pnl, 4),
+                'unrealised_pnl': round(self.unrealised_pnl(), 4),
+                'fees': round(self.fees, 4),
+                'fills': self.fill_count,
+                'open_orders': len(self.orders),
+                'open_triggers': len(self.triggers),
+                'positions': {c: dict(p) for c, p in self.positions.items()}
+            }
+
+    # ---------- 撮合 ----------
+
+    def _place(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        contract = request['contract']
+        spec = self.exchange.spec(contract)
+        last = self.exchange.last_price(contract)
+        size = int(request.get('size') or 0)
+        price = float(request.get('price') or 0)
+        tif = request.get('tif') or 'gtc'
+        reduce_only = bool(request.get('reduce_only') or request.get('is_reduce_only'))
+        position_size = self.positions.get(contract, {}).get('size', 0)
+
+        if request.get('close'):
+            # 平仓单: 平掉整个持仓
+            if position_size == 0:
+                _reject('POSITION_EMPTY', f"{contract} 没有持仓")
+            size, reduce_only = -position_size, True
+        if size == 0:
+            _reject('INVALID_PARAM_VALUE', "size 不能为 0")
+        if reduce_only:
+            if position_size == 0 or (position_size > 0) == (size > 0):
+                _reject('REDUCE_ONLY_FAIL', f"{contract} 只减仓订单方向与持仓不符")
+            size = min(abs(size), abs(position_size)) * (1 if size > 0 else -1)
+        size_min = int(spec.get('order_size_min') or 1)
+        size_max = int(spec.get('order_size_max') or 0)
+        if abs(size) < size_min or (size_max and abs(size) > size_max):
+            _reject('ORDER_SIZE_INVALID', f"下单数量 {size} 超出范围 [{size_min}, {size_max}]")
+
+        market = price == 0
+        marketable = market or (size > 0 and price >= last) or (size < 0 and price <= last)
+        if not reduce_only:
+            required = abs(size) * (price or last) * self.exchange.multiplier(contract) / self.leverage
+            if required > self.available():
+                _reject('BALANCE_NOT_ENOUGH', f"可用余额 {self.available():.4f} 不足，需要保证金 {required:.4f}")
+
+        order = {
+            'id': next(self._ids),
+            'contract': contract,
+            'size': size,
+            'left': size,
+            'price': str(price) if not market else '0',
+            'fill_price': '0',
+            'tif': 'ioc' if market else tif,
+            'is_reduce_only': reduce_only,
+            'is_close': bool(request.get('close')),
+            'text': request.get('text', 'api'),
+            'status': 'open',
+            'finish_as': None,
+            'create_time': time.time(),
+            'finish_time': None
+        }
+        if marketable and tif == 'poc':
+            # 只做 maker 的订单会立即成交时被撤销
+            self._finish(order, 'cancelled')
+        elif marketable:
+            slippage = self.exchange.config.get('SLIPPAGE', 0) if market else 0
+            self._fill(order, last * (1 + slippage) if size > 0 else last * (1 - slippage), taker=True)
+        elif order['tif'] in ('ioc', 'fok'):
+            self._finish(order, 'cancelled')
+        else:
+            self.orders[str(order['id'])] = order
+        return order
+
+    def _fill(self, order: Dict[str, Any], price: float, taker: bool):
+        contract = order['contract']
+        size = order['left']
+        multiplier = self.exchange.multiplier(contract)
+        position = self.positions.get(contract, {'size': 0, 'entry_price': 0.0})
+        old_size, entry = position['size'], position['entry_price']
+        new_size = old_size + size
+
+        if old_size == 0 or (old_size > 0) == (size > 0):
+            # 开仓或加仓: 加权均价
+            entry = (entry * abs(old_size) + price * abs(size)) / abs(new_size)
+        else:
+            closed = min(abs(size), abs(old_size))
+            pnl = (price - entry) * closed * multiplier * (1 if old_size > 0 else -1)
+            self.realised_pnl += pnl
+            self.balance += pnl
+            if new_size != 0 and (new_size > 0) != (old_size > 0):
+                # 反手: 剩余部分以成交价开仓
+                entry = price
+        fee = abs(size) * price * multiplier * self.exchange.config.get('TAKER_FEE' if taker else 'MAKER_FEE', 0)
+        self.balance -= fee
+        self.fees += fee
+        self.fill_count += 1
+
+        if new_size == 0:
+            self.positions.pop(contract, None)
+        else:
+            self.positions[contract] = {'size': new_size, 'entry_price': entry}
+        order['left'] = 0
+        order['fill_price'] = str(price)
+        self._finish(order, 'filled')
+
+    def _finish(self, order: Dict[str, Any], finish_as: str):
+        order['status'] = 'finished'
+        order['finish_as'] = finish_as
+        order['finish_time'] = time.time()
+        self.finished_orders.append(order)
+
+    def _finish_trigger(self, order: Dict[str, Any], finish_as: str):
+        order['status'] = 'finished'
+        order['finish_as'] = finish_as
+        order['finish_time'] = time.time()
+        self.finished_triggers.append(order)
+
+    def on_price(self, contract: str, price: float):
+        """行情更新: 撮合该合约的挂单，执行满足条件的触发单，并推送变化"""
+        events: List[Tuple[str, Dict[str, Any]]] = []
+        with self._lock:
+            for order_id, order in list(self.orders.items()):
+                if order['contract'] != contract:
+                    continue
+                limit = float(order['price'])
+                if (order['size'] > 0 and price <= limit) or (order['size'] < 0 and price >= limit):
+                    del self.orders[order_id]
+                    self._fill(order, limit, taker=False)
+                    events.append(('futures.orders', dict(order)))
+
+            for order_id, trigger in list(self.triggers.items()):
+                if trigger['initial']['contract'] != contract:
+                    continue
+                trigger_price = float(trigger['trigger']['price'])
+                rule = trigger['trigger']['rule']
+                if not ((rule == RULE_GE and price >= trigger_price) or (rule == RULE_LE and price <= trigger_price)):
+                    continue
+                del self.triggers[order_id]
+                try:
+                    order = self._place(trigger['initial'])
+                    trigger['trade_id'] = order['id']
+                    self._finish_trigger(trigger, 'succeeded')
+                    events.append(('futures.orders', dict(order)))
+                except ApiException as e:
+                    # 例如平仓单触发时已经没有持仓
+                    logger.info(f"模拟触发单 {order_id} 执行失败: {e.reason}")
+                    self._finish_trigger(trigger, 'failed')
+                events.append(('futures.autoorders', dict(trigger)))
+
+            if events:
+                events.append(('futures.positions', self._position_info(contract)))
+        for channel, payload in events:
+            self._emit(channel, payload)
+
+    # ---------- 推送 ----------
+
+    def _emit(self, channel: str, payload: Dict[str, Any]):
+        for loop, queue in list(self._subscribers):
+            loop.call_soon_threadsafe(queue.put_nowait, (channel, [payload]))
+
+    async def stream(self) -> AsyncIterator[Tuple[str, List[Dict[str, Any]]]]:
+        """异步成交事件流，格式与 GateUserStream 相同 (频道, 数据列表)，可交给 PositionBook.consume_stream"""
+        queue: asyncio.Queue = asyncio.Queue()
+        subscriber = (asyncio.get_running_loop(), queue)
+        self._subscribers.append(subscriber)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self._subscribers.remove(subscriber)
+
+
+# 进程内共享的模拟交易所
+paper_exchange = PaperExchange()
@@ -0,0 +1,411 @@
+# -*- coding: utf-8 -*-
+"""
+交易参数扫描模块
+基于历史信号和本地K线数据（CSV 或 candle_store.py 数据库），对 TRADING_CONFIG / GATE_CONFIG 的参数组合进行网格或随机搜索，
+使用进程池并行回测，结果按配置哈希缓存，重复运行只计算新的参数点。
+
+用法:
+    python param_sweep.py --mode grid
+    python param_sweep.py --mode random --samples 200 --workers 8 --top 20
+"""
+
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import os
+import random
+import time
+from bisect import bisect_left
+from datetime import datetime
+from multiprocessing import Pool, cpu_count
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# 导入配置
+from config import CANDLE_CONFIG, GATE_CONFIG, OTHER_CONFIG, SWEEP_CONFIG, TRADING_CONFIG
+
+# K线行: (时间戳秒, 开, 高, 低, 收)
+Candle = Tuple[int, float, float, float, float]
+
+# 结果格式版本，写入缓存键；结果字段变化后旧缓存自动失效
+RESULT_VERSION = 2
+
+# 工作进程内的全局数据（由 _init_worker 加载一次，避免每个任务重复传输）
+_WORKER_SIGNALS: List[Dict[str, Any]] = []
+_WORKER_CANDLES: Dict[str, Tuple[List[int], List[Candle]]] = {}
+
+
+def load_signals(signals_file: str) -> List[Dict[str, Any]]:
+    """读取历史信号文件，按消息ID去重并转换时间戳"""
+    with open(signals_file, 'r', encoding='utf-8') as f:
+        raw_signals = json.load(f)
+
+    signals = {}
+    for item in raw_signals:
+        # 修改/取消指令记录没有信号字段
+        if 'update' in item:
+            continue
+        try:
+            ts = int(datetime.strptime(item['timestamp'], "%Y-%m-%d %H:%M:%S").timestamp())
+        except (KeyError, ValueError):
+            continue
+        # 同一消息可能因追加交易结果被保存多次，只保留一条
+        key = (item.get('chat_id'), item.get('message_id'), item['timestamp'])
+        signals[key] = {
+            'contract': item['trading_pair'].replace('/', '_').upper(),
+            'direction': item['direction'],
+            'entry_price': item['entry_price'],
+            'target_price': item['target_price'],
+            'stop_loss': item['stop_loss'],
+            'ts': ts
+        }
+
+    return sorted(signals.values(), key=lambda s: s['ts'])
+
+
+def load_candles_csv(path: str) -> Tuple[List[int], List[Candle]]:
+    """读取单个合约的K线CSV (timestamp,open,high,low,close[,volume])"""
+    rows = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            if not row or not row[0].strip().isdigit():
+                continue  # 跳过表头和空行
+            rows.append((int(row[0]), float(row[1]), float(row[2]), float(row[3]), float(row[4])))
+    rows.sort()
+    return [r[0] for r in rows], rows
+
+
+def load_candles_db(db_file: str, contract: str, interval: str) -> Tuple[List[int], List[Candle]]:
+    """从 candle_store.py 的 SQLite 数据库读取单个合约的K线"""
+    from candle_store import CandleStore
+
+    store = CandleStore(db_file)
+    try:
+        rows = [row[:5] for row in store.query_rows(contract, interval)]
+    finally:
+        store.close()
+    return [r[0] for r in rows], rows
+
+
+def load_price_data(contracts: List[str], data_dir: str, interval: str) -> Dict[str, Tuple[List[int], List[Candle]]]:
+    """加载所有信号涉及合约的本地K线，优先使用CSV，其次使用本地K线数据库"""
+    db_file = CANDLE_CONFIG['DB_FILE']
+    price_data = {}
+    for contract in contracts:
+        path = os.path.join(data_dir, f"{contract}_{interval}.csv")
+        if os.path.exists(path):
+            price_data[contract] = load_candles_csv(path)
+            continue
+        if os.path.exists(db_file):
+            timestamps, rows = load_candles_db(db_file, contract, interval)
+            if rows:
+                price_data[contract] = (timestamps, rows)
+                continue
+        print(f"⚠️ 缺少K线数据: {contract} {interval}，该合约的信号将被跳过")
+    return price_data
+
+
+def data_fingerprint(signals_file: str, data_dir: str) -> str:
+    """根据输入数据文件的大小和修改时间生成指纹，数据变化后缓存自动失效"""
+    parts = []
+    paths = [signals_file, CANDLE_CONFIG['DB_FILE']]
+    if os.path.isdir(data_dir):
+        paths += [os.path.join(data_dir, name) for name in sorted(os.listdir(data_dir))]
+    for path in paths:
+        if os.path.exists(path):
+            stat = os.stat(path)
+            parts.append(f"{os.path.basename(path)}:{stat.st_size}:{int(stat.st_mtime)}")
+    return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+def config_hash(params: Dict[str, Any], fingerprint: str) -> str:
+    """参数组合 + 回测设置 + 数据指纹 -> 缓存键"""
+    payload = {
+        'params': params,
+        'fingerprint': fingerprint,
+        'interval': SWEEP_CONFIG['CANDLE_INTERVAL'],
+        'entry_timeout': SWEEP_CONFIG['ENTRY_TIMEOUT_MINUTES'],
+        'max_hold': SWEEP_CONFIG['MAX_HOLD_MINUTES'],
+        'fee_rate': SWEEP_CONFIG['FEE_RATE'],
+        'version': RESULT_VERSION
+    }
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def resolve_entry(signal: Dict[str, Any]) -> Tuple[Optional[float], bool]:
+    """与 GateTrading.execute_trading_signal 相同的入场价逻辑: 含"现价"用市价，否则取均价"""
+    entry_prices = signal['entry_price']
+    if any(isinstance(p, str) for p in entry_prices):
+        return None, True
+    numeric_prices = [float(p) for p in entry_prices if isinstance(p, (int, float))]
+    if not numeric_prices:
+        return None, False
+    return sum(numeric_prices) / len(numeric_prices), False
+
+
+def simulate_trade(signal: Dict[str, Any], timestamps: List[int], candles: List[Candle],
+                   params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    在K线上模拟单个信号的完整生命周期。
+    同一根K线内同时触及止盈和止损时，保守地按止损处理。
+    """
+    direction = signal['direction']
+    is_long = direction == 'long'
+    start = bisect_left(timestamps, signal['ts'])
+    if start >= len(candles):
+        return None
+
+    entry_price, is_market = resolve_entry(signal)
+    entry_deadline = signal['ts'] + SWEEP_CONFIG['ENTRY_TIMEOUT_MINUTES'] * 60
+
+    # 1. 入场
+    fill_index = None
+    if is_market:
+        fill_index = start
+        entry_price = candles[start][1]
+    elif entry_price is not None:
+        for i in range(start, len(candles)):
+            ts, _, high, low, _ = candles[i]
+            if ts > entry_deadline:
+                break
+            if low <= entry_price <= high:
+                fill_index = i
+                break
+    if fill_index is None:
+        return {'outcome': 'unfilled', 'pnl': 0.0}
+
+    # 2. 止盈止损价格（与 GateTrading 一致：止损始终取信号止损；first_price 模式没有目标价时不挂止盈）
+    if params['TAKE_PROFIT_MODE'] == 'first_price':
+        take_profit = float(signal['target_price'][0]) if signal['target_price'] else None
+    else:
+        pct = params['TAKE_PROFIT_PERCENTAGE'] / 100
+        take_profit = entry_price * (1 + pct) if is_long else entry_price * (1 - pct)
+
+    stop_loss = float(signal['stop_loss'])
+
+    # 强平价格（忽略维持保证金的简化模型）
+    leverage = params['LEVERAGE']
+    liquidation = entry_price * (1 - 1 / leverage) if is_long else entry_price * (1 + 1 / leverage)
+
+    # 3. 持仓
+    hold_deadline = candles[fill_index][0] + SWEEP_CONFIG['MAX_HOLD_MINUTES'] * 60
+    exit_price, outcome = None, 'timeout'
+    for i in range(fill_index, len(candles)):
+        ts, _, high, low, close = candles[i]
+        if ts > hold_deadline:
+            break
+        adverse, favorable = (low, high) if is_long else (high, low)
+        hit_liq = adverse <= liquidation if is_long else adverse >= liquidation
+        hit_sl = adverse <= stop_loss if is_long else adverse >= stop_loss
+        hit_tp = take_profit is not None and (favorable >= take_profit if is_long else favorable <= take_profit)
+        if hit_liq and (not hit_sl or (stop_loss < liquidation if is_long else stop_loss > liquidation)):
+            exit_price, outcome = liquidation, 'liquidated'
+            break
+        if hit_sl:
+            exit_price, outcome = stop_loss, 'stop_loss'
+            break
+        if hit_tp:
+            exit_price, outcome = take_profit, 'take_profit'
+            break
+        exit_price = close
+    if exit_price is None:
+        return {'outcome': 'no_data', 'pnl': 0.0}
+
+    # 4. 盈亏
+    margin = params['MARGIN_AMOUNT']
+    notional = margin * leverage
+    ret = (exit_price - entry_price) / entry_price if is_long else (entry_price - exit_price) / entry_price
+    fee = notional * SWEEP_CONFIG['FEE_RATE'] * 2
+    pnl = max(notional * ret, -margin) - fee
+    return {'outcome': outcome, 'pnl': pnl}
+
+
+def backtest(params: Dict[str, Any], signals: List[Dict[str, Any]],
+             price_data: Dict[str, Tuple[List[int], List[Candle]]]) -> Dict[str, Any]:
+    """对一组参数回测所有信号，返回汇总指标"""
+    outcomes = {}
+    equity = peak = max_drawdown = 0.0
+    trades = wins = 0
+
+    for signal in signals:
+        series = price_data.get(signal['contract'])
+        if not series:
+            continue
+        result = simulate_trade(signal, series[0], series[1], params)
+        if result is None:
+            continue
+        outcomes[result['outcome']] = outcomes.get(result['outcome'], 0) + 1
+        if result['outcome'] in ('unfilled', 'no_data'):
+            continue
+        trades += 1
+        wins += result['pnl'] > 0
+        equity += result['pnl']
+        peak = max(peak, equity)
+        max_drawdown = max(max_drawdown, peak - equity)
+
+    # 盈亏与保证金成正比（不模拟张数取整），按保证金收益率比较不同杠杆/止盈设置
+    margin = params['MARGIN_AMOUNT']
+    return {
+        'params': params,
+        'trades': trades,
+        'win_rate': wins / trades if trades else 0.0,
+        'total_pnl': round(equity, 4),
+        'avg_pnl': round(equity / trades, 4) if trades else 0.0,
+        'max_drawdown': round(max_drawdown, 4),
+        'return_on_margin': round(equity / margin, 6),
+        'drawdown_on_margin': round(max_drawdown / margin, 6),
+        'outcomes': outcomes
+    }
+
+
+def _init_worker(signals: List[Dict[str, Any]], price_data: Dict[str, Tuple[List[int], List[Candle]]]):
+    """进程池初始化：每个工作进程只接收一次数据"""
+    global _WORKER_SIGNALS, _WORKER_CANDLES
+    _WORKER_SIGNALS = signals
+    _WORKER_CANDLES = price_data
+
+
+def _evaluate(job: Tuple[str, Dict[str, Any]]) -> Tuple[str, Dict[str, Any]]:
+    key, params = job
+    return key, backtest(params, _WORKER_SIGNALS, _WORKER_CANDLES)
+
+
+def base_params() -> Dict[str, Any]:
+    """当前生效的配置，作为扫描的基准点"""
+    return {
+        'TAKE_PROFIT_MODE': TRADING_CONFIG['TAKE_PROFIT_MODE'],
+        'TAKE_PROFIT_PERCENTAGE': TRADING_CONFIG['TAKE_PROFIT_PERCENTAGE'],
+        'LEVERAGE': GATE_CONFIG['LEVERAGE'],
+        'MARGIN_AMOUNT': GATE_CONFIG['MARGIN_AMOUNT']
+    }
+
+
+def normalize_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    """去掉当前模式下不生效的参数（first_price 模式忽略 TAKE_PROFIT_PERCENTAGE），等价组合得到相同的缓存键"""
+    params = dict(params)
+    if params['TAKE_PROFIT_MODE'] == 'first_price':
+        params.pop('TAKE_PROFIT_PERCENTAGE', None)
+    return params
+
+
+def iter_grid(grid: Dict[str, List[Any]]) -> Iterator[Dict[str, Any]]:
+    """网格搜索：参数空间的笛卡尔积，等价组合只保留一个"""
+    keys = sorted(grid)
+    seen = set()
+    for values in itertools.product(*(grid[k] for k in keys)):
+        params = base_params()
+        params.update(zip(keys, values))
+        params = normalize_params(params)
+        key = json.dumps(params, sort_keys=True)
+        if key in seen:
+            continue
+        seen.add(key)
+        yield params
+
+
+def iter_random(grid: Dict[str, List[Any]], samples: int, seed: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """随机搜索：从去重后的参数空间中不重复地抽取若干组合"""
+    candidates = list(iter_grid(grid))
+    rng = random.Random(seed)
+    yield from rng.sample(candidates, min(samples, len(candidates)))
+
+
+def load_cache(cache_file: str) -> Dict[str, Dict[str, Any]]:
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_cache(cache_file: str, cache: Dict[str, Dict[str, Any]]):
+    # 先写临时文件再替换，避免中断时损坏缓存
+    tmp_file = cache_file + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_file, cache_file)
+
+
+def run_sweep(param_sets: List[Dict[str, Any]], workers: int = None,
+              signals_file: str = None, data_dir: str = None) -> List[Dict[str, Any]]:
+    """运行参数扫描，返回按保证金收益率排序的结果列表"""
+    signals_file = signals_file or OTHER_CONFIG['SIGNALS_FILE']
+    data_dir = data_dir or SWEEP_CONFIG['PRICE_DATA_DIR']
+    cache_file = SWEEP_CONFIG['CACHE_FILE']
+
+    fingerprint = data_fingerprint(signals_file, data_dir)
+    cache = load_cache(cache_file)
+
+    results = {}
+    pending = []
+    for params in param_sets:
+        params = normalize_params(params)
+        key = config_hash(params, fingerprint)
+        if key in cache:
+            results[key] = cache[key]
+        elif key not in results:
+            results[key] = None
+            pending.append((key, params))
+
+    print(f"参数组合: {len(results)} 个，缓存命中: {len(results) - len(pending)} 个，待计算: {len(pending)} 个")
+
+    if pending:
+        signals = load_signals(signals_file)
+        contracts = sorted({s['contract'] for s in signals})
+        price_data = load_price_data(contracts, data_dir, SWEEP_CONFIG['CANDLE_INTERVAL'])
+        print(f"已加载 {len(signals)} 个历史信号，{len(price_data)} 个合约的K线")
+
+        start = time.perf_counter()
+        workers = workers or cpu_count()
+        with Pool(processes=workers, initializer=_init_worker, initargs=(signals, price_data)) as pool:
+            for done, (key, result) in enumerate(pool.imap_unordered(_evaluate, pending, chunksize=4), 1):
+                results[key] = result
+                cache[key] = result
+                if done % 50 == 0:
+                    print(f"已完成 {done}/{len(pending)} ...")
+        print(f"计算完成，耗时 {time.perf_counter() - start:.2f} 秒 ({workers} 个进程)")
+        save_cache(cache_file, cache)
+
+    return sorted(results.values(), key=lambda r: (r['return_on_margin'], -r['drawdown_on_margin']), reverse=True)
+
+
+def print_summary(results: List[Dict[str, Any]], top: int = 10):
+    """打印排名靠前的参数组合"""
+    print(f"\n{'='*100}")
+    print(f"{'排名':<4} {'收益率':>9} {'总盈亏':>10} {'平均':>8} {'胜率':>7} {'交易数':>6} {'最大回撤':>9}  参数")
+    print(f"{'-'*100}")
+    for rank, r in enumerate(results[:top], 1):
+        p = r['params']
+        tp = p['TAKE_PROFIT_MODE']
+        if 'TAKE_PROFIT_PERCENTAGE' in p:
+            tp += f"/{p['TAKE_PROFIT_PERCENTAGE']}%"
+        desc = f"TP={tp} {p['LEVERAGE']}x {p['MARGIN_AMOUNT']}U"
+        print(f"{rank:<4} {r['return_on_margin']:>9.1%} {r['total_pnl']:>10.2f} {r['avg_pnl']:>8.2f} {r['win_rate']:>7.1%} "
+              f"{r['trades']:>6} {r['max_drawdown']:>9.2f}  {desc}")
+    print(f"{'='*100}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='交易参数网格/随机搜索')
+    parser.add_argument('--mode', choices=['grid', 'random'], default='grid', help='搜索方式')
+    parser.add_argument('--samples', type=int, default=100, help='随机搜索的采样数量')
+    parser.add_argument('--seed', type=int, default=None, help='随机种子')
+    parser.add_argument('--workers', type=int, default=None, help='进程数，默认CPU核数')
+    parser.add_argument('--top', type=int, default=10, help='显示前N个结果')
+    parser.add_argument('--signals', default=None, help='信号文件，默认 OTHER_CONFIG["SIGNALS_FILE"]')
+    parser.add_argument('--data-dir', default=None, help='K线目录，默认 SWEEP_CONFIG["PRICE_DATA_DIR"]')
+    args = parser.parse_args()
+
+    grid = SWEEP_CONFIG['PARAM_GRID']
+    if args.mode == 'grid':
+        param_sets = list(iter_grid(grid))
+    else:
+        param_sets = list(iter_random(grid, args.samples, args.seed))
+
+    results = run_sweep(param_sets, args.workers, args.signals, args.data_dir)
+    print_summary(results, args.top)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+分进程流水线
+把监听 (Telethon)、信号提取 (LLM + 验证)、交易执行 (Gate.io) 拆分为可独立运行的进程，
+通过 message_bus.py 的 SQLite 队列连接。提取阶段可以启动多个进程横向扩展。
+执行阶段只能有一个进程（进程内可以有多个并发消费者）: 订单簿、风控占用和信号历史都是进程内状态，
+多个执行进程会各自计算限额、绕过重复开仓检查，因此启动时在总线文件旁加排他文件锁。
+重复信号过滤同样依赖信号历史，在执行进程中进行，提取进程不做过滤；信号文件也只由执行进程在过滤后写入。
+单进程模式仍然是直接运行 monitor_telegram_trading.py。
+
+用法:
+    python pipeline.py listener                      # 只运行监听进程
+    python pipeline.py extractor --processes 4       # 4 个提取进程
+    python pipeline.py executor --concurrency 8      # 执行进程（唯一），8 个并发消费者
+    python pipeline.py all --extractors 2            # 一次启动全部阶段
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+
+# fcntl 仅在类 Unix 系统上可用，用于保证只有一个执行进程
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+# 导入配置
+from config import OTHER_CONFIG, PIPELINE_CONFIG
+from message_bus import MessageBus, TOPIC_MESSAGES, TOPIC_SIGNALS
+
+STAGES = ('listener', 'extractor', 'executor')
+
+
+async def run_listener():
+    """监听阶段: 只做过滤和发布，不做任何提取或交易"""
+    import monitor_telegram_trading as monitor
+
+    bus = MessageBus(consumer_id=f"listener-{os.getpid()}")
+
+    # 提取进程的 claim 与发布争用同一个写锁，最长可能等待连接超时，因此不在事件循环中直接写入；
+    # 由单个发布任务按到达顺序在工作线程中写入，保证信号和随后的修改指令的先后顺序
+    outbox = asyncio.Queue()
+
+    async def publisher():
+        while True:
+            payload = await outbox.get()
+            try:
+                await bus.publish_async(TOPIC_MESSAGES, payload)
+                print(f"   📤 已发布到消息总线: {payload['message_id']}")
+            except Exception as e:
+                print(f"❌ 发布到消息总线失败 (消息ID: {payload['message_id']}): {e}")
+
+    def publish(message_id, text, chat_id, topic_id, timestamp, reply_to_msg_id=None):
+        outbox.put_nowait({
+            'message_id': message_id,
+            'text': text,
+            'chat_id': chat_id,
+            'topic_id': topic_id,
+            'reply_to_msg_id': reply_to_msg_id,
+            'timestamp': timestamp,
+            'received_at': time.time()
+        })
+
+    publisher_task = asyncio.create_task(publisher())
+    try:
+        await monitor.main(dispatch=publish)
+    finally:
+        publisher_task.cancel()
+
+
+async def run_extractor(concurrency: int):
+    """提取阶段: 消费原始消息，提取并验证信号后发布到执行队列"""
+    import monitor_telegram_trading as monitor
+    from config_reloader import config_reloader
+
+    bus = MessageBus(consumer_id=f"extractor-{os.getpid()}")
+    # 路由配置（提取器、仓位档位）热更新
+    watcher = asyncio.create_task(config_reloader.watch())
+
+    async def worker():
+        async for bus_id, msg in bus.consume(TOPIC_MESSAGES):
+            try:
+                # 重复信号过滤由执行进程统一进行（各提取进程的信号历史互不可见）
+                signal_dict = await monitor.extract_signal_from_text(
+                    msg['message_id'], msg['text'], msg['chat_id'], msg['topic_id'], msg['timestamp'],
+                    msg.get('reply_to_msg_id'), dedup=False
+                )
+                if signal_dict:
+                    signal_dict['received_at'] = msg.get('received_at')
+                    await bus.publish_async(TOPIC_SIGNALS, signal_dict)
+                await bus.ack_async(bus_id)
+            except Exception as e:
+                # 不确认，超时后由其他提取进程重试
+                print(f"❌ 提取阶段处理消息失败 (消息ID: {msg.get('message_id')}): {e}")
+
+    print(f"🚀 提取进程启动 (PID: {os.getpid()}, 并发: {concurrency})")
+    try:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    finally:
+        watcher.cancel()
+
+
+def acquire_executor_lock():
+    """
+    在总线文件旁加排他文件锁，返回保持打开的锁文件；已有执行进程持有锁时返回 None。
+    不支持 fcntl 的系统上不做检查。
+    """
+    lock_file = open(PIPELINE_CONFIG['BUS_FILE'] + '.executor.lock', 'w')
+    if not FCNTL_AVAILABLE:
+        return lock_file
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+async def run_executor(concurrency: int):
+    """执行阶段: 消费已验证的信号，过滤重复信号后下单（只能运行一个执行进程）"""
+    lock = acquire_executor_lock()
+    if lock is None:
+        print("❌ 已有执行进程在运行，执行阶段只能有一个进程（风控和订单簿为进程内状态）")
+        return
+
+    import monitor_telegram_trading as monitor
+    from multi_account import start_book_sync
+    from config_reloader import config_reloader
+
+    bus = MessageBus(consumer_id=f"executor-{os.getpid()}")
+    book_tasks = await start_book_sync()
+    # 交易参数、杠杆/保证金和风控参数热更新
+    book_tasks.append(asyncio.create_task(config_reloader.watch()))
+
+    async def worker():
+        async for bus_id, signal_dict in bus.consume(TOPIC_SIGNALS):
+            # 交易可能已部分提交，先确认再执行，避免超时重投导致重复下单
+            await bus.ack_async(bus_id)
+            received_at = signal_dict.pop('received_at', None)
+            if received_at:
+                print(f"⏱️ 消息到达执行阶段耗时: {(time.time() - received_at) * 1000:.1f} ms")
+            if 'update' not in signal_dict:
+                if monitor.is_duplicate_signal(signal_dict):
+                    continue
+                # 提取进程不写信号文件，过滤重复后由本进程保存
+                await monitor.save_signal_to_file(signal_dict)
+            try:
+                await monitor.execute_signal(signal_dict)
+            except Exception as e:
+                print(f"❌ 执行阶段处理信号失败 (消息ID: {signal_dict.get('message_id')}): {e}")
+
+    print(f"🚀 执行进程启动 (PID: {os.getpid()}, 并发: {concurrency})")
+    try:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    finally:
+        for task in book_tasks:
+            task.cancel()
+        lock.close()
+
+
+def _stage_entry(stage: str, concurrency: int):
+    """子进程入口"""
+    logging.basicConfig(
+        format='[%(levelname)s %(asctime)s] %(name)s: %(message)s',
+        level=logging.WARNING,
+        handlers=[logging.FileHandler(OTHER_CONFIG['LOG_FILE']), logging.StreamHandler()]
+    )
+    try:
+        if stage == 'listener':
+            asyncio.run(run_listener())
+        elif stage == 'extractor':
+            asyncio.run(run_extractor(concurrency))
+        elif stage == 'executor':
+            asyncio.run(run_executor(concurrency))
+    except KeyboardInterrupt:
+        pass
+
+
+def spawn(stage: str, processes: int, concurrency: int):
+    """启动若干个运行指定阶段的子进程"""
+    procs = []
+    for _ in range(processes):
+        proc = multiprocessing.Process(target=_stage_entry, args=(stage, concurrency), name=stage)
+        proc.start()
+        procs.append(proc)
+    return procs
+
+
+def main():
+    parser = argparse.ArgumentParser(description='分进程交易信号流水线')
+    parser.add_argument('stage', choices=STAGES + ('all',))
+    parser.add_argument('--processes', type=int, default=1, help='当前阶段的进程数（仅 extractor 可大于 1）')
+    parser.add_argument('--concurrency', type=int, default=4, help='每个进程的并发消费者数')
+    parser.add_argument('--extractors', type=int, default=1, help='all 模式下的提取进程数')
+    args = parser.parse_args()
+    if args.stage in ('listener', 'executor') and args.processes > 1:
+        parser.error(f"{args.stage} 阶段只能运行一个进程")
+
+    if args.stage == 'all':
+        procs = spawn('listener', 1, 1)
+        procs += spawn('extractor', args.extractors, args.concurrency)
+        procs += spawn('executor', 1, args.concurrency)
+    elif args.processes == 1:
+        _stage_entry(args.stage, args.concurrency)
+        return
+    else:
+        procs = spawn(args.stage, args.processes, args.concurrency)
+
+    try:
+        for proc in procs:
+            proc.join()
+    except KeyboardInterrupt:
+        print("\n程序被用户中断")
+        for proc in procs:
+            proc.terminate()
+
+
+if __name__ == '__main__':
+    main()
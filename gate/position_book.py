@@ -0,0 +1,402 @@
+# -*- coding: utf-8 -*-
+"""
+持仓与订单簿模块
+在内存中维护按合约索引的持仓、挂单（限价入场单）和价格触发单（止盈止损），
+由下单回执和用户数据流实时更新，并定期与交易所批量对账。
+风控检查和重复开仓判断直接查询本地状态，无需额外的 REST 请求。
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+# websockets 为可选依赖，仅在启用用户数据流时需要
+try:
+    import websockets
+    WEBSOCKETS_AVAILABLE = True
+except ImportError:
+    WEBSOCKETS_AVAILABLE = False
+
+# 导入配置
+from config import BOOK_CONFIG, GATE_CONFIG
+
+# 设置日志
+logger = logging.getLogger(__name__)
+
+
+def _value(obj: Any, key: str, default: Any = None) -> Any:
+    """同时兼容 gate-api 返回的模型对象和 WebSocket 推送的字典"""
+    if isinstance(obj, dict):
+        return obj.get(key, default)
+    return getattr(obj, key, default)
+
+
+class PositionBook:
+    """按合约索引的持仓/订单簿，所有查询均为 O(1)"""
+
+    def __init__(self):
+        # 持仓: contract -> {'size': 带符号张数, 'entry_price': float, 'update_time': float}
+        self.positions: Dict[str, Dict[str, Any]] = {}
+        # 普通挂单: order_id -> 订单信息
+        self.orders: Dict[str, Dict[str, Any]] = {}
+        # 价格触发单: order_id -> 触发单信息
+        self.triggers: Dict[str, Dict[str, Any]] = {}
+        # 二级索引: contract -> order_id 集合
+        self._orders_by_contract: Dict[str, Set[str]] = {}
+        self._triggers_by_contract: Dict[str, Set[str]] = {}
+        # 已完成订单的累计成交张数（有界，最旧的先淘汰）: 完成后到达的回执/推送只计入超出部分
+        self._finished_fills: 'OrderedDict[str, int]' = OrderedDict()
+        # 最近从本地移除的挂单/触发单ID和持仓（'position:合约'）-> 移除时间，对账时不被较早的快照恢复
+        self._removed_at: 'OrderedDict[str, float]' = OrderedDict()
+        self.last_reconcile: Optional[float] = None
+        # 成交回调: (order_id, contract, 带符号成交张数, 成交价)，例如写入信号数据库
+        self.fill_listeners: List[Callable[[str, str, int, float], None]] = []
+
+    # ---------- 查询 ----------
+
+    def get_position(self, contract: str) -> Optional[Dict[str, Any]]:
+        return self.positions.get(contract)
+
+    def has_position(self, contract: str) -> bool:
+        return contract in self.positions
+
+    def has_pending_entry(self, contract: str) -> bool:
+        return bool(self._orders_by_contract.get(contract))
+
+    def has_exposure(self, contract: str) -> bool:
+        """合约上是否已有持仓或未成交的入场单"""
+        return contract in self.positions or bool(self._orders_by_contract.get(contract))
+
+    def open_position_count(self) -> int:
+        return len(self.positions)
+
+    def exposed_contracts(self) -> Set[str]:
+        """有持仓或挂单的合约集合"""
+        return set(self.positions) | {c for c, ids in self._orders_by_contract.items() if ids}
+
+    def orders_for(self, contract: str) -> List[Dict[str, Any]]:
+        return [self.orders[oid] for oid in self._orders_by_contract.get(contract, ())]
+
+    def triggers_for(self, contract: str) -> List[Dict[str, Any]]:
+        return [self.triggers[oid] for oid in self._triggers_by_contract.get(contract, ())]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """用于日志/保存的状态快照"""
+        return {
+            'positions': dict(self.positions),
+            'orders': list(self.orders.values()),
+            'triggers': list(self.triggers.values()),
+            'last_reconcile': self.last_reconcile
+        }
+
+    # ---------- 更新 ----------
+
+    def _index_add(self, index: Dict[str, Set[str]], contract: str, order_id: str):
+        index.setdefault(contract, set()).add(order_id)
+
+    def _index_remove(self, index: Dict[str, Set[str]], contract: str, order_id: str):
+        ids = index.get(contract)
+        if ids is not None:
+            ids.discard(order_id)
+            if not ids:
+                del index[contract]
+
+    def set_position(self, contract: str, size: int, entry_price: float = 0.0):
+        """设置合约持仓，size 为 0 时移除"""
+        if size == 0:
+            if self.positions.pop(contract, None) is not None:
+                self._mark_removed(f"position:{contract}")
+            return
+        self.positions[contract] = {
+            'contract': contract,
+            'size': size,
+            'entry_price': entry_price,
+            'update_time': time.time()
+        }
+
+    def apply_fill(self, contract: str, filled_size: int, fill_price: float):
+        """按成交更新持仓（filled_size 带符号），同方向加仓时计算加权均价"""
+        if filled_size == 0:
+            return
+        position = self.positions.get(contract)
+        old_size = position['size'] if position else 0
+        old_price = position['entry_price'] if position else 0.0
+        new_size = old_size + filled_size
+
+        if old_size == 0 or (new_size != 0 and (new_size > 0) != (old_size > 0)):
+            # 新开仓或反手: 以成交价为均价
+            entry_price = fill_price
+        elif (old_size > 0) == (filled_size > 0):
+            # 同方向加仓: 加权均价
+            entry_price = (old_price * abs(old_size) + fill_price * abs(filled_size)) / abs(new_size)
+        else:
+            # 减仓: 均价不变
+            entry_price = old_price
+        self.set_position(contract, new_size, entry_price)
+
+    def on_order_update(self, order: Any):
+        """处理普通订单回执或推送（gate-api FuturesOrder 或 WebSocket 字典）"""
+        order_id = str(_value(order, 'id'))
+        contract = _value(order, 'contract')
+        size = int(_value(order, 'size', 0) or 0)
+        left = int(_value(order, 'left', 0) or 0)
+        status = _value(order, 'status')
+
+        previous = self.orders.get(order_id)
+        finished = self._finished_fills.get(order_id)
+        if previous:
+            prev_filled = previous['size'] - previous['left']
+        else:
+            prev_filled = finished or 0
+        filled = size - left
+        fill_price = float(_value(order, 'fill_price', 0) or 0)
+        # 只有新增成交部分才计入持仓，避免回执和推送重复计算；
+        # 订单完成后从挂单中移除，之后到达的同一订单按记录的累计成交量比较
+        if finished is not None and abs(filled) <= abs(finished):
+            return
+        if filled != prev_filled and fill_price:
+            self.apply_fill(contract, filled - prev_filled, fill_price)
+            for listener in self.fill_listeners:
+                try:
+                    listener(order_id, contract, filled - prev_filled, fill_price)
+                except Exception as e:
+                    logger.error(f"成交回调失败 {contract} {order_id}: {e}")
+
+        if status == 'open' and finished is None:
+            self._apply_open_order(order)
+        else:
+            self.orders.pop(order_id, None)
+            self._index_remove(self._orders_by_contract, contract, order_id)
+            self._record_finished(order_id, filled)
+            self._mark_removed(order_id)
+
+    def _record_finished(self, order_id: str, filled: int):
+        self._finished_fills[order_id] = filled
+        self._finished_fills.move_to_end(order_id)
+        while len(self._finished_fills) > BOOK_CONFIG.get('FINISHED_ORDER_HISTORY', 1000):
+            self._finished_fills.popitem(last=False)
+
+    def _mark_removed(self, key: str):
+        self._removed_at[key] = time.time()
+        self._removed_at.move_to_end(key)
+        while len(self._removed_at) > BOOK_CONFIG.get('FINISHED_ORDER_HISTORY', 1000):
+            self._removed_at.popitem(last=False)
+
+    def on_trigger_update(self, trigger_order: Any):
+        """处理价格触发单回执或推送"""
+        order_id = str(_value(trigger_order, 'id'))
+        initial = _value(trigger_order, 'initial')
+        trigger = _value(trigger_order, 'trigger')
+        contract = _value(initial, 'contract')
+        status = _value(trigger_order, 'status')
+
+        if status == 'open':
+            self.triggers[order_id] = {
+                'order_id': order_id,
+                'contract': contract,
+                'trigger_price': float(_value(trigger, 'price', 0) or 0),
+                'rule': _value(trigger, 'rule'),
+                'update_time': time.time()
+            }
+            self._index_add(self._triggers_by_contract, contract, order_id)
+        else:
+            if self.triggers.pop(order_id, None) is not None:
+                self._mark_removed(order_id)
+            self._index_remove(self._triggers_by_contract, contract, order_id)
+
+    def on_position_update(self, position: Any):
+        """处理持仓推送，以交易所数据为准"""
+        self.set_position(
+            _value(position, 'contract'),
+            int(_value(position, 'size', 0) or 0),
+            float(_value(position, 'entry_price', 0) or 0)
+        )
+
+    def replace_all(self, positions: List[Any], orders: List[Any], triggers: List[Any], started_at: float = None):
+        """
+        用交易所的完整快照替换本地状态（对账）。
+        started_at 为开始拉取快照的时间: 此后本地新增/更新的条目（下单回执、推送）比快照新，予以保留；
+        此后本地移除的条目不被快照恢复。
+        """
+        if started_at is None:
+            kept_positions, kept_orders, kept_triggers, removed = {}, {}, {}, set()
+        else:
+            kept_positions = {c: p for c, p in self.positions.items() if p['update_time'] >= started_at}
+            kept_orders = {i: o for i, o in self.orders.items() if o['update_time'] >= started_at}
+            kept_triggers = {i: t for i, t in self.triggers.items() if t['update_time'] >= started_at}
+            removed = {key for key, removed_time in self._removed_at.items() if removed_time >= started_at}
+
+        self.positions.clear()
+        self.orders.clear()
+        self.triggers.clear()
+        self._orders_by_contract.clear()
+        self._triggers_by_contract.clear()
+        for position in positions:
+            contract = _value(position, 'contract')
+            if contract not in kept_positions and f"position:{contract}" not in removed:
+                self.on_position_update(position)
+        for order in orders:
+            order_id = str(_value(order, 'id'))
+            if order_id not in kept_orders and order_id not in removed and order_id not in self._finished_fills:
+                # 直接写入挂单，不经过 on_order_update，避免已成交部分被重复计入持仓
+                self._apply_open_order(order)
+        for trigger_order in triggers:
+            order_id = str(_value(trigger_order, 'id'))
+            if order_id not in kept_triggers and order_id not in removed:
+                self.on_trigger_update(trigger_order)
+
+        self.positions.update(kept_positions)
+        for order_id, order in kept_orders.items():
+            self.orders[order_id] = order
+            self._index_add(self._orders_by_contract, order['contract'], order_id)
+        for order_id, trigger in kept_triggers.items():
+            self.triggers[order_id] = trigger
+            self._index_add(self._triggers_by_contract, trigger['contract'], order_id)
+        self.last_reconcile = time.time()
+
+    def _apply_open_order(self, order: Any):
+        order_id = str(_value(order, 'id'))
+        contract = _value(order, 'contract')
+        self.orders[order_id] = {
+            'order_id': order_id,
+            'contract': contract,
+            'size': int(_value(order, 'size', 0) or 0),
+            'left': int(_value(order, 'left', 0) or 0),
+            'price': float(_value(order, 'price', 0) or 0),
+            'reduce_only': bool(_value(order, 'is_reduce_only', False)),
+            'update_time': time.time()
+        }
+        self._index_add(self._orders_by_contract, contract, order_id)
+
+    # ---------- 对账与数据流 ----------
+
+    async def reconcile(self, futures_api: Any, settle: str = None, scheduler: Any = None) -> Tuple[int, int, int]:
+        """
+        与交易所对账: 每类数据只发一次批量请求（全部持仓、全部挂单、全部触发单），
+        返回 (持仓数, 挂单数, 触发单数)。传入 scheduler 时请求经由请求调度器限流。
+        """
+        settle = settle or GATE_CONFIG['SETTLE']
+        # 拉取快照期间本地可能收到新的下单回执，以开始时间区分哪些本地条目比快照新
+        started_at = time.time()
+
+        async def _call(name, *args):
+            fn = getattr(futures_api, name)
+            if scheduler is not None:
+                return await scheduler.call(name, fn, *args)
+            return await asyncio.to_thread(fn, *args)
+
+        positions, orders, triggers = await asyncio.gather(
+            _call('list_positions', settle),
+            _call('list_futures_orders', settle, 'open'),
+            _call('list_price_triggered_orders', settle, 'open')
+        )
+        positions = [p for p in positions if int(_value(p, 'size', 0) or 0) != 0]
+        self.replace_all(positions, orders, triggers, started_at)
+        logger.info(f"订单簿对账完成 - 持仓: {len(positions)}, 挂单: {len(orders)}, 触发单: {len(triggers)}")
+        return len(positions), len(orders), len(triggers)
+
+    async def run_reconciler(self, futures_api: Any, interval: float = None, scheduler: Any = None):
+        """后台定期对账任务"""
+        interval = interval or BOOK_CONFIG['RECONCILE_INTERVAL']
+        while True:
+            try:
+                await self.reconcile(futures_api, scheduler=scheduler)
+            except Exception as e:
+                logger.error(f"订单簿对账失败: {e}")
+            await asyncio.sleep(interval)
+
+    def apply_event(self, channel: str, payload: List[Dict[str, Any]]):
+        """应用一条用户数据流事件（Gate WebSocket 频道格式）"""
+        handlers = {
+            'futures.orders': self.on_order_update,
+            'futures.autoorders': self.on_trigger_update,
+            'futures.positions': self.on_position_update
+        }
+        handler = handlers.get(channel)
+        if handler is None:
+            return
+        for item in payload:
+            handler(item)
+
+    async def consume_stream(self, stream: AsyncIterator[Tuple[str, List[Dict[str, Any]]]]):
+        """消费用户数据流；stream 为 (频道, 数据列表) 的异步迭代器，可用本地模拟数据源替换"""
+        async for channel, payload in stream:
+            try:
+                self.apply_event(channel, payload)
+            except Exception as e:
+                logger.error(f"处理用户数据流事件失败 {channel}: {e}")
+
+
+class GateUserStream:
+    """
+    Gate.io 合约 WebSocket 用户数据流（订单、触发单、持仓）。
+    连接断开后按指数退避自动重连并重新订阅；断线期间的推送会丢失，
+    因此每次重连成功后先调用 on_reconnect（通常为订单簿对账），再继续产出事件。
+    """
+
+    CHANNELS = ('futures.orders', 'futures.autoorders', 'futures.positions')
+
+    def __init__(self, user_id: int, key: str = None, secret: str = None, url: str = None,
+                 on_reconnect: Callable[[], Awaitable[Any]] = None):
+        if not WEBSOCKETS_AVAILABLE:
+            raise ImportError("用户数据流需要 websockets: pip install websockets")
+        self.user_id = user_id
+        self.key = key or GATE_CONFIG['API_KEY']
+        self.secret = secret or GATE_CONFIG['API_SECRET']
+        self.url = url or BOOK_CONFIG['WS_HOST']
+        self.on_reconnect = on_reconnect
+        self.reconnects = 0
+
+    def _auth(self, channel: str, event: str, ts: int) -> Dict[str, str]:
+        message = f"channel={channel}&event={event}&time={ts}"
+        sign = hmac.new(self.secret.encode('utf-8'), message.encode('utf-8'), hashlib.sha512).hexdigest()
+        return {'method': 'api_key', 'KEY': self.key, 'SIGN': sign}
+
+    async def _subscribe(self, ws):
+        for channel in self.CHANNELS:
+            ts = int(time.time())
+            await ws.send(json.dumps({
+                'time': ts,
+                'channel': channel,
+                'event': 'subscribe',
+                'payload': [str(self.user_id), '!all'],
+                'auth': self._auth(channel, 'subscribe', ts)
+            }))
+
+    async def __aiter__(self):
+        base_delay = BOOK_CONFIG.get('WS_RECONNECT_DELAY', 1)
+        max_delay = BOOK_CONFIG.get('WS_RECONNECT_MAX_DELAY', 60)
+        delay = base_delay
+        connected = False
+        while True:
+            try:
+                async with websockets.connect(self.url, ping_interval=20) as ws:
+                    await self._subscribe(ws)
+                    if connected:
+                        self.reconnects += 1
+                        logger.info(f"用户数据流已重新连接 (第 {self.reconnects} 次)")
+                        if self.on_reconnect is not None:
+                            try:
+                                await self.on_reconnect()
+                            except Exception as e:
+                                logger.error(f"用户数据流重连后对账失败: {e}")
+                    connected = True
+                    delay = base_delay
+                    async for raw in ws:
+                        message = json.loads(raw)
+                        if message.get('event') == 'update' and isinstance(message.get('result'), list):
+                            yield message['channel'], message['result']
+                logger.warning(f"用户数据流连接已关闭，{delay} 秒后重连")
+            except Exception as e:
+                logger.error(f"用户数据流断开: {e}，{delay} 秒后重连")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, max_delay)
+
+
+# 进程内共享的订单簿
+position_book = PositionBook()
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+信号提取提示词模板模块
+提示词的静态部分（指令 + 示例）在导入时编译为固定的 system 消息并放在请求最前面，
+每次调用只有最后的 user 消息（待分析文本）不同，便于服务端前缀缓存命中。
+支持按频道选择不同的模板，并统计每次调用的提示词 token 用量。
+"""
+
+import threading
+from typing import Any, Dict, List
+
+DEFAULT_TEMPLATE = 'default'
+
+_INSTRUCTIONS = """你是专业的金融交易信号提取助手，从文本中提取交易信息，严格按指定 JSON 格式输出。
+只提取可直接执行的明确指令，信号必须有明确的"多"或"空"方向。市场分析、条件性指令或不完整的信号返回空对象 {}。
+字段: trading_pair (如 "BTC/USDT"), direction ("long"/"short"), entry_price (数字列表，"现价"原样保留), target_price (数字列表), stop_loss (数字)。"""
+
+# 示例: (输入文本, 输出 JSON, 说明)
+_EXAMPLES = [
+    ("BTC 116000-115500附近多\n目標 ；117000-118000附近\n止損: 114800附近",
+     '{"trading_pair": "BTC/USDT", "direction": "long", "entry_price": [116000, 115500], "target_price": [117000, 118000], "stop_loss": 114800}',
+     "范围价格"),
+    ("ETH ；现价轻仓进-3625附近补仓多\n目標 ；3674-—3700\n止損:3615附近",
+     '{"trading_pair": "ETH/USDT", "direction": "long", "entry_price": ["现价", 3625], "target_price": [3674, 3700], "stop_loss": 3615}',
+     "现价"),
+    ("白盤留意117100-117600附近不破區間留意多單", '{}', "条件性指令，忽略"),
+    ("移動到116000-116500附近，目標在117000-118000附近，止損在115300附近", '{}', "缺少方向，忽略"),
+]
+
+
+# 批量模式追加在 system 消息末尾的说明（同样固定不变）
+_BATCH_INSTRUCTIONS = """批量模式: 输入包含多条用 [编号] 分隔的消息，逐条独立判断。
+输出 {"results": [...]}，每条消息对应一个元素，包含 "id" (消息编号) 和上述字段；不是有效信号的消息只输出 {"id": 编号}。"""
+
+
+def _compile_system(examples: List[tuple]) -> str:
+    parts = [_INSTRUCTIONS, "示例:"]
+    for i, (text, output, note) in enumerate(examples, 1):
+        parts.append(f"例{i} ({note})\n输入:\n{text}\n输出: {output}")
+    return '\n\n'.join(parts)
+
+
+class PromptTemplate:
+    """一个已编译的提示词模板，静态前缀在构造时生成且不再变化"""
+
+    def __init__(self, name: str, system: str):
+        self.name = name
+        self.system = system
+        self._system_message = {"role": "system", "content": system}
+        self._batch_system_message = {"role": "system", "content": f"{system}\n\n{_BATCH_INSTRUCTIONS}"}
+
+    def messages(self, text: str) -> List[Dict[str, str]]:
+        # 可变内容只出现在最后一条消息中
+        return [self._system_message, {"role": "user", "content": f"文本:\n{text}"}]
+
+    def batch_messages(self, texts: List[str]) -> List[Dict[str, str]]:
+        """多条消息合并为一次请求，消息编号从 1 开始"""
+        content = '\n\n'.join(f"[{i}]\n{text}" for i, text in enumerate(texts, 1))
+        return [self._batch_system_message, {"role": "user", "content": content}]
+
+
+# 模板注册表: 路由配置中的 PROMPT 名称 -> 模板
+TEMPLATES: Dict[str, PromptTemplate] = {
+    # 完整示例
+    'default': PromptTemplate('default', _compile_system(_EXAMPLES)),
+    # 只保留两个正例，适合格式规范、噪声少的频道
+    'compact': PromptTemplate('compact', _compile_system(_EXAMPLES[:2])),
+}
+
+
+def get_template(name: str = None) -> PromptTemplate:
+    return TEMPLATES.get(name or DEFAULT_TEMPLATE, TEMPLATES[DEFAULT_TEMPLATE])
+
+
+class PromptStats:
+    """按模板统计提示词/缓存/输出 token 和请求耗时"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Dict[str, float]] = {}
+
+    def record(self, template: str, usage: Any, latency: float) -> Dict[str, int]:
+        """记录一次调用的 usage（OpenAI 兼容的 response.usage），返回本次的 token 数"""
+        prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+        completion_tokens = getattr(usage, 'completion_tokens', 0) or 0
+        details = getattr(usage, 'prompt_tokens_details', None)
+        cached_tokens = getattr(details, 'cached_tokens', 0) or 0
+        with self._lock:
+            stats = self.stats.setdefault(template, {
+                'calls': 0, 'prompt_tokens': 0, 'cached_tokens': 0, 'completion_tokens': 0, 'latency_total': 0.0
+            })
+            stats['calls'] += 1
+            stats['prompt_tokens'] += prompt_tokens
+            stats['cached_tokens'] += cached_tokens
+            stats['completion_tokens'] += completion_tokens
+            stats['latency_total'] += latency
+        return {'prompt_tokens': prompt_tokens, 'cached_tokens': cached_tokens, 'completion_tokens': completion_tokens}
+
+    def format_stats(self) -> str:
+        lines = []
+        with self._lock:
+            for name, s in self.stats.items():
+                calls = s['calls']
+                lines.append(
+                    f"  [{name}] 调用 {calls} | 提示词 avg {s['prompt_tokens'] / calls:.0f} tokens "
+                    f"(缓存 {s['cached_tokens'] / max(s['prompt_tokens'], 1) * 100:.0f}%) | "
+                    f"输出 avg {s['completion_tokens'] / calls:.0f} tokens | 耗时 avg {s['latency_total'] / calls * 1000:.0f} ms"
+                )
+        return '\n'.join(lines)
+
+
+# 进程内共享的统计
+prompt_stats = PromptStats()
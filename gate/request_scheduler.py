@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+Gate.io 请求调度模块
+所有交易所请求经由统一的调度器发出: 按接口分组的令牌桶限流、
+止盈止损等保护性订单优先于新开仓、遇到限流(429)时带抖动的退避重试，
+并统计排队等待时间。
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Tuple
+
+# 导入配置
+from config import RATE_LIMIT_CONFIG
+
+# 设置日志
+logger = logging.getLogger(__name__)
+
+# 请求优先级（数值越小越优先）
+PRIORITY_PROTECTIVE = 0   # 止损/止盈/撤单
+PRIORITY_ENTRY = 1        # 新开仓
+PRIORITY_QUERY = 2        # 查询
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """判断异常是否为交易所限流 (HTTP 429 / TOO_MANY_REQUESTS)"""
+    return getattr(error, 'status', None) == 429 or getattr(error, 'label', None) == 'TOO_MANY_REQUESTS'
+
+
+class TokenBucket:
+    """令牌桶限流器"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """获取一个令牌还需等待的时间（秒），为 0 表示可以立即获取"""
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def pause(self, seconds: float):
+        """被限流后清空令牌，使整个桶在 seconds 秒内不再放行"""
+        self._refill()
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+
+class _Job:
+    __slots__ = ('endpoint', 'fn', 'args', 'kwargs', 'priority', 'future', 'enqueued', 'attempt')
+
+    def __init__(self, endpoint, fn, args, kwargs, priority, future):
+        self.endpoint = endpoint
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.future = future
+        self.enqueued = time.monotonic()
+        self.attempt = 0
+
+
+class RequestScheduler:
+    """按令牌桶调度交易所请求的中心调度器"""
+
+    def __init__(self, config: Dict[str, Any] = None):
+        self.config = config or RATE_LIMIT_CONFIG
+        self.buckets = {name: TokenBucket(rate, capacity) for name, (rate, capacity) in self.config['BUCKETS'].items()}
+        self._queues: Dict[str, List[Tuple[int, int, _Job]]] = {name: [] for name in self.buckets}
+        self._wakeups: Dict[str, asyncio.Event] = {}
+        self._workers: Dict[str, asyncio.Task] = {}
+        self._loop = None
+        # 执行中的请求任务（保留引用，防止被垃圾回收）
+        self._running = set()
+        self._seq = itertools.count()
+        # 统计: 桶 -> 指标
+        self.stats: Dict[str, Dict[str, Any]] = {
+            name: {'requests': 0, 'rate_limited': 0, 'retries': 0, 'errors': 0, 'wait_total': 0.0, 'wait_max': 0.0}
+            for name in self.buckets
+        }
+        self._wait_samples: Dict[str, Deque[float]] = {name: deque(maxlen=1000) for name in self.buckets}
+
+    def bucket_for(self, endpoint: str) -> str:
+        return self.config['ENDPOINTS'].get(endpoint, 'query')
+
+    async def call(self, endpoint: str, fn: Callable, *args, priority: int = PRIORITY_QUERY, **kwargs) -> Any:
+        """
+        提交一个同步 SDK 调用并等待结果。
+        endpoint 为接口名（用于选择令牌桶），fn 在线程池中执行。
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._enqueue(_Job(endpoint, fn, args, kwargs, priority, future))
+        return await future
+
+    def _enqueue(self, job: _Job):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # 事件循环变化（例如多次 asyncio.run）时重建派发任务
+            self._loop = loop
+            self._workers.clear()
+        bucket = self.bucket_for(job.endpoint)
+        heapq.heappush(self._queues[bucket], (job.priority, next(self._seq), job))
+        if bucket not in self._workers or self._workers[bucket].done():
+            self._wakeups[bucket] = asyncio.Event()
+            self._workers[bucket] = asyncio.create_task(self._dispatch(bucket))
+        self._wakeups[bucket].set()
+
+    async def _dispatch(self, bucket_name: str):
+        """单个令牌桶的派发循环: 有令牌时取出优先级最高的请求"""
+        bucket = self.buckets[bucket_name]
+        queue = self._queues[bucket_name]
+        wakeup = self._wakeups[bucket_name]
+        while True:
+            if not queue:
+                wakeup.clear()
+                await wakeup.wait()
+                continue
+            delay = bucket.delay()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            # 等待令牌期间可能有更高优先级的请求入队，因此在拿到令牌后再出队
+            bucket.take()
+            _, _, job = heapq.heappop(queue)
+            wait = time.monotonic() - job.enqueued
+            stats = self.stats[bucket_name]
+            stats['requests'] += 1
+            stats['wait_total'] += wait
+            stats['wait_max'] = max(stats['wait_max'], wait)
+            self._wait_samples[bucket_name].append(wait)
+            task = asyncio.create_task(self._run(bucket_name, job))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, bucket_name: str, job: _Job):
+        try:
+            result = await asyncio.to_thread(job.fn, *job.args, **job.kwargs)
+        except Exception as e:
+            stats = self.stats[bucket_name]
+            if is_rate_limited(e) and job.attempt < self.config['MAX_RETRIES']:
+                stats['rate_limited'] += 1
+                stats['retries'] += 1
+                delay = min(self.config['BACKOFF_BASE'] * (2 ** job.attempt), self.config['BACKOFF_MAX'])
+                delay *= random.uniform(0.5, 1.5)
+                job.attempt += 1
+                # 整个桶暂停，避免其他请求继续撞上限流
+                self.buckets[bucket_name].pause(delay)
+                logger.warning(f"请求被限流: {job.endpoint}，{delay:.2f} 秒后第 {job.attempt} 次重试")
+                job.enqueued = time.monotonic()
+                self._enqueue(job)
+                return
+            if is_rate_limited(e):
+                stats['rate_limited'] += 1
+            stats['errors'] += 1
+            if not job.future.done():
+                job.future.set_exception(e)
+            return
+        if not job.future.done():
+            job.future.set_result(result)
+
+    def queue_depth(self) -> Dict[str, int]:
+        return {name: len(queue) for name, queue in self._queues.items()}
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """各令牌桶的请求数、限流次数和排队等待时间 (毫秒)"""
+        result = {}
+        for name, stats in self.stats.items():
+            samples = sorted(self._wait_samples[name])
+            result[name] = {
+                'requests': stats['requests'],
+                'rate_limited': stats['rate_limited'],
+                'retries': stats['retries'],
+                'errors': stats['errors'],
+                'queue_depth': len(self._queues[name]),
+                'wait_avg_ms': stats['wait_total'] / stats['requests'] * 1000 if stats['requests'] else 0.0,
+                'wait_p95_ms': samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000 if samples else 0.0,
+                'wait_max_ms': stats['wait_max'] * 1000
+            }
+        return result
+
+    def format_metrics(self) -> str:
+        lines = []
+        for name, m in self.metrics().items():
+            if m['requests']:
+                lines.append(
+                    f"  [{name}] 请求 {m['requests']} | 限流 {m['rate_limited']} | 排队 {m['queue_depth']} | "
+                    f"等待 avg {m['wait_avg_ms']:.1f}ms p95 {m['wait_p95_ms']:.1f}ms max {m['wait_max_ms']:.1f}ms"
+                )
+        return '\n'.join(lines)
+
+
+# 进程内共享的请求调度器
+request_scheduler = RequestScheduler()
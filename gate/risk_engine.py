@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+下单前风控模块
+在提交订单前基于本地缓存状态（持仓/订单簿、信号历史中的开仓记录）进行检查，
+全部为内存查询，不产生任何交易所请求。
+检查通过到入场单回执之间有多次 await，并发的信号在这期间看不到彼此，
+因此检查通过后立即（同步地）占用名额 (reserve)，各项限额把未完成的占用计算在内，
+下单成功记录开仓或失败后释放。
+"""
+
+import logging
+import time
+from typing import Any, Dict, Optional, Set
+
+# 导入配置
+from config import RISK_CONFIG
+# 导入持仓/订单簿
+from position_book import PositionBook, position_book
+# 导入合约规格缓存（合约乘数）
+from contract_specs import ContractSpecCache, contract_specs
+# 导入信号历史（开仓时间）
+from signal_history import SignalHistory, signal_history
+
+# 设置日志
+logger = logging.getLogger(__name__)
+
+
+class RiskRejection(Exception):
+    """风控拒绝，rule 为触发的规则名"""
+
+    def __init__(self, rule: str, reason: str):
+        super().__init__(reason)
+        self.rule = rule
+        self.reason = reason
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'rule': self.rule, 'reason': self.reason, 'time': time.time()}
+
+
+class Reservation:
+    """一次进行中的开仓占用的名额: 合约、频道和（第二阶段检查通过后的）名义价值"""
+    __slots__ = ('contract', 'chat_id', 'notional', 'created_at')
+
+    def __init__(self, contract: str, chat_id: Any, now: float):
+        self.contract = contract
+        self.chat_id = chat_id
+        self.notional = 0.0
+        self.created_at = now
+
+    def __repr__(self):
+        return f"Reservation({self.contract}, 频道 {self.chat_id}, 名义价值 {self.notional:.2f})"
+
+
+class RiskEngine:
+    """基于本地状态的下单前风控"""
+
+    def __init__(self, book: PositionBook = None, config: Dict[str, Any] = None, specs: ContractSpecCache = None,
+                 history: SignalHistory = None):
+        self.book = book or position_book
+        self.specs = specs or contract_specs
+        self.config = config if config is not None else RISK_CONFIG
+        # 冷却和频道限额按信号历史中的开仓时间计算，各账户共用进程内的历史
+        self.history = history or signal_history
+        # 检查已通过、入场单尚未确认的开仓
+        self._pending: Set[Reservation] = set()
+
+    def _limit(self, key: str) -> Optional[float]:
+        return self.config.get(key)
+
+    def notional(self, contract: str) -> float:
+        """合约当前名义价值: 持仓 + 未成交入场单"""
+        multiplier = self.specs.multiplier(contract)
+        total = 0.0
+        position = self.book.get_position(contract)
+        if position:
+            total += abs(position['size']) * position['entry_price'] * multiplier
+        for order in self.book.orders_for(contract):
+            if not order['reduce_only']:
+                total += abs(order['left']) * order['price'] * multiplier
+        return total
+
+    def total_notional(self) -> float:
+        return sum(self.notional(contract) for contract in self.book.exposed_contracts())
+
+    # ---------- 进行中的开仓 ----------
+
+    def reserve(self, contract: str, chat_id: Any = None, now: float = None) -> Reservation:
+        """检查通过后立即占用名额，必须在下一次 await 之前调用，并在结束时 release"""
+        reservation = Reservation(contract, chat_id, now or time.time())
+        self._pending.add(reservation)
+        return reservation
+
+    def release(self, reservation: Optional[Reservation]):
+        """释放名额（可重复调用）"""
+        if reservation is not None:
+            self._pending.discard(reservation)
+
+    def has_pending(self, contract: str) -> bool:
+        return any(r.contract == contract for r in self._pending)
+
+    def pending_contracts(self) -> Set[str]:
+        return {r.contract for r in self._pending}
+
+    def pending_notional(self, contract: str = None) -> float:
+        return sum(r.notional for r in self._pending if contract is None or r.contract == contract)
+
+    def check_signal(self, contract: str, chat_id: Any = None, now: float = None):
+        """
+        第一阶段检查（无需价格）: 持仓数量、合约冷却、频道限额。
+        未通过时抛出 RiskRejection。
+        """
+        if not self.config.get('ENABLED', True):
+            return
+        now = now or time.time()
+
+        max_positions = self._limit('MAX_OPEN_POSITIONS')
+        exposed = self.book.exposed_contracts() | self.pending_contracts()
+        if max_positions is not None and contract not in exposed:
+            if len(exposed) >= max_positions:
+                raise RiskRejection('max_open_positions', f"持仓合约数已达上限 {max_positions}")
+
+        cooldown = self._limit('CONTRACT_COOLDOWN_SECONDS')
+        if cooldown and self.has_pending(contract):
+            raise RiskRejection('contract_cooldown', f"{contract} 冷却中，已有开仓正在进行")
+        last = self.history.last_execution(contract)
+        if cooldown and last is not None and now - last < cooldown:
+            raise RiskRejection('contract_cooldown', f"{contract} 冷却中，距上次开仓 {now - last:.0f} 秒 (< {cooldown} 秒)")
+
+        max_signals = self._limit('MAX_SIGNALS_PER_CHANNEL')
+        if max_signals is not None and chat_id is not None:
+            window = self._limit('CHANNEL_WINDOW_SECONDS') or 0
+            executed = self.history.count_executions(chat_id, now - window)
+            executed += sum(1 for r in self._pending if r.chat_id == chat_id)
+            if executed >= max_signals:
+                raise RiskRejection('channel_limit', f"频道 {chat_id} 在 {window} 秒内已执行 {executed} 个信号")
+
+    def check_order(self, contract: str, entry_price: float, last_price: float,
+                    notional: float, is_market_order: bool = False, reservation: Reservation = None):
+        """
+        第二阶段检查（已知价格和仓位）: 名义价值上限、限价偏离度。
+        未通过时抛出 RiskRejection；通过后把名义价值记入本次开仓的占用。
+        """
+        if not self.config.get('ENABLED', True):
+            if reservation is not None:
+                reservation.notional = notional
+            return
+
+        max_distance = self._limit('MAX_LIMIT_DISTANCE_PCT')
+        if max_distance is not None and not is_market_order and last_price:
+            distance = abs(entry_price - last_price) / last_price * 100
+            if distance > max_distance:
+                raise RiskRejection('limit_distance', f"限价 {entry_price} 偏离最新价 {last_price} 达 {distance:.2f}% (> {max_distance}%)")
+
+        max_contract = self._limit('MAX_NOTIONAL_PER_CONTRACT')
+        if max_contract is not None:
+            contract_notional = self.notional(contract) + self.pending_notional(contract) + notional
+            if contract_notional > max_contract:
+                raise RiskRejection('max_notional_contract', f"{contract} 名义价值 {contract_notional:.2f} 超过上限 {max_contract}")
+
+        max_total = self._limit('MAX_TOTAL_NOTIONAL')
+        if max_total is not None:
+            total = self.total_notional() + self.pending_notional() + notional
+            if total > max_total:
+                raise RiskRejection('max_notional_total', f"总名义价值 {total:.2f} 超过上限 {max_total}")
+
+        if reservation is not None:
+            reservation.notional = notional
+
+    def record_entry(self, signal: Dict[str, Any], now: float = None):
+        """入场单提交成功后在信号历史中标记为已执行，用于冷却和频道限额"""
+        self.history.record_execution(signal, now)
+
+
+# 进程内共享的风控实例
+risk_engine = RiskEngine()
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+消息路由表模块
+启动时把 TARGET_CHANNEL_IDS / TARGET_TOPICS / ROUTES 预编译为不可变集合和字典，
+在 Telethon 的 NewMessage(chats=..., func=...) 过滤阶段直接拒绝无关消息，
+命中的消息携带各自的处理配置（提取器、提示词模板、仓位档位）。
+"""
+
+from typing import Any, Dict, FrozenSet, Iterable, Optional, Tuple
+
+from telethon.utils import get_peer_id
+
+# 导入配置
+from config import TELEGRAM_CONFIG
+
+DEFAULT_EXTRACTOR = 'llm'
+DEFAULT_SIZING_PROFILE = 'default'
+
+
+def message_thread(reply_to) -> Tuple[Optional[int], Optional[int]]:
+    """
+    从消息的 reply_to (MessageReplyHeader) 取出 (话题ID, 回复的消息ID)。
+    论坛话题中的普通消息 reply_to_msg_id 就是话题ID；话题内的回复由 reply_to_top_id 给出话题ID。
+    """
+    if reply_to is None:
+        return None, None
+    top_id = getattr(reply_to, 'reply_to_top_id', None)
+    if top_id is not None:
+        return top_id, reply_to.reply_to_msg_id
+    if getattr(reply_to, 'forum_topic', False):
+        return reply_to.reply_to_msg_id, None
+    return reply_to.reply_to_msg_id, reply_to.reply_to_msg_id
+
+
+class Route:
+    """一个频道或话题的处理配置"""
+    __slots__ = ('chat_id', 'topic_id', 'extractor', 'sizing_profile', 'prompt')
+
+    def __init__(self, chat_id: int, topic_id: Optional[int] = None,
+                 extractor: str = DEFAULT_EXTRACTOR, sizing_profile: str = DEFAULT_SIZING_PROFILE,
+                 prompt: Optional[str] = None):
+        self.chat_id = chat_id
+        self.topic_id = topic_id
+        self.extractor = extractor
+        self.sizing_profile = sizing_profile
+        self.prompt = prompt
+
+    def __repr__(self):
+        return (f"Route(chat_id={self.chat_id}, topic_id={self.topic_id}, "
+                f"extractor={self.extractor!r}, sizing_profile={self.sizing_profile!r}, prompt={self.prompt!r})")
+
+
+class RoutingTable:
+    """不可变路由表，更新配置时整体替换"""
+
+    def __init__(self, channel_ids: Iterable[int], topics: Dict[int, Iterable[int]],
+                 routes: Dict[Any, Dict[str, Any]] = None):
+        routes = routes or {}
+        self.channels: FrozenSet[int] = frozenset(channel_ids)
+        self.topics: Dict[int, FrozenSet[int]] = {chat_id: frozenset(ids) for chat_id, ids in topics.items()}
+        self.chats: FrozenSet[int] = self.channels | frozenset(self.topics)
+        # (频道ID, 话题ID) -> Route；整频道监听的话题ID为 None
+        self._routes: Dict[Tuple[int, Optional[int]], Route] = {}
+        for chat_id in self.channels:
+            self._routes[(chat_id, None)] = self._build(chat_id, None, routes)
+        for chat_id, topic_ids in self.topics.items():
+            for topic_id in topic_ids:
+                self._routes[(chat_id, topic_id)] = self._build(chat_id, topic_id, routes)
+
+    @staticmethod
+    def _build(chat_id: int, topic_id: Optional[int], routes: Dict[Any, Dict[str, Any]]) -> Route:
+        # 话题级配置优先于频道级配置
+        options = dict(routes.get(chat_id, {}))
+        if topic_id is not None:
+            options.update(routes.get((chat_id, topic_id), {}))
+        return Route(
+            chat_id, topic_id,
+            extractor=options.get('EXTRACTOR', DEFAULT_EXTRACTOR),
+            sizing_profile=options.get('SIZING_PROFILE', DEFAULT_SIZING_PROFILE),
+            prompt=options.get('PROMPT')
+        )
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any] = None) -> 'RoutingTable':
+        config = config or TELEGRAM_CONFIG
+        return cls(config['TARGET_CHANNEL_IDS'], config.get('TARGET_TOPICS', {}), config.get('ROUTES', {}))
+
+    def lookup(self, chat_id: int, topic_id: Optional[int] = None) -> Optional[Route]:
+        """按频道和话题查找路由，不是目标时返回 None"""
+        if chat_id in self.channels:
+            return self._routes[(chat_id, None)]
+        topic_ids = self.topics.get(chat_id)
+        if topic_ids is not None and topic_id in topic_ids:
+            return self._routes[(chat_id, topic_id)]
+        return None
+
+    def match(self, message) -> Optional[Route]:
+        """
+        判断一条 Telethon 消息是否需要处理: 目标频道/话题、非媒体且有文本。
+        返回对应的 Route，否则返回 None。
+        """
+        if message.media or not message.message:
+            return None
+        chat_id = get_peer_id(message.peer_id)
+        topic_id, _ = message_thread(message.reply_to)
+        return self.lookup(chat_id, topic_id)
+
+    def event_filter(self, event) -> bool:
+        """NewMessage 的 func 过滤器，命中时把 Route 挂到 event.route 上"""
+        route = self.match(event.message)
+        if route is None:
+            return False
+        event.route = route
+        return True
+
+
+# 进程内共享的路由表
+routing_table = RoutingTable.from_config()
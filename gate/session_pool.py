@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+多会话监听模块
+将目标频道/群组按分片表分配到多个 Telegram 会话，每个会话独立连接、重连和退避，
+某个会话触发 FloodWait 时不影响其他会话。所有会话收到的消息进入同一个处理队列，
+由固定数量的消费者提取信号并执行交易。
+
+用法:
+    python session_pool.py
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Set
+
+# 导入配置
+from config import TELEGRAM_CONFIG, OTHER_CONFIG
+import monitor_telegram_trading as monitor
+from multi_account import start_book_sync
+from request_scheduler import request_scheduler
+import routing
+from config_reloader import config_reloader
+
+
+def default_sessions() -> List[Dict[str, Any]]:
+    """会话列表；未配置 SESSIONS 时退化为 TELEGRAM_CONFIG 中的单个会话"""
+    sessions = TELEGRAM_CONFIG.get('SESSIONS') or []
+    if sessions:
+        return sessions
+    return [{
+        'NAME': 'default',
+        'SESSION_FILE': TELEGRAM_CONFIG['SESSION_FILE'],
+        'PHONE_NUMBER': TELEGRAM_CONFIG['PHONE_NUMBER']
+    }]
+
+
+def build_shards(sessions: List[Dict[str, Any]], shard_map: Dict[Any, str] = None) -> Dict[str, Set[int]]:
+    """
+    计算每个会话负责的频道/群组ID集合。
+    SHARD_MAP 中显式指定的频道分配给对应会话，其余频道按ID取模均匀分配（结果与启动顺序无关）。
+    """
+    shard_map = TELEGRAM_CONFIG.get('SHARD_MAP', {}) if shard_map is None else shard_map
+    names = [session['NAME'] for session in sessions]
+    shards = {name: set() for name in names}
+    for chat_id in sorted(routing.routing_table.chats):
+        name = shard_map.get(chat_id)
+        if name not in shards:
+            if name is not None:
+                print(f"⚠️ 分片表中的会话 {name} 不存在，频道 {chat_id} 将自动分配")
+            name = names[abs(chat_id) % len(names)]
+        shards[name].add(chat_id)
+    return shards
+
+
+class SessionPool:
+    """多个 Telegram 会话共享一个处理队列"""
+
+    def __init__(self, sessions: List[Dict[str, Any]] = None, shard_map: Dict[Any, str] = None,
+                 workers: int = None):
+        self.sessions = sessions or default_sessions()
+        self.shards = build_shards(self.sessions, shard_map)
+        self.workers = workers or TELEGRAM_CONFIG.get('QUEUE_WORKERS', 8)
+        self.queue: asyncio.Queue = None
+        # 统计: 会话名 -> 收到的消息数
+        self.received: Dict[str, int] = {session['NAME']: 0 for session in self.sessions}
+        self.processed = 0
+
+    def _on_config_reload(self, old_table, new_table):
+        """新增的监听目标按同样的规则分配到会话，移除的目标从分片中删除"""
+        shard_map = TELEGRAM_CONFIG.get('SHARD_MAP', {})
+        names = list(self.shards)
+        for chat_id in new_table.chats - old_table.chats:
+            name = shard_map.get(chat_id)
+            if name not in self.shards:
+                name = names[abs(chat_id) % len(names)]
+            self.shards[name].add(chat_id)
+        for chats in self.shards.values():
+            chats &= new_table.chats
+
+    def _dispatcher(self, session_name: str):
+        """返回某个会话使用的分发函数: 只入队，不阻塞监听"""
+        def dispatch(message_id, text, chat_id, topic_id, timestamp, reply_to_msg_id=None):
+            self.received[session_name] += 1
+            self.queue.put_nowait((message_id, text, chat_id, topic_id, timestamp, reply_to_msg_id, time.perf_counter()))
+        return dispatch
+
+    async def _worker(self):
+        while True:
+            message_id, text, chat_id, topic_id, timestamp, reply_to_msg_id, enqueued = await self.queue.get()
+            wait_ms = (time.perf_counter() - enqueued) * 1000
+            if wait_ms > 100:
+                print(f"⏱️ 消息 {message_id} 在队列中等待 {wait_ms:.1f} ms")
+            try:
+                await monitor.process_message_async(message_id, text, chat_id, topic_id, timestamp, reply_to_msg_id)
+            except Exception as e:
+                print(f"❌ 处理消息失败 (消息ID: {message_id}): {e}")
+            finally:
+                self.processed += 1
+                self.queue.task_done()
+
+    async def _report(self):
+        while True:
+            await asyncio.sleep(60)
+            received = ', '.join(f"{name}: {count}" for name, count in self.received.items())
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 会话池状态: "
+                  f"队列深度 {self.queue.qsize()} | 已处理 {self.processed} | 收到 {received}")
+            scheduler_metrics = request_scheduler.format_metrics()
+            if scheduler_metrics:
+                print(f"Gate请求调度统计:\n{scheduler_metrics}")
+
+    async def run(self):
+        self.queue = asyncio.Queue()
+        print(f"🚀 启动 {len(self.sessions)} 个Telegram会话，{self.workers} 个处理消费者")
+        for name, chats in self.shards.items():
+            print(f"   会话 {name}: {sorted(chats)}")
+
+        tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        tasks.append(asyncio.create_task(self._report()))
+        # 分片需在各会话重新注册监听器之前更新，因此先于会话注册回调
+        config_reloader.add_listener(self._on_config_reload)
+        tasks.append(asyncio.create_task(config_reloader.watch()))
+        # 订单簿同步只启动一次，由所有会话共享
+        tasks.extend(await start_book_sync())
+        try:
+            # 每个会话有各自的重连循环和退避状态，互不阻塞
+            await asyncio.gather(*(
+                monitor.run_session(self._dispatcher(session['NAME']), session, self.shards[session['NAME']])
+                for session in self.sessions
+            ))
+        finally:
+            config_reloader.remove_listener(self._on_config_reload)
+            for task in tasks:
+                task.cancel()
+
+
+async def main():
+    if monitor.PERFORMANCE_MODULE_AVAILABLE:
+        monitor.apply_system_optimizations()
+    await SessionPool().run()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(
+        format='[%(levelname)s %(asctime)s] %(name)s: %(message)s',
+        level=logging.WARNING,
+        handlers=[logging.FileHandler(OTHER_CONFIG['LOG_FILE']), logging.StreamHandler()]
+    )
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\n程序被用户中断")
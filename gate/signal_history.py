@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+信号历史模块
+固定容量的环形缓冲区，保存最近信号的紧凑记录（不含原文和模型原始输出），
+按交易对和频道建立二级索引，供重复信号过滤、风控（冷却、频道限额）和信号修改跟踪查询。
+容量满后覆盖最旧的记录，长时间运行内存保持不变。
+"""
+
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+# 导入配置
+from config import SIGNAL_HISTORY_CONFIG
+
+STATUS_EXTRACTED = 'extracted'   # 已提取，等待执行
+STATUS_EXECUTED = 'executed'     # 已下单
+STATUS_FAILED = 'failed'         # 执行失败或被风控拒绝
+STATUS_CANCELLED = 'cancelled'   # 已被后续消息取消
+
+
+def contract_of(trading_pair: str) -> str:
+    return trading_pair.replace('/', '_').upper()
+
+
+class SignalRecord:
+    """一条信号的紧凑记录"""
+    __slots__ = ('chat_id', 'message_id', 'topic_id', 'contract', 'direction', 'market_entry',
+                 'entry_min', 'entry_max', 'stop_loss', 'targets', 'status', 'created_at', 'executed_at')
+
+    def __init__(self, chat_id: Any, message_id: Any, topic_id: Any, contract: str, direction: str,
+                 market_entry: bool, entry_min: Optional[float], entry_max: Optional[float],
+                 stop_loss: Optional[float], targets: Tuple[float, ...], status: str, created_at: float):
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.topic_id = topic_id
+        self.contract = contract
+        self.direction = direction
+        self.market_entry = market_entry
+        self.entry_min = entry_min
+        self.entry_max = entry_max
+        self.stop_loss = stop_loss
+        self.targets = targets
+        self.status = status
+        self.created_at = created_at
+        self.executed_at: Optional[float] = None
+
+    @classmethod
+    def from_signal(cls, signal: Dict[str, Any], status: str, now: float) -> 'SignalRecord':
+        entries = signal.get('entry_price') or []
+        numeric = [float(p) for p in entries if isinstance(p, (int, float)) and not isinstance(p, bool)]
+        stop_loss = signal.get('stop_loss')
+        return cls(
+            signal.get('chat_id'), signal.get('message_id'), signal.get('topic_id'),
+            contract_of(signal['trading_pair']), signal.get('direction'),
+            len(numeric) < len(entries),
+            min(numeric) if numeric else None, max(numeric) if numeric else None,
+            float(stop_loss) if stop_loss is not None else None,
+            tuple(float(p) for p in signal.get('target_price') or ()),
+            status, now
+        )
+
+    @property
+    def key(self) -> Tuple[Any, Any]:
+        return self.chat_id, self.message_id
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    def __repr__(self):
+        return f"SignalRecord({self.contract} {self.direction}, 频道 {self.chat_id} 消息 {self.message_id}, {self.status})"
+
+
+def _close(a: Optional[float], b: Optional[float], tolerance: float) -> bool:
+    if a is None or b is None:
+        return a is b
+    return abs(a - b) <= tolerance * max(abs(a), abs(b))
+
+
+class SignalHistory:
+    """
+    最近信号的环形缓冲区。
+    记录按加入顺序存放在固定长度的列表中；索引 (交易对 / 频道 -> 记录队列) 与缓冲区同序，
+    覆盖最旧记录时只需从对应队列的左端弹出，索引维护为 O(1)。
+    """
+
+    def __init__(self, capacity: int = None):
+        self.capacity = capacity or SIGNAL_HISTORY_CONFIG.get('CAPACITY', 1000)
+        self._ring: List[Optional[SignalRecord]] = [None] * self.capacity
+        self._added = 0
+        self._by_key: Dict[Tuple[Any, Any], SignalRecord] = {}
+        self._by_contract: Dict[str, Deque[SignalRecord]] = {}
+        self._by_chat: Dict[Any, Deque[SignalRecord]] = {}
+
+    def __len__(self):
+        return min(self._added, self.capacity)
+
+    def add(self, signal: Dict[str, Any], status: str = STATUS_EXTRACTED, now: float = None) -> SignalRecord:
+        """加入一个信号；同一 (频道, 消息) 已存在时只更新状态"""
+        now = now or time.time()
+        existing = self._by_key.get((signal.get('chat_id'), signal.get('message_id')))
+        if existing is not None:
+            self._set_status(existing, status, now)
+            return existing
+
+        record = SignalRecord.from_signal(signal, status, now)
+        if status == STATUS_EXECUTED:
+            record.executed_at = now
+        slot = self._added % self.capacity
+        evicted = self._ring[slot]
+        if evicted is not None:
+            self._evict(evicted)
+        self._ring[slot] = record
+        self._added += 1
+        self._by_key[record.key] = record
+        self._by_contract.setdefault(record.contract, deque()).append(record)
+        self._by_chat.setdefault(record.chat_id, deque()).append(record)
+        return record
+
+    def _evict(self, record: SignalRecord):
+        # 最旧的记录一定在各索引队列的最左端
+        for index, value in ((self._by_contract, record.contract), (self._by_chat, record.chat_id)):
+            records = index[value]
+            records.popleft()
+            if not records:
+                del index[value]
+        if self._by_key.get(record.key) is record:
+            del self._by_key[record.key]
+
+    @staticmethod
+    def _set_status(record: SignalRecord, status: str, now: float):
+        record.status = status
+        if status == STATUS_EXECUTED and record.executed_at is None:
+            record.executed_at = now
+
+    def get(self, chat_id: Any, message_id: Any) -> Optional[SignalRecord]:
+        return self._by_key.get((chat_id, message_id))
+
+    def mark(self, chat_id: Any, message_id: Any, status: str, now: float = None) -> Optional[SignalRecord]:
+        """更新一条记录的状态，记录不存在（已被覆盖）时返回 None"""
+        record = self._by_key.get((chat_id, message_id))
+        if record is not None:
+            self._set_status(record, status, now or time.time())
+        return record
+
+    def record_execution(self, signal: Dict[str, Any], now: float = None) -> SignalRecord:
+        """记录一次成功下单；没有提取记录时（例如分进程模式的执行进程）直接加入"""
+        return self.add(signal, STATUS_EXECUTED, now)
+
+    @staticmethod
+    def _query(records: Optional[Deque[SignalRecord]], since: Optional[float], status: Optional[str]) -> Iterator[SignalRecord]:
+        # 从恢复的旧记录可能晚于新记录加入，因此不按时间提前结束
+        for record in reversed(records or ()):
+            if since is not None and record.created_at < since:
+                continue
+            if status is not None and record.status != status:
+                continue
+            yield record
+
+    def by_contract(self, contract: str, since: float = None, status: str = None) -> Iterator[SignalRecord]:
+        """某个合约的记录，最新的在前"""
+        return self._query(self._by_contract.get(contract_of(contract)), since, status)
+
+    def by_chat(self, chat_id: Any, since: float = None, status: str = None) -> Iterator[SignalRecord]:
+        """某个频道的记录，最新的在前"""
+        return self._query(self._by_chat.get(chat_id), since, status)
+
+    def last_execution(self, contract: str) -> Optional[float]:
+        """合约最近一次下单的时间"""
+        times = [record.executed_at for record in self.by_contract(contract) if record.executed_at is not None]
+        return max(times) if times else None
+
+    def count_executions(self, chat_id: Any, since: float) -> int:
+        """频道在 since 之后下单的信号数"""
+        return sum(1 for record in self.by_chat(chat_id)
+                   if record.executed_at is not None and record.executed_at >= since)
+
+    def find_duplicate(self, signal: Dict[str, Any], window: float = None, tolerance: float = None,
+                       now: float = None) -> Optional[SignalRecord]:
+        """
+        窗口期内同一合约、同方向、入场区间和止损相同（在容差内）的其他消息的信号，
+        用于过滤多个频道转发的同一信号。执行失败的记录不计入。
+        """
+        now = now or time.time()
+        window = SIGNAL_HISTORY_CONFIG.get('DEDUP_WINDOW', 300) if window is None else window
+        tolerance = SIGNAL_HISTORY_CONFIG.get('DEDUP_PRICE_TOLERANCE', 0.001) if tolerance is None else tolerance
+        candidate = SignalRecord.from_signal(signal, STATUS_EXTRACTED, now)
+        for record in self.by_contract(candidate.contract, since=now - window):
+            if record.key == candidate.key or record.status == STATUS_FAILED:
+                continue
+            if (record.direction == candidate.direction
+                    and record.market_entry == candidate.market_entry
+                    and _close(record.entry_min, candidate.entry_min, tolerance)
+                    and _close(record.entry_max, candidate.entry_max, tolerance)
+                    and _close(record.stop_loss, candidate.stop_loss, tolerance)):
+                return record
+        return None
+
+    def format_stats(self) -> str:
+        counts: Dict[str, int] = {}
+        for record in self._ring:
+            if record is not None:
+                counts[record.status] = counts.get(record.status, 0) + 1
+        detail = ', '.join(f"{status} {count}" for status, count in sorted(counts.items()))
+        return f"  信号历史 {len(self)}/{self.capacity} ({detail or '空'}) | 合约 {len(self._by_contract)} | 频道 {len(self._by_chat)}"
+
+
+# 进程内共享的信号历史
+signal_history = SignalHistory()
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+交易信号模型模块
+两个监听程序和 tgqd/test.py 共用的信号定义:
+- parse_signal / Signal: 热路径使用的快速校验，单次遍历完成类型检查和价格逻辑检查，
+  结果保存在 __slots__ 对象中，入场价上下限在构造时计算一次，to_dict() 直接生成字典
+- TradingSignal: 等价的 Pydantic 模型（严格类型），用于需要 JSON Schema 或 Pydantic 接口的场合
+两者共用 check_price_logic，校验规则和错误信息一致。微基准见 bench_signal_model.py。
+"""
+
+from enum import Enum
+from typing import Any, Dict, List, Literal, Mapping, Optional, Union
+
+from pydantic import BaseModel, ConfigDict, Field, StrictFloat, StrictStr, model_validator
+
+# 入场价中表示按市价入场的取值，模型偶尔输出的同义写法统一为该值
+MARKET_PRICE = '现价'
+MARKET_ALIASES = frozenset({'现价', '市价', '現價', '市價'})
+
+# 有效信号必须包含的字段
+SIGNAL_FIELDS = ('trading_pair', 'direction', 'entry_price', 'target_price', 'stop_loss')
+
+
+class Direction(str, Enum):
+    """交易方向，继承 str，可直接与 'long'/'short' 比较和序列化"""
+    LONG = 'long'
+    SHORT = 'short'
+
+
+class SignalValidationError(ValueError):
+    """信号字段类型或价格逻辑不合法"""
+
+
+def check_price_logic(direction: Direction, entry_min: Optional[float], entry_max: Optional[float],
+                      target_min: float, target_max: float, stop_loss: float):
+    """
+    验证交易信号中的价格逻辑是否一致，没有数字入场价（只有 "现价"）时跳过。
+    - 多单: 目标价应高于入场价，止损价应低于入场价。
+    - 空单: 目标价应低于入场价，止损价应高于入场价。
+    """
+    if entry_min is None:
+        return
+    if direction is Direction.LONG:
+        if target_min <= entry_max:
+            raise SignalValidationError(f"逻辑冲突 (多单): 最低目标价 {target_min} 必须高于最高入场价 {entry_max}。")
+        if stop_loss >= entry_min:
+            raise SignalValidationError(f"逻辑冲突 (多单): 止损价 {stop_loss} 必须低于最低入场价 {entry_min}。")
+    else:
+        if target_max >= entry_min:
+            raise SignalValidationError(f"逻辑冲突 (空单): 最高目标价 {target_max} 必须低于最低入场价 {entry_min}。")
+        if stop_loss <= entry_max:
+            raise SignalValidationError(f"逻辑冲突 (空单): 止损价 {stop_loss} 必须高于最高入场价 {entry_max}。")
+
+
+class Signal:
+    """已校验的交易信号（热路径表示），字段与 TradingSignal 相同"""
+    __slots__ = ('trading_pair', 'direction', 'entry_price', 'target_price', 'stop_loss',
+                 'market_entry', 'entry_min', 'entry_max')
+
+    def __init__(self, trading_pair: str, direction: Direction, entry_price: List[Union[str, float]],
+                 target_price: List[float], stop_loss: float, market_entry: bool,
+                 entry_min: Optional[float], entry_max: Optional[float]):
+        self.trading_pair = trading_pair
+        self.direction = direction
+        self.entry_price = entry_price
+        self.target_price = target_price
+        self.stop_loss = stop_loss
+        # 入场价包含 "现价"
+        self.market_entry = market_entry
+        # 数字入场价的上下限，只有 "现价" 时为 None
+        self.entry_min = entry_min
+        self.entry_max = entry_max
+
+    def to_dict(self) -> Dict[str, Any]:
+        """与 TradingSignal.model_dump() 相同的字典（direction 为字符串）"""
+        return {
+            'trading_pair': self.trading_pair,
+            'direction': self.direction.value,
+            'entry_price': list(self.entry_price),
+            'target_price': list(self.target_price),
+            'stop_loss': self.stop_loss
+        }
+
+    def __eq__(self, other):
+        return isinstance(other, Signal) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return (f"Signal({self.trading_pair} {self.direction.value}, entry={self.entry_price}, "
+                f"target={self.target_price}, stop={self.stop_loss})")
+
+
+def _number(value: Any, field: str) -> float:
+    # bool 是 int 的子类，需要单独排除
+    if value.__class__ is float:
+        return value
+    if value.__class__ is int:
+        return float(value)
+    raise SignalValidationError(f"{field} 必须是数字，收到 {value!r}")
+
+
+def parse_signal(data: Mapping[str, Any]) -> Signal:
+    """
+    校验模型输出的信号字典并返回 Signal，不合法时抛出 SignalValidationError。
+    字段类型严格检查: 价格必须是数字（不接受数字字符串），入场价中的字符串只能是 "现价"（或同义写法）。
+    多余的字段被忽略。
+    """
+    try:
+        trading_pair = data['trading_pair']
+        direction = data['direction']
+        entry_raw = data['entry_price']
+        target_raw = data['target_price']
+        stop_raw = data['stop_loss']
+    except KeyError as e:
+        raise SignalValidationError(f"缺少字段 {e.args[0]}") from None
+    except TypeError:
+        raise SignalValidationError("信号必须是 JSON 对象") from None
+
+    if trading_pair.__class__ is not str or not trading_pair:
+        raise SignalValidationError(f"trading_pair 必须是非空字符串，收到 {trading_pair!r}")
+    if direction == 'long':
+        direction = Direction.LONG
+    elif direction == 'short':
+        direction = Direction.SHORT
+    else:
+        raise SignalValidationError(f"direction 必须是 'long' 或 'short'，收到 {direction!r}")
+    if entry_raw.__class__ is not list or not entry_raw:
+        raise SignalValidationError("entry_price 必须是非空列表")
+    if target_raw.__class__ is not list or not target_raw:
+        raise SignalValidationError("target_price 必须是非空列表")
+
+    entry_price = []
+    market_entry = False
+    entry_min = entry_max = None
+    for value in entry_raw:
+        if value.__class__ is str:
+            if value not in MARKET_ALIASES:
+                raise SignalValidationError(f"entry_price 中的字符串只能是 '{MARKET_PRICE}'，收到 {value!r}")
+            market_entry = True
+            entry_price.append(MARKET_PRICE)
+            continue
+        value = _number(value, 'entry_price')
+        entry_price.append(value)
+        if entry_min is None:
+            entry_min = entry_max = value
+        elif value < entry_min:
+            entry_min = value
+        elif value > entry_max:
+            entry_max = value
+
+    target_price = [_number(value, 'target_price') for value in target_raw]
+    stop_loss = _number(stop_raw, 'stop_loss')
+
+    check_price_logic(direction, entry_min, entry_max, min(target_price), max(target_price), stop_loss)
+    return Signal(trading_pair, direction, entry_price, target_price, stop_loss, market_entry, entry_min, entry_max)
+
+
+class TradingSignal(BaseModel):
+    """交易信号的 Pydantic 模型（严格类型），校验规则与 parse_signal 相同"""
+    model_config = ConfigDict(extra='ignore')
+
+    trading_pair: StrictStr = Field(min_length=1)
+    direction: Direction
+    entry_price: List[Union[StrictFloat, Literal['现价', '市价', '現價', '市價']]] = Field(min_length=1)
+    target_price: List[StrictFloat] = Field(min_length=1)
+    stop_loss: StrictFloat
+
+    @model_validator(mode='after')
+    def check_prices_logic(self) -> 'TradingSignal':
+        self.entry_price = [MARKET_PRICE if isinstance(p, str) else p for p in self.entry_price]
+        numeric = [p for p in self.entry_price if not isinstance(p, str)]
+        check_price_logic(
+            self.direction, min(numeric) if numeric else None, max(numeric) if numeric else None,
+            min(self.target_price), max(self.target_price), self.stop_loss
+        )
+        return self
+
+    def to_signal(self) -> Signal:
+        numeric = [p for p in self.entry_price if not isinstance(p, str)]
+        return Signal(self.trading_pair, self.direction, list(self.entry_price), list(self.target_price),
+                      self.stop_loss, len(numeric) < len(self.entry_price),
+                      min(numeric) if numeric else None, max(numeric) if numeric else None)
@@ -0,0 +1,462 @@
+# -*- coding: utf-8 -*-
+"""
+信号与交易数据库模块
+使用 SQLite（WAL 模式）保存消息、信号、模型原始输出、修改指令、订单和成交，
+按时间、合约、频道、消息ID建立索引，常见查询（"上周所有 ETH 空单及其结果"）无需加载整个信号文件。
+信号文件 trading_signals.json 仍照常写入，数据库作为可查询的副本；已有的信号文件和导出的历史消息可一次性导入。
+
+用法:
+    python signal_store.py import --signals ../tgqd/trading_signals.json --history '../tgqd/channel_*_history.txt'
+    python signal_store.py query --pair ETH --direction short --days 7
+    python signal_store.py stats
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# 导入配置
+from config import STORE_CONFIG
+
+# 设置日志
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    chat_id INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    topic_id INTEGER,
+    reply_to_msg_id INTEGER,
+    ts INTEGER NOT NULL,
+    sender TEXT,
+    text TEXT NOT NULL,
+    PRIMARY KEY (chat_id, message_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_messages_ts ON messages (ts);
+
+CREATE TABLE IF NOT EXISTS signals (
+    id INTEGER PRIMARY KEY,
+    chat_id INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    topic_id INTEGER,
+    ts INTEGER NOT NULL,
+    contract TEXT NOT NULL,
+    direction TEXT NOT NULL,
+    entry_price TEXT NOT NULL,
+    entry_min REAL,
+    entry_max REAL,
+    target_price TEXT NOT NULL,
+    stop_loss REAL NOT NULL,
+    sizing_profile TEXT,
+    original_text TEXT,
+    executed INTEGER,
+    error TEXT,
+    UNIQUE (chat_id, message_id)
+);
+CREATE INDEX IF NOT EXISTS idx_signals_ts ON signals (ts);
+CREATE INDEX IF NOT EXISTS idx_signals_contract_ts ON signals (contract, ts);
+CREATE INDEX IF NOT EXISTS idx_signals_chat_ts ON signals (chat_id, ts);
+CREATE INDEX IF NOT EXISTS idx_signals_message ON signals (message_id);
+
+CREATE TABLE IF NOT EXISTS llm_responses (
+    signal_id INTEGER PRIMARY KEY REFERENCES signals (id),
+    raw_json TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS updates (
+    chat_id INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    target_message_ids TEXT,
+    success INTEGER,
+    PRIMARY KEY (chat_id, message_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_updates_ts ON updates (ts);
+
+CREATE TABLE IF NOT EXISTS orders (
+    account TEXT NOT NULL,
+    order_id TEXT NOT NULL,
+    signal_id INTEGER NOT NULL REFERENCES signals (id),
+    contract TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    size INTEGER,
+    price REAL,
+    trigger_price REAL,
+    status TEXT,
+    create_time REAL,
+    PRIMARY KEY (account, order_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_orders_signal ON orders (signal_id);
+CREATE INDEX IF NOT EXISTS idx_orders_contract ON orders (contract);
+
+CREATE TABLE IF NOT EXISTS fills (
+    id INTEGER PRIMARY KEY,
+    account TEXT NOT NULL,
+    order_id TEXT NOT NULL,
+    contract TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    price REAL NOT NULL,
+    ts REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_fills_order ON fills (account, order_id);
+CREATE INDEX IF NOT EXISTS idx_fills_contract_ts ON fills (contract, ts);
+"""
+
+# 语句集中定义，sqlite3 按 SQL 文本缓存预编译语句，重复执行时不再解析
+UPSERT_MESSAGE = """
+    INSERT INTO messages (chat_id, message_id, topic_id, reply_to_msg_id, ts, sender, text)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (chat_id, message_id) DO UPDATE SET
+        topic_id = COALESCE(excluded.topic_id, topic_id),
+        reply_to_msg_id = COALESCE(excluded.reply_to_msg_id, reply_to_msg_id),
+        sender = COALESCE(excluded.sender, sender)
+"""
+UPSERT_SIGNAL = """
+    INSERT INTO signals (chat_id, message_id, topic_id, ts, contract, direction, entry_price, entry_min, entry_max,
+                         target_price, stop_loss, sizing_profile, original_text, executed, error)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (chat_id, message_id) DO UPDATE SET
+        target_price = excluded.target_price,
+        stop_loss = excluded.stop_loss,
+        executed = COALESCE(excluded.executed, executed),
+        error = excluded.error
+    RETURNING id
+"""
+UPSERT_LLM_RESPONSE = "INSERT OR REPLACE INTO llm_responses (signal_id, raw_json) VALUES (?, ?)"
+UPSERT_UPDATE = """
+    INSERT OR REPLACE INTO updates (chat_id, message_id, ts, kind, payload, target_message_ids, success)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+UPSERT_ORDER = """
+    INSERT INTO orders (account, order_id, signal_id, contract, kind, size, price, trigger_price, status, create_time)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (account, order_id) DO UPDATE SET status = excluded.status
+"""
+SELECT_SIGNAL_ORDERS = "SELECT account, order_id FROM orders WHERE signal_id = ?"
+MARK_ORDER_REMOVED = "UPDATE orders SET status = 'removed' WHERE account = ? AND order_id = ?"
+INSERT_FILL = "INSERT INTO fills (account, order_id, contract, size, price, ts) VALUES (?, ?, ?, ?, ?, ?)"
+
+# 查询结果中每个信号附带的订单和入场成交汇总
+SELECT_SIGNALS = """
+    SELECT s.id, s.chat_id, s.message_id, s.ts, s.contract, s.direction, s.entry_price, s.target_price,
+           s.stop_loss, s.executed, s.error,
+           (SELECT COUNT(*) FROM orders o WHERE o.signal_id = s.id) AS orders,
+           (SELECT SUM(ABS(f.size)) FROM orders o JOIN fills f ON f.account = o.account AND f.order_id = o.order_id
+            WHERE o.signal_id = s.id AND o.kind LIKE '%entry') AS entry_filled,
+           (SELECT SUM(ABS(f.size) * f.price) / SUM(ABS(f.size)) FROM orders o
+            JOIN fills f ON f.account = o.account AND f.order_id = o.order_id
+            WHERE o.signal_id = s.id AND o.kind LIKE '%entry') AS entry_avg
+    FROM signals s
+"""
+SIGNAL_COLUMNS = ('id', 'chat_id', 'message_id', 'ts', 'contract', 'direction', 'entry_price', 'target_price',
+                  'stop_loss', 'executed', 'error', 'orders', 'entry_filled', 'entry_avg')
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _ts(value: Any) -> int:
+    """信号文件和历史导出中的本地时间字符串 -> 时间戳"""
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        return int(datetime.strptime(value, TIME_FORMAT).timestamp())
+    except (TypeError, ValueError):
+        return int(time.time())
+
+
+def _contract(trading_pair: str) -> str:
+    return trading_pair.replace('/', '_').upper()
+
+
+def _float(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _int(value: Any) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False)
+
+
+class SignalStore:
+    """基于 SQLite 的信号/交易数据库，可在线程池中调用（内部加锁）"""
+
+    def __init__(self, db_file: str = None):
+        self.db_file = db_file or STORE_CONFIG['DB_FILE']
+        # 写入来自 asyncio.to_thread 的工作线程，使用一个连接并串行访问
+        self.conn = sqlite3.connect(self.db_file, check_same_thread=False, cached_statements=64)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.conn.close()
+
+    # ---------- 写入 ----------
+
+    def save_record(self, record: Dict[str, Any], default_chat_id: int = 0):
+        """保存信号文件中的一条记录（信号或修改指令），重复保存同一消息时更新结果"""
+        with self._lock, self.conn:
+            self._save_record(record, default_chat_id)
+
+    def save_records(self, records: Iterable[Dict[str, Any]], default_chat_id: int = 0) -> int:
+        """在一个事务中批量保存记录，返回保存的条数"""
+        count = 0
+        with self._lock, self.conn:
+            for record in records:
+                count += self._save_record(record, default_chat_id)
+        return count
+
+    def _save_record(self, record: Dict[str, Any], default_chat_id: int) -> int:
+        chat_id = record.get('chat_id')
+        chat_id = default_chat_id if chat_id is None else chat_id
+        message_id = record.get('message_id')
+        if message_id is None:
+            return 0
+        ts = _ts(record.get('timestamp'))
+        if record.get('original_text'):
+            self.conn.execute(UPSERT_MESSAGE, (chat_id, message_id, record.get('topic_id'),
+                                               record.get('reply_to_msg_id'), ts, None, record['original_text']))
+        if 'update' in record:
+            result = record.get('update_result')
+            self.conn.execute(UPSERT_UPDATE, (
+                chat_id, message_id, ts, record['update'].get('kind'), _dumps(record['update']),
+                _dumps(record.get('target_message_ids', [])), None if result is None else int(bool(result.get('success')))
+            ))
+            return 1
+        if not record.get('trading_pair'):
+            return 0
+
+        entries = [p for p in record.get('entry_price', []) if isinstance(p, (int, float))]
+        trade_result = record.get('trade_result')
+        executed = record.get('trade_executed')
+        signal_id = self.conn.execute(UPSERT_SIGNAL, (
+            chat_id, message_id, record.get('topic_id'), ts, _contract(record['trading_pair']),
+            record.get('direction'), _dumps(record.get('entry_price', [])),
+            min(entries) if entries else None, max(entries) if entries else None,
+            _dumps(record.get('target_price', [])), record.get('stop_loss'), record.get('sizing_profile'),
+            record.get('original_text'), None if executed is None else int(bool(executed)),
+            (trade_result or {}).get('error')
+        )).fetchone()[0]
+        if record.get('raw_json') is not None:
+            self.conn.execute(UPSERT_LLM_RESPONSE, (signal_id, _dumps(record['raw_json'])))
+        if trade_result and trade_result.get('orders') is not None:
+            self._save_orders(signal_id, _contract(record['trading_pair']), trade_result['orders'])
+        return 1
+
+    def _save_orders(self, signal_id: int, contract: str, orders: List[Dict[str, Any]]):
+        current = set()
+        for order in orders:
+            result = order.get('result') or {}
+            if result.get('order_id') is None:
+                continue
+            key = (order.get('account', 'default'), str(result['order_id']))
+            current.add(key)
+            self.conn.execute(UPSERT_ORDER, key + (
+                signal_id, result.get('contract') or contract, order.get('type', 'unknown'),
+                _int(result.get('size')), _float(result.get('price') or result.get('order_price')),
+                _float(result.get('trigger_price')), result.get('status'), _float(result.get('create_time'))
+            ))
+        # 修改止损/止盈后被替换的订单不再出现在 trade_result 中
+        for key in self.conn.execute(SELECT_SIGNAL_ORDERS, (signal_id,)).fetchall():
+            if tuple(key) not in current:
+                self.conn.execute(MARK_ORDER_REMOVED, tuple(key))
+
+    def record_fill(self, account: str, order_id: str, contract: str, size: int, price: float, ts: float = None):
+        """记录一次成交（size 带符号），作为 PositionBook.fill_listeners 的回调"""
+        with self._lock, self.conn:
+            self.conn.execute(INSERT_FILL, (account, str(order_id), contract, size, price, ts or time.time()))
+
+    def save_messages(self, messages: Iterable[Tuple]) -> int:
+        """批量写入消息行 (chat_id, message_id, topic_id, reply_to_msg_id, ts, sender, text)"""
+        rows = list(messages)
+        with self._lock, self.conn:
+            self.conn.executemany(UPSERT_MESSAGE, rows)
+        return len(rows)
+
+    # ---------- 查询 ----------
+
+    def query_signals(self, contract: str = None, direction: str = None, chat_id: int = None,
+                      since: float = None, until: float = None, executed: bool = None,
+                      limit: int = None) -> List[Dict[str, Any]]:
+        """按条件查询信号及其结果（订单数、入场成交数量和均价），最新的在前"""
+        conditions, params = [], []
+        if contract:
+            contract = _contract(contract)
+            if '_' not in contract:
+                # 只给出币种时按 USDT 合约查询，走 (contract, ts) 索引
+                contract = f"{contract}_USDT"
+            conditions.append("s.contract = ?")
+            params.append(contract)
+        if direction:
+            conditions.append("s.direction = ?")
+            params.append(direction)
+        if chat_id is not None:
+            conditions.append("s.chat_id = ?")
+            params.append(chat_id)
+        if since is not None:
+            conditions.append("s.ts >= ?")
+            params.append(int(since))
+        if until is not None:
+            conditions.append("s.ts < ?")
+            params.append(int(until))
+        if executed is not None:
+            conditions.append("s.executed = ?")
+            params.append(int(executed))
+        sql = SELECT_SIGNALS + (" WHERE " + " AND ".join(conditions) if conditions else "") + " ORDER BY s.ts DESC"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        with self._lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        results = []
+        for row in rows:
+            item = dict(zip(SIGNAL_COLUMNS, row))
+            item['entry_price'] = json.loads(item['entry_price'])
+            item['target_price'] = json.loads(item['target_price'])
+            results.append(item)
+        return results
+
+    def raw_response(self, signal_id: int) -> Optional[Any]:
+        with self._lock:
+            row = self.conn.execute("SELECT raw_json FROM llm_responses WHERE signal_id = ?", (signal_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {table: self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                    for table in ('messages', 'signals', 'llm_responses', 'updates', 'orders', 'fills')}
+
+
+# ---------- 导入 ----------
+
+_HISTORY_HEADER = re.compile(r'Channel ID: (-?\d+)(?:, Topic ID: (\d+))?')
+
+
+def parse_history_export(path: str) -> List[Tuple]:
+    """读取 export_topic_history.py 导出的历史消息，返回消息行"""
+    with open(path, 'r', encoding='utf-8') as f:
+        header, *blocks = f.read().split('--- Message ---')
+    match = _HISTORY_HEADER.search(header)
+    if not match:
+        raise ValueError(f"{path} 不是导出的历史消息文件")
+    chat_id = int(match.group(1))
+    topic_id = int(match.group(2)) if match.group(2) else None
+
+    rows = []
+    for block in blocks:
+        meta, _, content = block.partition('Content:\n')
+        fields = dict(line.split(': ', 1) for line in meta.strip().splitlines() if ': ' in line)
+        content = content.strip()
+        if not content or 'Message ID' not in fields:
+            continue
+        reply_to = fields.get('Reply to Msg ID')
+        rows.append((
+            chat_id, int(fields['Message ID']), topic_id,
+            int(reply_to) if reply_to and reply_to.isdigit() else None,
+            _ts(fields.get('Timestamp')), fields.get('Sender Name'), content
+        ))
+    return rows
+
+
+def import_files(store: SignalStore, signal_files: List[str], history_files: List[str],
+                 default_chat_id: int = 0) -> Dict[str, int]:
+    """导入信号文件和历史消息导出，可重复执行（按消息去重）"""
+    imported = {'records': 0, 'messages': 0}
+    for path in history_files:
+        imported['messages'] += store.save_messages(parse_history_export(path))
+    for path in signal_files:
+        with open(path, 'r', encoding='utf-8') as f:
+            imported['records'] += store.save_records(json.load(f), default_chat_id)
+    return imported
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store() -> Optional[SignalStore]:
+    """进程内共享的数据库；STORE_CONFIG['ENABLED'] 为 False 时返回 None"""
+    global _store
+    if not STORE_CONFIG.get('ENABLED', True):
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = SignalStore()
+    return _store
+
+
+def main():
+    parser = argparse.ArgumentParser(description='信号与交易数据库')
+    sub = parser.add_subparsers(dest='command', required=True)
+    importer = sub.add_parser('import', help='导入信号文件和历史消息导出')
+    importer.add_argument('--signals', nargs='*', default=[], help='信号文件 (JSON)')
+    importer.add_argument('--history', nargs='*', default=[], help='导出的历史消息文件（支持通配符）')
+    importer.add_argument('--chat-id', type=int, default=0, help='记录中没有 chat_id 时使用的频道ID')
+    query = sub.add_parser('query', help='查询信号及其结果')
+    query.add_argument('--pair', help='交易对或币种，如 ETH/USDT、ETH')
+    query.add_argument('--direction', choices=['long', 'short'])
+    query.add_argument('--chat-id', type=int)
+    query.add_argument('--days', type=float, help='只查询最近 N 天')
+    query.add_argument('--executed', action='store_true', help='只查询已下单的信号')
+    query.add_argument('--limit', type=int, default=50)
+    query.add_argument('--json', action='store_true', help='以 JSON 输出结果')
+    sub.add_parser('stats', help='各表记录数')
+    parser.add_argument('--db', default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    store = SignalStore(args.db)
+    try:
+        if args.command == 'import':
+            history_files = [path for pattern in args.history for path in glob.glob(pattern)]
+            start = time.perf_counter()
+            imported = import_files(store, args.signals, history_files, args.chat_id)
+            print(f"✅ 导入 {imported['records']} 条信号记录、{imported['messages']} 条历史消息 "
+                  f"({time.perf_counter() - start:.2f} 秒) -> {os.path.abspath(store.db_file)}")
+        elif args.command == 'stats':
+            for table, count in store.stats().items():
+                print(f"{table:<14} {count}")
+        else:
+            start = time.perf_counter()
+            rows = store.query_signals(
+                contract=args.pair, direction=args.direction, chat_id=args.chat_id,
+                since=time.time() - args.days * 86400 if args.days else None,
+                executed=True if args.executed else None, limit=args.limit
+            )
+            elapsed = (time.perf_counter() - start) * 1000
+            if args.json:
+                print(json.dumps(rows, ensure_ascii=False, indent=2))
+                return
+            for row in rows:
+                executed = {None: '未执行', 0: '失败', 1: '已下单'}[row['executed']]
+                filled = f"入场成交 {row['entry_filled']} @ {row['entry_avg']:.6g}" if row['entry_filled'] else ''
+                print(f"{datetime.fromtimestamp(row['ts']).strftime(TIME_FORMAT)}  {row['contract']:<12} "
+                      f"{row['direction']:<5} 入场 {row['entry_price']} 目标 {row['target_price']} 止损 {row['stop_loss']}  "
+                      f"{executed} 订单 {row['orders']} {filled} {row['error'] or ''}")
+            print(f"\n共 {len(rows)} 条 ({elapsed:.1f} ms)")
+    finally:
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
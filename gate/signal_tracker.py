@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+"""
+信号状态跟踪模块
+识别修改/取消已发信号的后续消息（"目标修改一下；3070-3090-3120"、"止損放在；3102"、"空單先取消"），
+按回复链 (reply_to_msg_id) 或信号历史中同一频道最近的已执行信号找到对应信号，由交易模块修改或撤销 Gate 订单；
+消息中提到币种（"crv取消"、"大饼的空单"）时只匹配该币种的信号。
+信号状态: open（已下单）-> cancelled（已取消）；修改止损/目标不改变状态，记录在 updates 中。
+"""
+
+import re
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+# 导入配置
+from config import SIGNAL_UPDATE_CONFIG
+from local_extractor import ASSET_ALIASES
+from signal_history import STATUS_CANCELLED, STATUS_EXECUTED, signal_history
+
+STATE_OPEN = 'open'
+STATE_CANCELLED = 'cancelled'
+
+UPDATE_CANCEL = 'cancel'
+UPDATE_STOP_LOSS = 'stop_loss'
+UPDATE_TARGET = 'target'
+
+_NORMALIZE = str.maketrans({'：': ':', '；': ';', '，': ',', '—': '-', '－': '-', '~': '-', '～': '-', '？': '?'})
+_NUMBER = re.compile(r'\d+(?:\.\d+)?')
+_CANCEL = re.compile(r'取消|撤单|撤單')
+# 询问、讨论类消息不是指令
+_QUESTION = re.compile(r'\?|还是|還是|吗|嗎')
+_STOP = re.compile(r'止损|止損|\bSL\b', re.IGNORECASE)
+_TARGET = re.compile(r'目标|目標|止盈|\bTP\b', re.IGNORECASE)
+# 止损关键字后的第一个价格；"止損600點" 这类点数写法不处理
+_STOP_VALUE = re.compile(r'(?:止损|止損|\bSL\b)[^\d]{0,12}?(\d+(?:\.\d+)?)(?![\d.]|\s*[点點])', re.IGNORECASE)
+_BREAKEVEN = re.compile(r'保本|成本价|成本價|开仓价|開倉價')
+# 修改目标必须有明确的修改动作，避免把 "目標先看..." 之类的评论当成修改
+_AMEND = re.compile(r'修改|改到|改成|改为|改為|调整|調整|更新|上移|下移|移到')
+_DIRECTION_HINTS = (('空单', 'short'), ('空單', 'short'), ('多单', 'long'), ('多單', 'long'))
+# 新信号的特征: 开仓方向（"附近多"、"ETH 多"，不含 "空單"/"多單"）加入场价区间或 "xxx附近"
+_SIGNAL_DIRECTION = re.compile(r'做多|做空|(?<!不)多(?![单單])|空(?![单單])')
+_ENTRY_PRICE = re.compile(r'\d+(?:\.\d+)?\s*-\s*\d+(?:\.\d+)?|\d+(?:\.\d+)?\s*(?:附近|左右)')
+_SYMBOL = re.compile(r'(?<![A-Za-z])([A-Za-z]{2,15})(?![A-Za-z])')
+_NOT_SYMBOLS = {'SL', 'TP', 'USDT', 'USD'}
+
+
+class SignalUpdate:
+    """一条修改/取消指令"""
+    __slots__ = ('kind', 'stop_loss', 'breakeven', 'targets', 'direction', 'symbol')
+
+    def __init__(self, kind: str, stop_loss: Optional[float] = None, breakeven: bool = False,
+                 targets: Optional[List[float]] = None, direction: Optional[str] = None,
+                 symbol: Optional[str] = None):
+        self.kind = kind
+        self.stop_loss = stop_loss
+        self.breakeven = breakeven
+        self.targets = targets or []
+        # 消息中提到的方向（"空單取消"），用于在没有回复链时筛选信号
+        self.direction = direction
+        # 消息中提到的币种（"WIF 止損在1.55"），只作用于该币种的信号
+        self.symbol = symbol
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'SignalUpdate':
+        return cls(**{slot: data.get(slot) for slot in cls.__slots__ if slot in data})
+
+    def __repr__(self):
+        if self.kind == UPDATE_CANCEL:
+            detail = self.direction or ''
+        elif self.kind == UPDATE_STOP_LOSS:
+            detail = '保本' if self.breakeven else self.stop_loss
+        else:
+            detail = self.targets
+        if self.symbol:
+            detail = f"{self.symbol} {detail}".strip()
+        return f"SignalUpdate({self.kind}: {detail})"
+
+
+def _symbol(text: str) -> Optional[str]:
+    """消息中提到的币种（英文代码或中文别名），没有时返回 None"""
+    for match in _SYMBOL.finditer(text):
+        symbol = match.group(1).upper()
+        if symbol not in _NOT_SYMBOLS:
+            return symbol
+    return next((asset for alias, asset in ASSET_ALIASES.items() if alias in text), None)
+
+
+def _looks_like_signal(text: str) -> bool:
+    """有开仓方向且止损/目标关键字之前有入场价（"103000-102500附近多"）的是新信号，不是修改指令"""
+    keywords = [m.start() for m in (_STOP.search(text), _TARGET.search(text)) if m]
+    entry_part = text[:min(keywords)] if keywords else text
+    return bool(_SIGNAL_DIRECTION.search(text) and _ENTRY_PRICE.search(entry_part))
+
+
+def parse_update(text: str) -> Optional[SignalUpdate]:
+    """从消息文本识别修改/取消指令，不是指令时返回 None"""
+    text = text.translate(_NORMALIZE).strip()
+    if not text or len(text) > SIGNAL_UPDATE_CONFIG.get('MAX_TEXT_LENGTH', 80) or _QUESTION.search(text):
+        return None
+    if _looks_like_signal(text):
+        return None
+    direction = next((d for word, d in _DIRECTION_HINTS if word in text), None)
+    symbol = _symbol(text)
+    has_stop = bool(_STOP.search(text))
+    has_target = bool(_TARGET.search(text))
+    # 同时出现止损和目标的是新信号或完整复述，交给提取器
+    if has_stop and has_target:
+        return None
+
+    if has_stop:
+        if _BREAKEVEN.search(text):
+            return SignalUpdate(UPDATE_STOP_LOSS, breakeven=True, direction=direction, symbol=symbol)
+        match = _STOP_VALUE.search(text)
+        if match:
+            return SignalUpdate(UPDATE_STOP_LOSS, stop_loss=float(match.group(1)), direction=direction, symbol=symbol)
+        return None
+    if has_target:
+        if not _AMEND.search(text):
+            return None
+        keyword = _TARGET.search(text)
+        targets = [float(n) for n in _NUMBER.findall(text[keyword.end():])]
+        return SignalUpdate(UPDATE_TARGET, targets=targets, direction=direction, symbol=symbol) if targets else None
+    if _CANCEL.search(text):
+        return SignalUpdate(UPDATE_CANCEL, direction=direction, symbol=symbol)
+    # "保本损" 等省略了止损关键字的写法
+    if _BREAKEVEN.search(text) and ('损' in text or '損' in text):
+        return SignalUpdate(UPDATE_STOP_LOSS, breakeven=True, direction=direction, symbol=symbol)
+    return None
+
+
+def _signal_time(signal: Dict[str, Any]) -> float:
+    try:
+        return datetime.strptime(signal['timestamp'], "%Y-%m-%d %H:%M:%S").timestamp()
+    except (KeyError, TypeError, ValueError):
+        return time.time()
+
+
+class TrackedSignal:
+    """一个已执行的信号及其订单（signal 为保存到信号文件的信号字典，含 trade_result）"""
+    __slots__ = ('signal', 'state', 'created_at', 'updates')
+
+    def __init__(self, signal: Dict[str, Any], created_at: float = None):
+        self.signal = signal
+        self.state = STATE_OPEN
+        self.created_at = created_at if created_at is not None else time.time()
+        self.updates: List[Dict[str, Any]] = []
+
+    @property
+    def key(self) -> Tuple[int, int]:
+        return self.signal.get('chat_id'), self.signal.get('message_id')
+
+    @property
+    def direction(self) -> str:
+        return self.signal.get('direction')
+
+    @property
+    def symbol(self) -> str:
+        return str(self.signal.get('trading_pair', '')).upper().replace('_', '/').split('/')[0]
+
+    def __repr__(self):
+        return (f"TrackedSignal({self.signal.get('trading_pair')} {self.direction}, "
+                f"消息 {self.signal.get('message_id')}, {self.state})")
+
+
+class SignalTracker:
+    """
+    已执行信号的状态表。
+    按 (频道ID, 消息ID) 索引；修改消息本身也登记为别名，回复修改消息同样能找到原信号。
+    每个频道只保留最近 RECENT_PER_CHAT 个信号；没有回复链时按信号历史的频道索引，
+    在 WINDOW 秒内按时间倒序匹配。
+    """
+
+    def __init__(self, window: float = None, recent_per_chat: int = None):
+        self.window = window if window is not None else SIGNAL_UPDATE_CONFIG.get('WINDOW', 21600)
+        self.recent_per_chat = recent_per_chat or SIGNAL_UPDATE_CONFIG.get('RECENT_PER_CHAT', 10)
+        self._signals: Dict[Tuple[int, int], TrackedSignal] = {}
+        self._aliases: Dict[Tuple[int, int], Tuple[int, int]] = {}
+        self._recent: Dict[int, Deque[Tuple[int, int]]] = {}
+
+    def __len__(self):
+        return len(self._signals)
+
+    def get(self, chat_id: int, message_id: int) -> Optional[TrackedSignal]:
+        key = (chat_id, message_id)
+        return self._signals.get(self._aliases.get(key, key))
+
+    def track(self, signal: Dict[str, Any], created_at: float = None) -> Optional[TrackedSignal]:
+        """登记一个已成功下单的信号"""
+        if not signal.get('trade_executed'):
+            return None
+        tracked = TrackedSignal(signal, created_at)
+        key = tracked.key
+        existing = self._signals.get(key)
+        if existing is not None:
+            # 同一信号重复登记（例如从信号文件恢复）时保留已有状态
+            existing.signal = signal
+            return existing
+        self._signals[key] = tracked
+        signal_history.add(signal, STATUS_EXECUTED, tracked.created_at)
+        recent = self._recent.setdefault(key[0], deque())
+        recent.append(key)
+        while len(recent) > self.recent_per_chat:
+            self._forget(recent.popleft())
+        return tracked
+
+    def _forget(self, key: Tuple[int, int]):
+        self._signals.pop(key, None)
+        for alias in [alias for alias, target in self._aliases.items() if target == key]:
+            del self._aliases[alias]
+
+    def resolve(self, chat_id: int, reply_to_msg_id: Optional[int], update: SignalUpdate) -> List[TrackedSignal]:
+        """
+        找到指令对应的未取消信号。
+        有回复链时只看回复的消息（原信号或之前的修改消息）；
+        否则取窗口期内同频道最近的信号，"空單取消" 之类带方向的取消作用于所有同方向信号。
+        消息提到币种时只匹配该币种的信号，币种不符时不处理。
+        """
+        if reply_to_msg_id is not None:
+            tracked = self.get(chat_id, reply_to_msg_id)
+            if tracked is None or tracked.state != STATE_OPEN:
+                return []
+            return [tracked] if not update.symbol or tracked.symbol == update.symbol else []
+
+        candidates = []
+        for record in signal_history.by_chat(chat_id, since=time.time() - self.window, status=STATUS_EXECUTED):
+            if update.direction and record.direction != update.direction:
+                continue
+            tracked = self._signals.get(record.key)
+            if tracked is None or tracked.state != STATE_OPEN:
+                continue
+            if update.symbol and tracked.symbol != update.symbol:
+                continue
+            candidates.append(tracked)
+        if update.kind == UPDATE_CANCEL and update.direction:
+            return candidates
+        return candidates[:1]
+
+    def record_update(self, tracked: TrackedSignal, update: SignalUpdate, message_id: int,
+                      result: Dict[str, Any] = None):
+        """记录一次已处理的指令，并把指令消息登记为原信号的别名"""
+        chat_id = tracked.key[0]
+        self._aliases[(chat_id, message_id)] = tracked.key
+        tracked.updates.append({'message_id': message_id, 'update': update.to_dict(),
+                                'success': bool(result and result.get('success'))})
+        if update.kind == UPDATE_CANCEL and result and result.get('success'):
+            tracked.state = STATE_CANCELLED
+            signal_history.mark(chat_id, tracked.key[1], STATUS_CANCELLED)
+
+    def restore(self, records: Iterable[Dict[str, Any]]):
+        """从信号文件的记录恢复状态（重启后、或由其他执行进程处理过的信号）"""
+        for record in records:
+            if 'update' in record:
+                chat_id = record.get('chat_id')
+                for message_id in record.get('target_message_ids', []):
+                    tracked = self.get(chat_id, message_id)
+                    if tracked is not None and record['message_id'] not in {u['message_id'] for u in tracked.updates}:
+                        self.record_update(tracked, SignalUpdate.from_dict(record['update']), record['message_id'],
+                                           record.get('update_result'))
+            elif record.get('trade_executed') and _signal_time(record) >= time.time() - self.window:
+                self.track(record, _signal_time(record))
+
+
+# 进程内共享的信号状态表
+signal_tracker = SignalTracker()
+
+
+if __name__ == '__main__':
+    # 测试代码：新信号不能被识别为修改指令，币种写在消息里时必须识别出来
+    cases = [
+        ('位置更新一下:\n103000-102500附近多，看105000\n止損:101900', None),
+        ('ETH   多\n回踩\n2655-2630附近可以多，看2700-2730\n止損:2600', None),
+        ('大餅關注106500-107000附近空，止損：107500', None),
+        ('止損放在；3102', 'SignalUpdate(stop_loss: 3102.0)'),
+        ('目标修改一下；3070-3090-3120', 'SignalUpdate(target: [3070.0, 3090.0, 3120.0])'),
+        ('空單先取消', 'SignalUpdate(cancel: short)'),
+        ('crv取消差了一點', 'SignalUpdate(cancel: CRV)'),
+        ('大饼的空单先取消', 'SignalUpdate(cancel: BTC short)'),
+        ('WIF 止損在1.55附近', 'SignalUpdate(stop_loss: WIF 1.55)'),
+    ]
+    for text, expected in cases:
+        update = parse_update(text)
+        result = repr(update) if update else None
+        assert result == expected, f"{text!r}: {result} != {expected}"
+    print(f"parse_update: {len(cases)} 个用例通过")
+
+    # 没有回复链时按币种筛选: 频道里依次有 BTC 空、ETH 空、WIF 多 三个信号
+    tracker = SignalTracker()
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    for message_id, (pair, direction) in enumerate([('BTC/USDT', 'short'), ('ETH/USDT', 'short'), ('WIF/USDT', 'long')], 1):
+        tracker.track({'chat_id': -1, 'message_id': message_id, 'trading_pair': pair, 'direction': direction,
+                       'entry_price': [1.0], 'stop_loss': 2.0, 'timestamp': now, 'trade_executed': True})
+    resolve_cases = [
+        ('大饼的空单先取消', ['BTC/USDT']),
+        ('crv取消差了一點', []),
+        ('WIF 止損在1.55附近', ['WIF/USDT']),
+        ('空單先取消', ['ETH/USDT', 'BTC/USDT']),
+    ]
+    for text, expected in resolve_cases:
+        pairs = [t.signal['trading_pair'] for t in tracker.resolve(-1, None, parse_update(text))]
+        assert pairs == expected, f"{text!r}: {pairs} != {expected}"
+    print(f"resolve: {len(resolve_cases)} 个用例通过")
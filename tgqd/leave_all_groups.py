@@ -1,5 +1,9 @@
+import argparse
 import asyncio
-from telethon import TelegramClient
+import json
+import sys
+import time
+from telethon import TelegramClient, errors
 from telethon.tl.functions.channels import GetForumTopicsRequest
 from telethon.tl.functions.channels import GetFullChannelRequest
 import datetime
@@ -12,90 +16,234 @@ PHONE_NUMBER = '+447543202310'  # 替换成你的电话号码
 # 会话文件名
 SESSION_FILE = 'telegram_session.session'
 
-async def main():
+# 清单缓存文件（同时也是机器可读的输出）
+INVENTORY_FILE = 'channel_inventory.json'
+# 缓存有效期（秒），有效期内的频道不再重新请求详细信息和话题
+CACHE_TTL = 3600
+# 同时请求频道详细信息的数量
+CONCURRENCY = 5
+# 每页获取的话题数
+TOPIC_PAGE_SIZE = 100
+
+
+class FloodGate:
+    """
+    全局限流闸门：任一请求遇到 FloodWait 时，所有请求一起暂停到限流结束，
+    而不是每个并发任务各自撞上限流再各自等待。
+    """
+
+    def __init__(self):
+        self.resume_at = 0.0
+
+    async def call(self, client, request, max_retries=5):
+        return await self.run(lambda: client(request), max_retries)
+
+    async def run(self, make_coro, max_retries=5):
+        """执行 make_coro() 返回的协程（可以包含多个请求，例如遍历对话列表），遇到限流时整体重试"""
+        for attempt in range(max_retries + 1):
+            delay = self.resume_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                return await make_coro()
+            except errors.FloodWaitError as e:
+                if attempt == max_retries:
+                    raise
+                self.resume_at = max(self.resume_at, time.monotonic() + e.seconds + 1)
+                print(f"  ⚠️ 触发限流，所有请求暂停 {e.seconds} 秒", file=sys.stderr)
+
+
+def load_inventory(path=INVENTORY_FILE):
+    """读取上次的清单，返回 {频道ID: 条目}"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return {item['id']: item for item in json.load(f).get('dialogs', [])}
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        return {}
+
+
+def save_inventory(dialogs, path=INVENTORY_FILE):
+    inventory = {
+        'generated_at': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'dialogs': dialogs
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(inventory, f, ensure_ascii=False, indent=2)
+    return inventory
+
+
+async def fetch_all_topics(client, gate, entity):
+    """分页获取论坛的全部话题"""
+    topics = {}
+    offset_date, offset_id, offset_topic = 0, 0, 0
+    while True:
+        result = await gate.call(client, GetForumTopicsRequest(
+            channel=entity,
+            offset_date=offset_date,
+            offset_id=offset_id,
+            offset_topic=offset_topic,
+            limit=TOPIC_PAGE_SIZE
+        ))
+        new_topics = [topic for topic in result.topics if topic.id not in topics]
+        for topic in new_topics:
+            # 已删除的话题没有标题
+            topics[topic.id] = getattr(topic, 'title', None)
+        if not new_topics or len(result.topics) < TOPIC_PAGE_SIZE or len(topics) >= result.count:
+            break
+        # 下一页从本页最后一个话题的置顶消息继续
+        last = result.topics[-1]
+        messages = {message.id: message for message in result.messages}
+        last_message = messages.get(getattr(last, 'top_message', 0))
+        offset_date = last_message.date if last_message else getattr(last, 'date', 0)
+        offset_id = getattr(last, 'top_message', 0)
+        offset_topic = last.id
+    return [{'id': topic_id, 'title': title} for topic_id, title in topics.items() if title is not None]
+
+
+async def describe_dialog(client, gate, dialog):
+    """获取单个群组/频道的详细信息，返回可序列化的条目"""
+    entity = dialog.entity
+    item = {
+        'id': dialog.id,
+        'name': dialog.name,
+        'type': '普通群组',
+        'username': getattr(entity, 'username', None),
+        'participants_count': getattr(entity, 'participants_count', None),
+        'unread_count': dialog.unread_count,
+        'forum': False,
+        'topics': [],
+        'fetched_at': time.time()
+    }
+    if not dialog.is_channel:
+        return item
+
+    item['type'] = '超级群组' if entity.megagroup else '广播频道'
+    if getattr(entity, 'date', None):
+        item['created_at'] = entity.date.strftime("%Y-%m-%d %H:%M:%S")
+    try:
+        # 获取频道的完整信息
+        full_channel = await gate.call(client, GetFullChannelRequest(entity))
+        item['about'] = getattr(full_channel.full_chat, 'about', None) or None
+        item['participants_count'] = getattr(full_channel.full_chat, 'participants_count', None)
+    except Exception as e:
+        item['error'] = f"获取频道详细信息时出错: {e}"
+
+    # 检查这是否是一个开启了话题功能的频道 (论坛)
+    if getattr(entity, 'forum', False):
+        item['forum'] = True
+        try:
+            item['topics'] = await fetch_all_topics(client, gate, entity)
+        except Exception as e:
+            item['error'] = f"获取话题信息时出错: {e}"
+    return item
+
+
+def print_dialog(item):
+    """按原有格式打印一个群组/频道"""
+    print(f"- {item['name']} (ID: {item['id']})")
+    print(f"  类型: {item['type']}")
+    if item.get('username'):
+        print(f"  用户名: @{item['username']}")
+        print(f"  链接: https://t.me/{item['username']}")
+    if item.get('about'):
+        print(f"  描述: {item['about']}")
+    if item.get('participants_count'):
+        print(f"  成员数: {item['participants_count']}")
+    if item.get('created_at'):
+        print(f"  创建时间: {item['created_at']}")
+    if item['type'] != '普通群组':
+        print(f"  是否公开: {'是' if item.get('username') else '否'}")
+    if item.get('unread_count'):
+        print(f"  未读消息: {item['unread_count']}")
+    if item.get('error'):
+        print(f"  {item['error']}")
+    if item['topics']:
+        print(f"  话题列表 ({len(item['topics'])}):")
+        for topic in item['topics']:
+            print(f"    - {topic['title']} (Topic ID: {topic['id']})")
+
+
+def build_target_topics(dialogs, keyword=None):
+    """由清单生成 TARGET_TOPICS 配置: {超级群组ID: [话题ID, ...]}，可按话题标题关键字过滤"""
+    target_topics = {}
+    for item in dialogs:
+        topic_ids = [topic['id'] for topic in item['topics']
+                     if not keyword or keyword.lower() in topic['title'].lower()]
+        if topic_ids:
+            target_topics[item['id']] = topic_ids
+    return target_topics
+
+
+async def list_group_dialogs(client):
+    """列出加入的群组和频道（分页请求由 iter_dialogs 完成）"""
+    return [dialog async for dialog in client.iter_dialogs() if dialog.is_group or dialog.is_channel]
+
+
+async def main(args):
     """
-    主函数，用于连接 Telegram，并打印所有加入的群组和频道及其话题。
+    主函数，用于连接 Telegram，并输出所有加入的群组和频道及其话题。
     """
-    # 连接到 Telegram
-    client = TelegramClient(SESSION_FILE, API_ID, API_HASH, 
+    # 连接到 Telegram；flood_sleep_threshold=0 让限流交给 FloodGate 统一处理（所有请求都必须经过 FloodGate）
+    client = TelegramClient(SESSION_FILE, API_ID, API_HASH,
                        connection_retries=10,
-                       retry_delay=5)
-    
+                       retry_delay=5,
+                       flood_sleep_threshold=0)
+
     await client.start(PHONE_NUMBER)
 
-    print("成功连接到 Telegram。")
-
-    print("\n正在获取您加入的群组和频道列表...")
-    async for dialog in client.iter_dialogs():
-        if dialog.is_group or dialog.is_channel:
-            print(f"- {dialog.name} (ID: {dialog.id})")
-            
-            # 获取频道/群组的详细信息
-            if dialog.is_channel:
-                try:
-                    # 获取频道的完整信息
-                    full_channel = await client(GetFullChannelRequest(dialog.entity))
-                    
-                    # 打印频道详细信息
-                    print(f"  类型: {'超级群组' if dialog.entity.megagroup else '广播频道'}")
-                    
-                    if dialog.entity.username:
-                        print(f"  用户名: @{dialog.entity.username}")
-                        print(f"  链接: https://t.me/{dialog.entity.username}")
-                    
-                    if hasattr(full_channel.chats[0], 'about') and full_channel.chats[0].about:
-                        print(f"  描述: {full_channel.chats[0].about}")
-                    
-                    if hasattr(full_channel.full_chat, 'participants_count'):
-                        print(f"  成员数: {full_channel.full_chat.participants_count}")
-                    
-                    # 打印创建时间（如果可用）
-                    if hasattr(dialog.entity, 'date'):
-                        date_str = dialog.entity.date.strftime("%Y-%m-%d %H:%M:%S")
-                        print(f"  创建时间: {date_str}")
-                    
-                    # 打印是否是公开频道
-                    print(f"  是否公开: {'是' if dialog.entity.username else '否'}")
-                    
-                    # 打印未读消息数
-                    if dialog.unread_count > 0:
-                        print(f"  未读消息: {dialog.unread_count}")
-                    
-                    # 检查这是否是一个开启了话题功能的频道 (论坛)
-                    if hasattr(dialog.entity, 'forum') and dialog.entity.forum:
-                        try:
-                            # 获取该频道下的所有话题
-                            topics_result = await client(GetForumTopicsRequest(
-                                channel=dialog.entity,
-                                offset_date=0,
-                                offset_id=0,
-                                offset_topic=0,
-                                limit=100  # Assume a channel won't have more than 100 topics
-                            ))
-                            if topics_result.topics:
-                                print("  话题列表:")
-                                for topic in topics_result.topics:
-                                    print(f"    - {topic.title} (Topic ID: {topic.id})")
-                        except Exception as e:
-                            print(f"    - 获取话题信息时出错: {e}")
-                except Exception as e:
-                    print(f"  获取频道详细信息时出错: {e}")
-            elif dialog.is_group:
-                # 群组信息显示
-                try:
-                    print(f"  类型: 普通群组")
-                    if hasattr(dialog.entity, 'participants_count'):
-                        print(f"  成员数: {dialog.entity.participants_count}")
-                    if dialog.unread_count > 0:
-                        print(f"  未读消息: {dialog.unread_count}")
-                except Exception as e:
-                    print(f"  获取群组详细信息时出错: {e}")
-
-    print("\n所有操作完成。")
+    print("成功连接到 Telegram。", file=sys.stderr)
+
+    print("\n正在获取您加入的群组和频道列表...", file=sys.stderr)
+    start = time.perf_counter()
+    cached = {} if args.refresh else load_inventory(args.output)
+    gate = FloodGate()
+    # 获取对话列表时遇到限流会从头重新获取
+    dialogs = await gate.run(lambda: list_group_dialogs(client))
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    now = time.time()
+    reused = 0
+
+    async def describe(dialog):
+        nonlocal reused
+        item = cached.get(dialog.id)
+        # 上次获取出错的条目不使用缓存
+        if item and 'error' not in item and now - item.get('fetched_at', 0) < CACHE_TTL:
+            reused += 1
+            # 未读数总是取最新值
+            return dict(item, name=dialog.name, unread_count=dialog.unread_count)
+        async with semaphore:
+            return await describe_dialog(client, gate, dialog)
+
+    items = await asyncio.gather(*(describe(dialog) for dialog in dialogs))
+    inventory = save_inventory(list(items), args.output)
+    print(f"\n共 {len(items)} 个群组/频道，缓存命中 {reused}，耗时 {time.perf_counter() - start:.1f} 秒，"
+          f"清单已保存到 {args.output}", file=sys.stderr)
+
+    if args.format == 'json':
+        print(json.dumps(inventory, ensure_ascii=False, indent=2))
+    elif args.format == 'target-topics':
+        # 输出可直接粘贴到 config.py 的 Python 字面量（JSON 的键只能是字符串）
+        print("'TARGET_TOPICS': {")
+        for chat_id, topic_ids in build_target_topics(items, args.match).items():
+            print(f"    {chat_id}: {topic_ids},")
+        print("}")
+    else:
+        for item in items:
+            print_dialog(item)
+
+    print("\n所有操作完成。", file=sys.stderr)
 
     #断开连接
     await client.disconnect()
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='列出加入的群组/频道及其话题')
+    parser.add_argument('--format', choices=['text', 'json', 'target-topics'], default='text',
+                        help='输出格式: 文本 / 完整JSON清单 / TARGET_TOPICS 配置')
+    parser.add_argument('--match', help='生成 TARGET_TOPICS 时只保留标题包含该关键字的话题')
+    parser.add_argument('--output', default=INVENTORY_FILE, help='清单缓存文件')
+    parser.add_argument('--refresh', action='store_true', help='忽略缓存，重新获取全部信息')
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY, help='并发请求数')
     # 运行主异步函数
-    asyncio.run(main()) 
\ No newline at end of file
+    asyncio.run(main(parser.parse_args()))
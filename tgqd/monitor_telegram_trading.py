@@ -1,55 +1,19 @@
 import asyncio
 import json
+import os
 import random
+import sys
 from datetime import datetime
 from telethon import TelegramClient, events, errors
 from telethon.network.connection import ConnectionTcpAbridged
 from telethon.tl.functions.updates import GetStateRequest
 from openai import OpenAI
-from pydantic import BaseModel, ValidationError, model_validator
-from typing import List, Optional, Union, Dict, Any, Tuple
+from typing import List, Optional, Dict, Any, Tuple
 
-# 从test.py复制的交易信号模型
-class TradingSignal(BaseModel):
-    trading_pair: str
-    direction: str
-    entry_price: List[Union[str, float]]
-    target_price: List[float]
-    stop_loss: float
-
-    @model_validator(mode='after')
-    def check_prices_logic(self) -> 'TradingSignal':
-        """
-        验证交易信号中的价格逻辑是否一致。
-        - 多单: 目标价应高于入场价，止损价应低于入场价。
-        - 空单: 目标价应低于入场价，止损价应高于入场价。
-        """
-        # 获取一个纯数字的入场价格列表用于比较
-        numeric_entry_prices = [p for p in self.entry_price if isinstance(p, (int, float))]
-        
-        # 如果没有数字价格（例如只有 "现价"），则无法进行逻辑比较，跳过验证
-        if not numeric_entry_prices:
-            return self
-
-        min_entry = min(numeric_entry_prices)
-        max_entry = max(numeric_entry_prices)
-        
-        min_target = min(self.target_price)
-        max_target = max(self.target_price)
-
-        if self.direction == 'long':
-            if min_target <= max_entry:
-                raise ValueError(f"逻辑冲突 (多单): 最低目标价 {min_target} 必须高于最高入场价 {max_entry}。")
-            if self.stop_loss >= min_entry:
-                raise ValueError(f"逻辑冲突 (多单): 止损价 {self.stop_loss} 必须低于最低入场价 {min_entry}。")
-        
-        elif self.direction == 'short':
-            if max_target >= min_entry:
-                raise ValueError(f"逻辑冲突 (空单): 最高目标价 {max_target} 必须低于最低入场价 {min_entry}。")
-            if self.stop_loss <= max_entry:
-                raise ValueError(f"逻辑冲突 (空单): 止损价 {self.stop_loss} 必须高于最高入场价 {max_entry}。")
-                
-        return self
+# 信号模型和信号历史与 gate 版本共用 (gate/signal_model.py, gate/signal_history.py)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'gate'))
+from signal_model import Signal, SignalValidationError, parse_signal
+from signal_history import signal_history
 
 # 设置OpenAI客户端
 client = OpenAI(
@@ -58,10 +22,10 @@ client = OpenAI(
 )
 
 # 从test.py复制的交易信号提取函数，修改为同时返回原始JSON响应和解析后的信号
-def extract_trade_signal(text: str) -> Tuple[Optional[TradingSignal], Dict[str, Any]]:
+def extract_trade_signal(text: str) -> Tuple[Optional[Signal], Dict[str, Any]]:
     """
-    使用 OpenAI 模型从文本中提取交易信号并用 Pydantic 进行验证。
-    成功则返回 TradingSignal 对象和原始JSON，失败则返回 None和原始JSON。
+    使用 OpenAI 模型从文本中提取交易信号并进行验证。
+    成功则返回 Signal 对象和原始JSON，失败则返回 None和原始JSON。
     """
     # 增强的提示，包含处理"现价"的例子
     prompt = f"""
@@ -139,11 +103,10 @@ def extract_trade_signal(text: str) -> Tuple[Optional[TradingSignal], Dict[str,
         if not response_data or not all(key in response_data for key in required_keys):
             return None, response_data
 
-        trade_data = TradingSignal.model_validate(response_data)
+        trade_data = parse_signal(response_data)
         return trade_data, response_data
 
-    except ValidationError as e:
-        # 直接打印ValidationError的字符串形式，可以更清晰地显示自定义错误
+    except SignalValidationError as e:
         print(f"  - 数据验证失败: {e}")
         return None, {"error": str(e)}
     except (json.JSONDecodeError, IndexError) as e:
@@ -160,9 +123,6 @@ PHONE_NUMBER = '+447543202310'
 SESSION_FILE = 'telegram_session.session'
 TARGET_CHANNEL_ID = 2170033568
 
-# 信号历史存储
-signal_history = []
-
 class ExponentialBackoff:
     """指数退避重试策略"""
     def __init__(self, base_delay=5, max_delay=300, factor=2):
@@ -265,12 +225,12 @@ async def handle_messages(client, backoff):
         print(f"{'-'*60}")
         
         if signal:
-            signal_dict = signal.model_dump()
+            signal_dict = signal.to_dict()
             signal_dict['timestamp'] = timestamp
             signal_dict['message_id'] = message.id
             signal_dict['original_text'] = text
             signal_dict['raw_json'] = raw_json  # 保存原始JSON数据
-            signal_history.append(signal_dict)
+            signal_history.add(signal_dict)
             
             print("\n✅ 检测到交易信号!")
             print(f"{'='*60}")
@@ -1,60 +1,25 @@
 import json
+import os
+import sys
 from openai import OpenAI
-from pydantic import BaseModel, ValidationError, model_validator
-from typing import List, Optional, Union
+from typing import Optional
 
-# 1. 在 Pydantic 模型中加入自定义逻辑验证
-class TradingSignal(BaseModel):
-    trading_pair: str
-    direction: str
-    entry_price: List[Union[str, float]]
-    target_price: List[float]
-    stop_loss: float
-
-    @model_validator(mode='after')
-    def check_prices_logic(self) -> 'TradingSignal':
-        """
-        验证交易信号中的价格逻辑是否一致。
-        - 多单: 目标价应高于入场价，止损价应低于入场价。
-        - 空单: 目标价应低于入场价，止损价应高于入场价。
-        """
-        # 获取一个纯数字的入场价格列表用于比较
-        numeric_entry_prices = [p for p in self.entry_price if isinstance(p, (int, float))]
-        
-        # 如果没有数字价格（例如只有 "现价"），则无法进行逻辑比较，跳过验证
-        if not numeric_entry_prices:
-            return self
-
-        min_entry = min(numeric_entry_prices)
-        max_entry = max(numeric_entry_prices)
-        
-        min_target = min(self.target_price)
-        max_target = max(self.target_price)
-
-        if self.direction == 'long':
-            if min_target <= max_entry:
-                raise ValueError(f"逻辑冲突 (多单): 最低目标价 {min_target} 必须高于最高入场价 {max_entry}。")
-            if self.stop_loss >= min_entry:
-                raise ValueError(f"逻辑冲突 (多单): 止损价 {self.stop_loss} 必须低于最低入场价 {min_entry}。")
-        
-        elif self.direction == 'short':
-            if max_target >= min_entry:
-                raise ValueError(f"逻辑冲突 (空单): 最高目标价 {max_target} 必须低于最低入场价 {min_entry}。")
-            if self.stop_loss <= max_entry:
-                raise ValueError(f"逻辑冲突 (空单): 止损价 {self.stop_loss} 必须高于最高入场价 {max_entry}。")
-                
-        return self
+# 1. 信号模型（含价格逻辑验证）与 gate 版本共用 (gate/signal_model.py)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'gate'))
+from signal_model import Signal, SignalValidationError, parse_signal
+from config import OPENAI_CONFIG
 
+# 设置OpenAI客户端（使用 gate/config.py 的模型服务配置，可用环境变量 OPENAI_API_KEY 覆盖密钥）
 client = OpenAI(
-    api_key="sk-gwsjpcyvyoxkpxlvjsdiyvpgikvebombrexdarycsxuqvnec",
-    base_url="https://api.siliconflow.cn/v1"
+    api_key=os.environ.get('OPENAI_API_KEY', OPENAI_CONFIG['API_KEY']),
+    base_url=OPENAI_CONFIG['BASE_URL']
 )
 
 # 2. 将核心提取逻辑封装成一个函数
-def extract_trade_signal(text: str) -> Optional[TradingSignal]:
+def extract_trade_signal(text: str) -> Optional[Signal]:
     """
-    使用 OpenAI 模型从文本中提取交易信号并用 Pydantic 进行验证。
-    成功则返回 TradingSignal 对象，失败则返回 None。
+    使用 OpenAI 模型从文本中提取交易信号并进行验证。
+    成功则返回 Signal 对象，失败则返回 None。
     """
     # 增强的提示，包含处理“现价”的例子
     prompt = f"""
@@ -132,11 +97,10 @@ def extract_trade_signal(text: str) -> Optional[TradingSignal]:
         if not response_data or not all(key in response_data for key in required_keys):
             return None
 
-        trade_data = TradingSignal.model_validate(response_data)
+        trade_data = parse_signal(response_data)
         return trade_data
 
-    except ValidationError as e:
-        # 直接打印ValidationError的字符串形式，可以更清晰地显示自定义错误
+    except SignalValidationError as e:
         print(f"  - 数据验证失败: {e}")
         return None
     except (json.JSONDecodeError, IndexError) as e:
@@ -291,7 +255,7 @@ if __name__ == "__main__":
         if signal:
             successful_extractions += 1
             print("\n✅ 提取成功:")
-            print(signal.model_dump_json(indent=4))
+            print(json.dumps(signal.to_dict(), ensure_ascii=False, indent=4))
         else:
             print("\n❌ 提取失败: 未找到有效交易信号或验证失败。")
         